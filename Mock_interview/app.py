@@ -1,7 +1,18 @@
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel, span
+from common.registry import get_chat_model, get_embeddings
+from interview import QuestionPrefetch, create_bank_chain, create_chains, evaluate
+from question_bank import default_bank
 
 # ----------------------
 # Load env
@@ -19,14 +30,23 @@ st.set_page_config(
 
 st.title("🎤 Mock Interviewer – GenAI Coach")
 st.caption("Practice → See Ideal Answer → Get Feedback")
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
 
 # ----------------------
-# Load Groq Model
+# Load Groq Model (shared across reruns and sessions)
 # ----------------------
-llm = ChatGroq(
+llm = get_chat_model(
     model="llama-3.1-8b-instant",
     temperature=0.4
 )
+# Same settings, but never served from the response cache: a repeated
+# role/level/type must still get a new question
+question_llm = get_chat_model(
+    model="llama-3.1-8b-instant",
+    temperature=0.4,
+    cache=False
+)
 
 # ----------------------
 # Sidebar
@@ -44,54 +64,36 @@ with st.sidebar:
 # ----------------------
 if "question" not in st.session_state:
     st.session_state.question = None
-
-# ----------------------
-# Prompts
-# ----------------------
-question_prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a professional interviewer.\n"
-     "Generate ONE interview question.\n"
-     "Role: {role}\n"
-     "Level: {level}\n"
-     "Type: {type}"
-    ),
-    ("human", "Ask a question.")
-])
-
-ideal_answer_prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an expert interviewer.\n"
-     "Provide an ideal high-quality answer to the question."
-    ),
-    ("human", "{question}")
-])
-
-feedback_prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "Evaluate the candidate answer.\n"
-     "Give score out of 10.\n"
-     "Give strengths and improvements."
-    ),
-    ("human",
-     "Question: {question}\n"
-     "User Answer: {answer}")
-])
-
-question_chain = question_prompt | llm
-ideal_chain = ideal_answer_prompt | llm
-feedback_chain = feedback_prompt | llm
+if "evaluation" not in st.session_state:
+    st.session_state.evaluation = None
+if "prefetch" not in st.session_state:
+    st.session_state.prefetch = None
+if "rounds" not in st.session_state:
+    st.session_state.rounds = []
+
+question_chain, ideal_chain, feedback_chain = create_chains(llm, question_llm)
+settings = {"role": role, "level": level, "type": interview_type}
+
+# Pregenerated questions; a warmer model gives the bank more variety. The
+# embedding model is only loaded when a refill needs to dedupe questions.
+bank = default_bank(
+    create_bank_chain(get_chat_model(model="llama-3.1-8b-instant", temperature=0.9, priority="batch")),
+    get_embeddings
+)
 
 # ----------------------
 # Start Interview
 # ----------------------
 if start:
-    q = question_chain.invoke({
-        "role": role,
-        "level": level,
-        "type": interview_type
-    })
-    st.session_state.question = q.content
+    question = bank.take(role, level, interview_type)
+    if question is None:
+        # Empty bucket (take() has started a refill); ask live this once
+        with span("generate_question"):
+            question = question_chain.invoke(settings).content
+    st.session_state.question = question
+    st.session_state.evaluation = None
+    st.session_state.prefetch = None
+    st.session_state.rounds = []
 
 # ----------------------
 # Display Question
@@ -100,30 +102,81 @@ if st.session_state.question:
     st.subheader("🧠 Interview Question")
     st.write(st.session_state.question)
 
-    user_answer = st.text_area("Your Answer", height=150)
+    user_answer = st.text_area("Your Answer", height=150, key=f"answer_{len(st.session_state.rounds)}")
 
     if st.button("Submit Answer"):
-        with st.spinner("Evaluating..."):
+        # Start on the next question now; it is generated while feedback is read
+        st.session_state.prefetch = QuestionPrefetch(question_chain, settings, bank)
 
-            ideal = ideal_chain.invoke(
-                {"question": st.session_state.question}
+        with st.spinner("Evaluating..."):
+            ideal, feedback, timings = evaluate(
+                ideal_chain, feedback_chain, st.session_state.question, user_answer
             )
+        st.session_state.evaluation = {"ideal": ideal, "feedback": feedback, "timings": timings}
 
-            feedback = feedback_chain.invoke({
-                "question": st.session_state.question,
-                "answer": user_answer
-            })
-
+    evaluation = st.session_state.evaluation
+    if evaluation:
         st.subheader("✅ Ideal Answer")
-        st.write(ideal.content)
+        st.write(evaluation["ideal"])
 
         st.subheader("📊 Feedback & Score")
-        st.write(feedback.content)
+        st.write(evaluation["feedback"])
 
+        timings = evaluation["timings"]
+        st.caption(
+            f"⏱️ Evaluated in {timings['wall']:.1f}s "
+            f"(one after the other: {timings['ideal'] + timings['feedback']:.1f}s)"
+        )
+
+        # Outside the "Submit Answer" branch, so its click survives the rerun
         if st.button("➡️ Next Question"):
-            q = question_chain.invoke({
-                "role": role,
-                "level": level,
-                "type": interview_type
+            prefetch = st.session_state.prefetch
+            if prefetch is None or prefetch.settings != settings:
+                # Settings changed since the prefetch started; ask again
+                prefetch = QuestionPrefetch(question_chain, settings, bank)
+            with st.spinner("Loading next question..."):
+                question, question_timings = prefetch.result()
+
+            sequential = timings["ideal"] + timings["feedback"] + question_timings["generate"]
+            waited = timings["wall"] + question_timings["wall"]
+            st.session_state.rounds.append({
+                "sequential": sequential,
+                "waited": waited,
+                "source": question_timings["source"],
             })
-            st.session_state.question = q.content
+            st.session_state.question = question
+            st.session_state.evaluation = None
+            st.session_state.prefetch = None
+            st.rerun()
+
+# ----------------------
+# Latency report
+# ----------------------
+if st.session_state.rounds:
+    with st.sidebar:
+        st.header("⏱️ Latency")
+        rounds = st.session_state.rounds
+        st.table([
+            {
+                "Round": i,
+                "Waited (s)": round(r["waited"], 1),
+                "Sequential (s)": round(r["sequential"], 1),
+                "Saved (s)": round(r["sequential"] - r["waited"], 1),
+                "Next question": r["source"],
+            }
+            for i, r in enumerate(rounds, start=1)
+        ])
+        saved = sum(r["sequential"] - r["waited"] for r in rounds)
+        st.caption(f"Saved {saved:.1f}s over {len(rounds)} rounds by running chains in parallel and prefetching")
+
+with st.sidebar:
+    bank_stats = bank.stats()
+    st.caption(
+        f"🗃️ Question bank: {bank_stats['unserved']} ready for use, {bank_stats['served']} served, "
+        f"{bank_stats['duplicates']} near-duplicates skipped"
+        + (" · refilling…" if bank_stats["refilling"] else "")
+    )
+    if bank_stats["failed_refills"]:
+        st.caption(f"⚠️ {bank_stats['failed_refills']} refills failed, last: {bank_stats['last_error']}")
+
+debug_panel()
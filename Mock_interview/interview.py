@@ -0,0 +1,127 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda, RunnableParallel
+
+from common.metrics import span
+
+# Background work (next-question prefetch) shared by every session
+_background = ThreadPoolExecutor(max_workers=4, thread_name_prefix="interview")
+
+# ----------------------
+# Prompts
+# ----------------------
+question_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a professional interviewer.\n"
+     "Generate ONE interview question.\n"
+     "Role: {role}\n"
+     "Level: {level}\n"
+     "Type: {type}"
+    ),
+    ("human", "Ask a question.")
+])
+
+bank_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a professional interviewer.\n"
+     "Generate {count} different interview questions.\n"
+     "Role: {role}\n"
+     "Level: {level}\n"
+     "Type: {type}\n"
+     "Cover different topics. Write one question per line, with no numbering or extra text."
+    ),
+    ("human", "Questions already asked (do not repeat them):\n{avoid}")
+])
+
+ideal_answer_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an expert interviewer.\n"
+     "Provide an ideal high-quality answer to the question."
+    ),
+    ("human", "{question}")
+])
+
+feedback_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "Evaluate the candidate answer.\n"
+     "Give score out of 10.\n"
+     "Give strengths and improvements."
+    ),
+    ("human",
+     "Question: {question}\n"
+     "User Answer: {answer}")
+])
+
+
+def create_chains(llm, question_llm=None):
+    """(question_chain, ideal_chain, feedback_chain); questions may use their own model"""
+    return question_prompt | (question_llm or llm), ideal_answer_prompt | llm, feedback_prompt | llm
+
+
+def _timed(chain, timings, name):
+    def run(inputs):
+        started = time.perf_counter()
+        with span(f"evaluate_{name}"):
+            output = chain.invoke(inputs)
+        timings[name] = time.perf_counter() - started
+        return output
+    return RunnableLambda(run)
+
+
+def evaluate(ideal_chain, feedback_chain, question, answer):
+    """Ideal answer and feedback, generated in parallel.
+
+    Returns (ideal_text, feedback_text, timings) where timings holds each
+    chain's own latency and the wall-clock time the user actually waited.
+    """
+    timings = {}
+    parallel = RunnableParallel(
+        ideal=_timed(ideal_chain, timings, "ideal"),
+        feedback=_timed(feedback_chain, timings, "feedback"),
+    )
+    started = time.perf_counter()
+    with span("evaluate"):
+        result = parallel.invoke({"question": question, "answer": answer})
+    timings["wall"] = time.perf_counter() - started
+    return result["ideal"].content, result["feedback"].content, timings
+
+
+def create_bank_chain(llm):
+    """Chain that writes a batch of questions for the question bank"""
+    return bank_prompt | llm
+
+
+class QuestionPrefetch:
+    """A question being fetched in the background for given settings.
+
+    Started while the user reads feedback, so "Next Question" usually
+    finds it ready. The question bank is tried first; only an empty bucket
+    costs an LLM call. `result()` waits only for whatever is left.
+    """
+
+    def __init__(self, question_chain, settings, bank=None):
+        self.settings = settings
+        self._timings = {}
+        # Copy the caller's context so the session's metrics see the background call
+        self._future = _background.submit(
+            contextvars.copy_context().run, self._generate, question_chain, settings, bank
+        )
+
+    def _generate(self, question_chain, settings, bank):
+        started = time.perf_counter()
+        question = bank.take(settings["role"], settings["level"], settings["type"]) if bank else None
+        self._timings["source"] = "bank" if question else "llm"
+        if question is None:
+            with span("generate_question"):
+                question = question_chain.invoke(settings).content
+        self._timings["generate"] = time.perf_counter() - started
+        return question
+
+    def result(self):
+        """(question, timings) with the generation time and the time waited here"""
+        started = time.perf_counter()
+        question = self._future.result()
+        return question, {**self._timings, "wall": time.perf_counter() - started}
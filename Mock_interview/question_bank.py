@@ -0,0 +1,248 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+BANK_PATH = Path(os.getenv(
+    "MOCK_INTERVIEW_BANK_PATH",
+    Path.home() / ".cache" / "mock_interview" / "questions.sqlite3"
+))
+# Refill a bucket once fewer than LOW_WATER unserved questions remain, up to TARGET
+TARGET = int(os.getenv("MOCK_INTERVIEW_BANK_TARGET", 20))
+LOW_WATER = int(os.getenv("MOCK_INTERVIEW_BANK_LOW_WATER", 5))
+# Questions at least this similar (cosine) to one already banked are dropped
+SIMILARITY = float(os.getenv("MOCK_INTERVIEW_BANK_SIMILARITY", 0.9))
+# Served questions kept per bucket for deduplication
+MAX_PER_BUCKET = 500
+GENERATE_BATCH = 10
+MAX_ROUNDS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id         INTEGER PRIMARY KEY,
+    bucket     TEXT NOT NULL,
+    question   TEXT NOT NULL,
+    vector     BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    served_at  REAL
+);
+CREATE INDEX IF NOT EXISTS questions_bucket ON questions (bucket, served_at);
+"""
+
+NUMBERING = re.compile(r"^\s*(?:\d+[.)]|[-*•]|q\d+[:.)]?)\s*", re.IGNORECASE)
+
+
+def bucket_key(role, level, interview_type):
+    """Settings normalized so "Python developer " and "python Developer" share a bucket"""
+    return "\0".join(" ".join(part.lower().split()) for part in (role, level, interview_type))
+
+
+def parse_questions(text):
+    """Questions from an LLM reply with one question per line"""
+    questions = []
+    for line in text.splitlines():
+        line = NUMBERING.sub("", line).strip().strip('"')
+        if len(line) >= 15 and not line.endswith(":"):
+            questions.append(line)
+    return questions
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class QuestionBank:
+    """Pregenerated interview questions per (role, level, type), in SQLite.
+
+    `take()` serves the oldest unserved question of a bucket straight from
+    disk. When a bucket runs low, `refill_async()` asks the LLM for a batch
+    of questions in a background thread, drops any that are too similar
+    (by embedding cosine) to a question already banked, served or not,
+    and stores the rest. Served questions are kept so they keep blocking
+    near-duplicates.
+
+    `embeddings_factory` returns the embedding model and is only called by
+    a refill, so serving banked questions never loads it.
+    """
+
+    def __init__(self, generate_chain, embeddings_factory, path=BANK_PATH, target=TARGET,
+                 low_water=LOW_WATER, similarity=SIMILARITY):
+        self.generate_chain = generate_chain
+        self.embeddings_factory = embeddings_factory
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.target = target
+        self.low_water = low_water
+        self.similarity = similarity
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="question-bank")
+        self._lock = threading.Lock()
+        self._refilling = {}
+        self.counts = {"served": 0, "empty": 0, "generated": 0, "duplicates": 0, "failed_refills": 0}
+        self.last_error = None
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection, committed on success and always closed"""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def available(self, role, level, interview_type):
+        with self._connect() as db:
+            return db.execute(
+                "SELECT COUNT(*) FROM questions WHERE bucket = ? AND served_at IS NULL",
+                (bucket_key(role, level, interview_type),)
+            ).fetchone()[0]
+
+    def take(self, role, level, interview_type):
+        """An unserved question for these settings, or None if the bucket is empty.
+
+        Starts a background refill whenever the bucket is running low.
+        """
+        bucket = bucket_key(role, level, interview_type)
+        with self._connect() as db:
+            # BEGIN IMMEDIATE so two sessions never take the same question
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id, question FROM questions WHERE bucket = ? AND served_at IS NULL"
+                " ORDER BY id LIMIT 1",
+                (bucket,)
+            ).fetchone()
+            if row:
+                db.execute("UPDATE questions SET served_at = ? WHERE id = ?", (time.time(), row[0]))
+            remaining = db.execute(
+                "SELECT COUNT(*) FROM questions WHERE bucket = ? AND served_at IS NULL", (bucket,)
+            ).fetchone()[0]
+
+        self._count("served" if row else "empty")
+        if remaining < self.low_water:
+            self.refill_async(role, level, interview_type)
+        return row[1] if row else None
+
+    def refill_async(self, role, level, interview_type):
+        """Top the bucket up in the background; returns the running future"""
+        bucket = bucket_key(role, level, interview_type)
+        with self._lock:
+            future = self._refilling.get(bucket)
+            if future is None or future.done():
+                future = self._pool.submit(self.refill, role, level, interview_type)
+                self._refilling[bucket] = future
+                future.add_done_callback(lambda f: self._refill_done((role, level, interview_type), f))
+            return future
+
+    def _refill_done(self, settings, future):
+        """Record a background refill's failure; nobody else waits on it"""
+        error = None if future.cancelled() else future.exception()
+        if error is None:
+            return
+        logger.warning("Question bank refill for %s failed: %s: %s", " / ".join(settings), type(error).__name__, error)
+        self._count("failed_refills")
+        with self._lock:
+            self.last_error = f"{type(error).__name__}: {error}"
+
+    def refill(self, role, level, interview_type):
+        """Generate questions until the bucket holds `target` unserved ones.
+
+        Returns the number of questions added.
+        """
+        bucket = bucket_key(role, level, interview_type)
+        added = 0
+        for _ in range(MAX_ROUNDS):
+            with self._connect() as db:
+                missing = self.target - db.execute(
+                    "SELECT COUNT(*) FROM questions WHERE bucket = ? AND served_at IS NULL", (bucket,)
+                ).fetchone()[0]
+                rows = db.execute(
+                    "SELECT question, vector FROM questions WHERE bucket = ? ORDER BY id DESC LIMIT ?",
+                    (bucket, MAX_PER_BUCKET)
+                ).fetchall()
+            if missing <= 0:
+                break
+
+            reply = self.generate_chain.invoke({
+                "role": role,
+                "level": level,
+                "type": interview_type,
+                "count": max(missing, GENERATE_BATCH),
+                "avoid": "\n".join(question for question, _ in rows[:15]) or "None",
+            })
+            candidates = parse_questions(getattr(reply, "content", reply))
+            if not candidates:
+                continue
+
+            banked = [np.frombuffer(vector, dtype=np.float32) for _, vector in rows]
+            vectors = _normalize(self.embeddings_factory().embed_documents(candidates))
+            fresh = []
+            for question, vector in zip(candidates, vectors):
+                if banked and float(np.max(np.stack(banked) @ vector)) >= self.similarity:
+                    self._count("duplicates")
+                    continue
+                banked.append(vector)
+                fresh.append((question, vector))
+                if len(fresh) >= missing:
+                    break
+
+            now = time.time()
+            with self._connect() as db:
+                db.executemany(
+                    "INSERT INTO questions (bucket, question, vector, created_at) VALUES (?, ?, ?, ?)",
+                    [(bucket, question, vector.tobytes(), now) for question, vector in fresh]
+                )
+                # Drop the oldest served questions beyond the per-bucket cap
+                db.execute(
+                    "DELETE FROM questions WHERE bucket = ? AND served_at IS NOT NULL AND id NOT IN"
+                    " (SELECT id FROM questions WHERE bucket = ? ORDER BY id DESC LIMIT ?)",
+                    (bucket, bucket, MAX_PER_BUCKET)
+                )
+            added += len(fresh)
+            self._count("generated", len(fresh))
+        return added
+
+    def stats(self):
+        with self._connect() as db:
+            total, unserved = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(served_at IS NULL), 0) FROM questions"
+            ).fetchone()
+        with self._lock:
+            counts = dict(self.counts)
+            refilling = sum(1 for future in self._refilling.values() if not future.done())
+            last_error = self.last_error
+        return {**counts, "banked": total, "unserved": unserved, "refilling": refilling,
+                "last_error": last_error}
+
+
+_default_bank = None
+_default_lock = threading.Lock()
+
+
+def default_bank(generate_chain, embeddings_factory):
+    """Process-wide bank, so refills and counters are shared by every session"""
+    global _default_bank
+    with _default_lock:
+        if _default_bank is None:
+            _default_bank = QuestionBank(generate_chain, embeddings_factory)
+        return _default_bank
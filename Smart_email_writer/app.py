@@ -1,8 +1,18 @@
 import streamlit as st
 from dotenv import load_dotenv
 
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel
+from common.registry import get_chat_model
+from common.streaming import CURSOR, format_metrics, stream_to
+from writer import EMAIL_TYPES, LENGTHS, TONES, create_email_chain
 
 # -----------------------
 # Load environment
@@ -20,11 +30,13 @@ st.set_page_config(
 
 st.title("✉️ Smart Email Writer Assistant")
 st.caption("Write professional emails in seconds (Powered by Groq)")
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
 
 # -----------------------
-# Load LLM (Groq)
+# Load LLM (Groq, shared across reruns and sessions)
 # -----------------------
-llm = ChatGroq(
+llm = get_chat_model(
     model="llama-3.1-8b-instant",
     temperature=0.4
 )
@@ -35,40 +47,16 @@ llm = ChatGroq(
 with st.sidebar:
     st.header("✍️ Email Settings")
 
-    email_type = st.selectbox(
-        "Email Type",
-        ["Professional", "Formal", "Friendly", "Cold Email", "Follow-up"]
-    )
+    email_type = st.selectbox("Email Type", EMAIL_TYPES)
 
-    tone = st.selectbox(
-        "Tone",
-        ["Polite", "Confident", "Friendly", "Persuasive", "Apologetic"]
-    )
+    tone = st.selectbox("Tone", TONES)
 
-    length = st.selectbox(
-        "Email Length",
-        ["Short", "Medium", "Detailed"]
-    )
+    length = st.selectbox("Email Length", LENGTHS)
 
 # -----------------------
-# Prompt Template
+# Chain
 # -----------------------
-prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are a smart professional email writing assistant.\n"
-     "Write clear, well-structured, and natural-sounding emails.\n"
-     "Return ONLY the email content.\n"
-     "Do NOT add explanations.\n"
-     "Format the email properly with subject, greeting, body, and closing.\n"
-    ),
-    ("human",
-     "Write a {email_type} email.\n"
-     "Tone: {tone}\n"
-     "Length: {length}\n"
-     "Context: {context}")
-])
-
-chain = prompt | llm
+chain = create_email_chain(llm)
 
 # -----------------------
 # User Input
@@ -85,20 +73,20 @@ generate = st.button("✉️ Generate Email")
 # Generate Email
 # -----------------------
 if generate and context.strip():
-    with st.spinner("Writing your email..."):
-        response = chain.invoke({
-            "email_type": email_type,
-            "tone": tone,
-            "length": length,
-            "context": context
-        })
+    st.subheader("✅ Generated Email")
+    email_box = st.empty()
 
-        email_text = response.content
+    def render(text, done):
+        email_box.markdown(f"```text\n{text}{'' if done else CURSOR}\n```")
 
-    st.subheader("✅ Generated Email")
-    st.markdown(
-        f"""
-```text
-{email_text}
-"""
-)
\ No newline at end of file
+    # Regenerating while this streams stops the run and closes the stream
+    email_text, metrics = stream_to(email_box, chain, {
+        "email_type": email_type,
+        "tone": tone,
+        "length": length,
+        "context": context
+    }, render=render, stage="write_email")
+
+    st.caption(format_metrics(metrics))
+
+debug_panel()
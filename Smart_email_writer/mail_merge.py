@@ -0,0 +1,312 @@
+"""Write one email per CSV row (mail merge), resuming after interruptions.
+
+Examples:
+    python mail_merge.py recipients.csv -o emails.jsonl
+    python mail_merge.py recipients.csv -o emails.csv --concurrency 16
+    python mail_merge.py leads.csv -o out.jsonl --type "Cold Email" --tone Persuasive \\
+        --context "Introduce our analytics service to {name}, {title} at {company}"
+
+Input columns (header names are case-insensitive):
+    context            what the email is about; may use {column} placeholders
+    type, tone, length optional, default to --type/--tone/--length
+    id                 optional stable row id; otherwise one is derived
+                       from the row's contents
+Other columns (name, email, company, ...) are copied to the output and can
+be referenced from the context, e.g. "Thank {name} for visiting our booth".
+
+Rows are generated concurrently with `chain.abatch_as_completed` (at most
+--concurrency calls in flight) and each finished row is appended to the
+output immediately, as JSONL or, for a .csv path, CSV. On restart, rows
+already written successfully are skipped, so an interrupted run can simply
+be started again; failed rows are retried.
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common import gateway, metrics
+from common.registry import get_chat_model
+from writer import EMAIL_TYPES, LENGTHS, TONES, create_email_chain
+
+logger = logging.getLogger("mail_merge")
+
+MODEL = "llama-3.1-8b-instant"
+MAX_CONCURRENCY = 8
+
+# Columns the output adds; input columns may not use these names
+RESULT_FIELDS = ["row_id", "status", "subject", "body", "error", "finished_at"]
+PLACEHOLDER = re.compile(r"\{([^{}]+)\}")
+
+
+def _choice(value, options, default):
+    """`value` matched case-insensitively against `options`, else None"""
+    value = (value or "").strip() or default
+    for option in options:
+        if option.lower() == value.lower():
+            return option
+    return None
+
+
+def row_id(row):
+    """The row's `id` column, or a hash of its values if it has none"""
+    if (row.get("id") or "").strip():
+        return row["id"].strip()
+    payload = json.dumps(sorted(row.items()), ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def fill_placeholders(text, row):
+    """`{column}` in `text` replaced by the row's value; other braces kept"""
+    return PLACEHOLDER.sub(lambda m: row.get(m.group(1).strip().lower(), m.group(0)), text)
+
+
+def read_rows(path, defaults):
+    """(jobs, invalid) from the input CSV.
+
+    Each job is the output record so far (input columns plus `row_id`) and
+    the chain inputs; rows missing a context or with an unknown type, tone
+    or length are returned in `invalid` as (line, reason).
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+        clashes = sorted(set(fieldnames) & set(RESULT_FIELDS))
+        if clashes:
+            raise ValueError(f"Rename input column(s) {', '.join(clashes)}: the output uses these names")
+        if "context" not in fieldnames and not defaults["context"]:
+            raise ValueError("CSV needs a 'context' column, or pass --context")
+
+        jobs, invalid = [], []
+        for line, raw in enumerate(reader, start=2):
+            row = {name.strip().lower(): (value or "").strip() for name, value in raw.items() if name}
+            if not any(row.values()):
+                continue
+            inputs = {
+                "email_type": _choice(row.get("type") or row.get("email_type"), EMAIL_TYPES, defaults["email_type"]),
+                "tone": _choice(row.get("tone"), TONES, defaults["tone"]),
+                "length": _choice(row.get("length"), LENGTHS, defaults["length"]),
+                "context": fill_placeholders(row.get("context") or defaults["context"], row),
+            }
+            missing = [key for key, value in inputs.items() if not value]
+            if missing:
+                invalid.append((line, f"missing or unknown {', '.join(missing)}"))
+                continue
+            jobs.append(({**row, "row_id": row_id(row)}, inputs))
+    return jobs, invalid
+
+
+def split_subject(text):
+    """(subject, body) when the email starts with a "Subject:" line"""
+    lines = text.strip().splitlines()
+    if lines and lines[0].lower().startswith("subject:"):
+        return lines[0].split(":", 1)[1].strip(), "\n".join(lines[1:]).strip()
+    return "", text.strip()
+
+
+# ------------------------
+# Output (append-only, resumable)
+# ------------------------
+
+class JsonlWriter:
+    """Append-only JSONL output, flushed and fsynced after every record"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        """Row ids already written with status "ok" """
+        done = set()
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-write leaves a truncated last line
+                    continue
+                if record.get("status") == "ok":
+                    done.add(record["row_id"])
+        return done
+
+    def open(self, fieldnames):
+        self.file = open(self.path, "a", encoding="utf-8")
+        # Start on a fresh line if the previous run died mid-record
+        if self.file.tell():
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+class CsvWriter(JsonlWriter):
+    """Append-only CSV output; a record cut short by a crash is dropped on resume"""
+
+    def _rows(self):
+        """(header, complete rows, whether the file holds only complete rows)"""
+        with open(self.path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+        # `finished_at` is written last, so a row without it is incomplete
+        complete = [row for row in rows if row.get("finished_at")]
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            intact = f.read(1) == b"\n" and len(complete) == len(rows)
+        return reader.fieldnames, complete, intact
+
+    def completed(self):
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return set()
+        _, rows, _ = self._rows()
+        return {row["row_id"] for row in rows if row["status"] == "ok"}
+
+    def open(self, fieldnames):
+        existing = os.path.exists(self.path) and os.path.getsize(self.path)
+        if existing:
+            # Keep the header of the first run so columns stay aligned
+            fieldnames, rows, intact = self._rows()
+            if not intact:
+                tmp = f"{self.path}.tmp"
+                with open(tmp, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.DictWriter(f, fieldnames)
+                    writer.writeheader()
+                    writer.writerows(rows)
+                os.replace(tmp, self.path)
+        self.file = open(self.path, "a", newline="", encoding="utf-8")
+        self.writer = csv.DictWriter(self.file, fieldnames, extrasaction="ignore")
+        if not existing:
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+        self._sync()
+
+
+def result_writer(path):
+    return CsvWriter(path) if path.lower().endswith(".csv") else JsonlWriter(path)
+
+
+# ------------------------
+# Generation
+# ------------------------
+
+async def run(chain, jobs, writer, max_concurrency):
+    """Generate every job, writing each record as soon as its email is done"""
+    counts = {"ok": 0, "error": 0}
+    batch_start = time.perf_counter()
+    records = [record for record, _ in jobs]
+
+    results = chain.abatch_as_completed(
+        [inputs for _, inputs in jobs],
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    async for index, result in results:
+        record = dict(records[index])
+        if isinstance(result, Exception):
+            record.update(status="error", error=f"{type(result).__name__}: {result}")
+        else:
+            subject, body = split_subject(result.content)
+            record.update(status="ok", subject=subject, body=body)
+        record["finished_at"] = time.time()
+        writer.write(record)
+
+        counts[record["status"]] += 1
+        finished = counts["ok"] + counts["error"]
+        if record["status"] == "error" or finished % 25 == 0 or finished == len(jobs):
+            rate = finished / (time.perf_counter() - batch_start) * 3600
+            logger.info(
+                "[%d/%d] %s %s (%.0f emails/h)%s",
+                finished, len(jobs), record["status"], record["row_id"], rate,
+                f": {record['error']}" if record["status"] == "error" else ""
+            )
+    return counts, time.perf_counter() - batch_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV file with one row per email")
+    parser.add_argument("-o", "--output", required=True, help="JSONL or .csv file to append results to")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--type", dest="email_type", default=EMAIL_TYPES[0], choices=EMAIL_TYPES)
+    parser.add_argument("--tone", default=TONES[0], choices=TONES)
+    parser.add_argument("--length", default=LENGTHS[0], choices=LENGTHS)
+    parser.add_argument("--context", default="", help="context for rows without one; may use {column}")
+    parser.add_argument("--metrics", help="write latency/token metrics (Prometheus text format) to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    try:
+        jobs, invalid = read_rows(args.input, vars(args))
+    except ValueError as e:
+        parser.error(str(e))
+    for line, reason in invalid:
+        logger.warning("Skipping line %d: %s", line, reason)
+
+    writer = result_writer(args.output)
+    done = writer.completed()
+    seen = set()
+    pending = []
+    for record, inputs in jobs:
+        if record["row_id"] not in done and record["row_id"] not in seen:
+            seen.add(record["row_id"])
+            pending.append((record, inputs))
+    logger.info("%d to write, %d already done or duplicated, %d invalid", len(pending), len(jobs) - len(pending), len(invalid))
+    if not pending:
+        return
+
+    # Input columns first, in order of appearance, then the results
+    columns = list(dict.fromkeys(name for record, _ in jobs for name in record if name not in RESULT_FIELDS))
+    writer.open(columns + RESULT_FIELDS)
+
+    chain = create_email_chain(get_chat_model(model=MODEL, temperature=0.4, priority="batch"))
+    try:
+        # Yield to interactive app traffic sharing the gateway's rate limit
+        with gateway.priority("batch"):
+            counts, seconds = asyncio.run(run(chain, pending, writer, args.concurrency))
+    finally:
+        writer.close()
+
+    logger.info(
+        "Done: %d ok, %d failed in %.0fs (%.0f emails/h)",
+        counts["ok"], counts["error"], seconds, (counts["ok"] + counts["error"]) / seconds * 3600
+    )
+    for row in metrics.store.summary():
+        labels = " ".join(f"{key}={value}" for key, value in row.items()
+                          if key not in ("metric", "count", "mean", "p50", "p95"))
+        logger.info("%s %s: n=%d mean=%g p50=%g p95=%g", row["metric"], labels,
+                    row["count"], row["mean"], row["p50"], row["p95"])
+    if args.metrics:
+        Path(args.metrics).write_text(metrics.render_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+EMAIL_TYPES = ["Professional", "Formal", "Friendly", "Cold Email", "Follow-up"]
+TONES = ["Polite", "Confident", "Friendly", "Persuasive", "Apologetic"]
+LENGTHS = ["Short", "Medium", "Detailed"]
+
+# -----------------------
+# Prompt Template
+# -----------------------
+prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are a smart professional email writing assistant.\n"
+     "Write clear, well-structured, and natural-sounding emails.\n"
+     "Return ONLY the email content.\n"
+     "Do NOT add explanations.\n"
+     "Format the email properly with subject, greeting, body, and closing.\n"
+    ),
+    ("human",
+     "Write a {email_type} email.\n"
+     "Tone: {tone}\n"
+     "Length: {length}\n"
+     "Context: {context}")
+])
+
+
+def create_email_chain(llm):
+    """Chain from (email_type, tone, length, context) to the email"""
+    return prompt | llm
@@ -1,13 +1,26 @@
 import streamlit as st
-from langchain_groq import ChatGroq
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter 
 from langchain.chains import RetrievalQA
 from dotenv import load_dotenv
 import tempfile
 import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel, span
+from common.registry import get_chat_model, get_embeddings, registry
+
+from answer_cache import default_answer_cache
+from hybrid import HybridRetriever, default_reranker
+from index_cache import cache_key, default_cache
+from index_manager import default_manager
+from ingest import ingest_pdf
+from streaming import StreamlitAnswerHandler, render_sources
 
 # ------------------------
 # Load Environment
@@ -16,69 +29,283 @@ load_dotenv()
 
 st.set_page_config(page_title="PDF RAG Chatbot", layout="centered")
 st.title(" RAG Chatbot ")
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
+
+# ------------------------
+# Indexing Settings
+# ------------------------
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
 
 # ------------------------
-# Initialize LLM
+# Initialize LLM (shared across reruns and sessions)
 # ------------------------
-llm = ChatGroq(
+llm = get_chat_model(
     model="llama-3.1-8b-instant",
-    temperature=0
+    temperature=0,
+    streaming=True
 )
 
 # ------------------------
-# Load Embedding Model
+# Load Embedding Model (loaded once per process)
 # ------------------------
-embeddings = HuggingFaceEmbeddings(
-    model_name="sentence-transformers/all-MiniLM-L6-v2"
-)
+embeddings = get_embeddings(EMBEDDING_MODEL)
 
 # ------------------------
-# File Upload
+# Vector Store Cache
+# ------------------------
+index_cache = default_cache()
+
+# ------------------------
+# Knowledge Base
+# ------------------------
+knowledge_base = default_manager(embeddings)
+
+# ------------------------
+# Answer Cache
 # ------------------------
-uploaded_file = st.file_uploader("Upload your PDF", type="pdf")
+answer_cache = default_answer_cache()
+
 
-if uploaded_file:
-    with st.spinner("Processing PDF..."):
+def build_vectorstore(pdf_bytes):
+    """Stream a PDF through parallel extraction and batched embedding"""
+    # Save file temporarily
+    with tempfile.NamedTemporaryFile(delete=False) as tmp:
+        tmp.write(pdf_bytes)
+        pdf_path = tmp.name
 
-        # Save file temporarily
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(uploaded_file.read())
-            pdf_path = tmp.name
+    progress_bar = st.progress(0.0, text="Reading PDF...")
 
-        # Load PDF
-        loader = PyPDFLoader(pdf_path)
-        documents = loader.load()
+    def report(pages_done, total_pages, chunks_done):
+        progress_bar.progress(
+            pages_done / total_pages,
+            text=f"Page {pages_done}/{total_pages} · {chunks_done} chunks embedded"
+        )
 
-        # Split text
+    try:
         splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=150
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP
         )
-        chunks = splitter.split_documents(documents)
+        with span("build_vectorstore"):
+            return ingest_pdf(pdf_path, embeddings, splitter, progress=report)
+    finally:
+        progress_bar.empty()
+        os.remove(pdf_path)
+
+
+# ------------------------
+# File Upload
+# ------------------------
+uploaded_files = st.file_uploader(
+    "Upload your PDFs",
+    type="pdf",
+    accept_multiple_files=True
+)
+
+# Only ingest each upload once per session, so removing a document from
+# the knowledge base is not undone by the file still sitting in the uploader
+if "ingested" not in st.session_state:
+    st.session_state.ingested = set()
 
-        # Create Vector Store
-        vectorstore = FAISS.from_documents(chunks, embeddings)
+settings = {
+    "embedding_model": EMBEDDING_MODEL,
+    "chunk_size": CHUNK_SIZE,
+    "chunk_overlap": CHUNK_OVERLAP,
+}
 
-        retriever = vectorstore.as_retriever()
+for uploaded_file in uploaded_files or []:
+    pdf_bytes = uploaded_file.getvalue()
+    key = cache_key(pdf_bytes, settings)
+    doc_id = key[:16]
+    if doc_id in st.session_state.ingested:
+        continue
 
-        # Create QA Chain
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm,
-            chain_type="stuff",
-            retriever=retriever
+    with st.spinner(f"Processing {uploaded_file.name}..."):
+        # Reuse the index from an earlier rerun/process when possible
+        vectorstore = index_cache.get_or_build(
+            key,
+            embeddings,
+            lambda: build_vectorstore(pdf_bytes),
+            settings
         )
+        with span("add_document"):
+            knowledge_base.add_document(
+                doc_id,
+                vectorstore,
+                {"name": uploaded_file.name, "size": len(pdf_bytes)}
+            )
 
-        st.success("PDF processed successfully!")
+    st.session_state.ingested.add(doc_id)
+    st.success(f"{uploaded_file.name} added to the knowledge base!")
 
-        # ------------------------
-        # Chat Interface
-        # ------------------------
-        query = st.text_input("Ask a question from the PDF")
+# ------------------------
+# Documents
+# ------------------------
+with st.sidebar:
+    st.header("Knowledge Base")
+    documents = knowledge_base.documents
+    st.caption(
+        f"{len(documents)} documents, {knowledge_base.total_chunks} chunks, "
+        f"{knowledge_base.active_backend} index"
+    )
 
-        if query:
-            with st.spinner("Thinking..."):
-                result = qa_chain.run(query)
-                st.write("### Answer:")
-                st.write(result)
+    for doc_id, info in list(documents.items()):
+        col1, col2 = st.columns([4, 1])
+        col1.write(f"{info['name']} ({info['chunks']} chunks)")
+        if col2.button("🗑", key=f"remove-{doc_id}"):
+            knowledge_base.remove_document(doc_id)
+            st.rerun()
 
-        os.remove(pdf_path)
+    selected = st.multiselect(
+        "Search in",
+        options=list(documents),
+        format_func=lambda doc_id: documents[doc_id]["name"],
+        help="Leave empty to search every document"
+    )
+
+    st.header("Retrieval")
+    use_hybrid = st.toggle(
+        "Hybrid search (BM25 + vectors)",
+        value=True,
+        help="Also match exact identifiers, error codes and part numbers"
+    )
+    use_rerank = st.toggle(
+        "Rerank with cross-encoder",
+        value=False,
+        disabled=not use_hybrid
+    )
+    use_answer_cache = st.toggle(
+        "Reuse answers to similar questions",
+        value=True,
+        help="Turn off to always search and ask the LLM"
+    )
+
+if knowledge_base.documents:
+    if use_hybrid:
+        retriever = HybridRetriever(
+            manager=knowledge_base,
+            doc_ids=selected,
+            reranker=default_reranker() if use_rerank else None
+        )
+    else:
+        retriever = knowledge_base.as_retriever(doc_ids=selected)
+
+    # Create QA Chain
+    qa_chain = RetrievalQA.from_chain_type(
+        llm=llm,
+        chain_type="stuff",
+        retriever=retriever
+    )
+
+    # ------------------------
+    # Chat Interface
+    # ------------------------
+    query = st.text_input("Ask a question from your documents")
+
+    if query:
+        st.write("### Answer:")
+        answer_box = st.empty()
+        sources_box = st.container()
+
+        # Answers are only reused for the same documents and retrieval mode
+        index_id = f"{knowledge_base.fingerprint(selected)}:{use_hybrid}:{use_rerank}"
+        with span("embed_query"):
+            query_vector = embeddings.embed_query(query)
+        # The question stays in the box across reruns (toggles, downloads);
+        # only count it towards the hit rate the first time it is asked
+        asked = (index_id, query)
+        new_question = st.session_state.get("last_question") != asked
+        st.session_state.last_question = asked
+        cached = answer_cache.lookup(index_id, query_vector, record=new_question) if use_answer_cache else None
+
+        if cached:
+            answer_box.markdown(cached["answer"])
+            render_sources(sources_box, cached["documents"])
+            st.caption(
+                f"⚡ Cached answer to a similar question: “{cached['query']}” "
+                f"(similarity {cached['similarity']:.2f})"
+            )
+        else:
+            answer_box.caption("Searching your documents...")
+
+            # Sources render when retrieval ends, tokens as they stream in
+            handler = StreamlitAnswerHandler(answer_box, sources_box)
+            with span("qa_chain", hybrid=use_hybrid, rerank=use_rerank):
+                result = qa_chain.run(query, callbacks=[handler])
+            metrics = handler.finish(result)
+
+            if "query_metrics" not in st.session_state:
+                st.session_state.query_metrics = []
+            st.session_state.query_metrics.append({"query": query, **metrics})
+
+            answer_cache.store(
+                index_id,
+                query,
+                query_vector,
+                result,
+                handler.documents,
+                metrics["tokens"] + metrics["prompt_tokens"],
+                metrics["total_ms"]
+            )
+
+            st.caption(
+                f"Retrieval {metrics['retrieval_ms'] or 0:.0f} ms · "
+                f"first token {metrics['ttft_ms'] or metrics['total_ms']:.0f} ms · "
+                f"total {metrics['total_ms']:.0f} ms"
+            )
+            if use_hybrid:
+                st.caption("Retrieval latency: " + " · ".join(
+                    f"{stage} {ms:.1f} ms" for stage, ms in retriever.timings.items()
+                ))
+
+# ------------------------
+# Stats
+# ------------------------
+with st.sidebar:
+    if st.session_state.get("query_metrics"):
+        st.header("Latency")
+        history = st.session_state.query_metrics
+        st.dataframe(
+            [
+                {
+                    "query": m["query"][:40],
+                    "retrieval ms": round(m["retrieval_ms"] or 0),
+                    "TTFT ms": round(m["ttft_ms"] or m["total_ms"]),
+                    "total ms": round(m["total_ms"]),
+                }
+                for m in reversed(history)
+            ],
+            hide_index=True
+        )
+
+    st.header("Answer Cache")
+    answer_stats = answer_cache.stats()
+    st.metric("Hit rate", f"{answer_stats['hit_rate']:.0%}")
+    st.caption(
+        f"{answer_stats['hits']}/{answer_stats['lookups']} questions answered from cache · "
+        f"≈{answer_stats['saved_tokens']:,} tokens and "
+        f"{answer_stats['saved_ms'] / 1000:.1f} s saved"
+    )
+    if st.button("Clear answers"):
+        answer_cache.clear()
+
+    st.header("Models")
+    for name, seconds in registry.load_times().items():
+        st.caption(f"{name} loaded in {seconds:.2f} s")
+
+    st.header("Index Cache")
+    stats = index_cache.stats()
+    st.metric("Hits", stats["hits"])
+    st.metric("Misses", stats["misses"])
+    st.caption(
+        f"{stats['entries']} indexes, "
+        f"{stats['size_bytes'] / 1024 ** 2:.1f} / "
+        f"{stats['max_bytes'] / 1024 ** 2:.0f} MB"
+    )
+    if st.button("Clear cache"):
+        index_cache.clear()
+
+debug_panel()
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+SIMILARITY_THRESHOLD = float(os.getenv("RAG_ANSWER_CACHE_THRESHOLD", 0.92))
+MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", 2000))
+TTL_SECONDS = float(os.getenv("RAG_ANSWER_CACHE_TTL", 24 * 3600))
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype="float32")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """Answers to earlier questions, matched by query-embedding similarity.
+
+    Entries are scoped to an index id (which documents were searched, and
+    how), so an answer is only reused for the same knowledge. Lookups
+    compare the new query's embedding with every cached query for that
+    index by cosine similarity; the best match above `threshold` is a hit.
+    Eviction is LRU once `max_entries` is reached, and entries older than
+    `ttl` seconds are dropped.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._by_index = {}
+        self._ids = count()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.saved_tokens = 0
+        self.saved_ms = 0.0
+
+    def lookup(self, index_id, vector, record=True):
+        """Best cached entry for `index_id` within threshold, else None.
+
+        `record=False` leaves the hit and savings counters alone, for
+        re-displaying an answer to a question that was already counted.
+        """
+        query = _unit(vector)
+        now = time.time()
+        with self._lock:
+            if record:
+                self.lookups += 1
+            ids = list(self._by_index.get(index_id, ()))
+            for entry_id in ids:
+                if now - self._entries[entry_id]["created"] > self.ttl:
+                    self._drop(entry_id)
+            ids = list(self._by_index.get(index_id, ()))
+            if not ids:
+                return None
+
+            matrix = np.stack([self._entries[i]["vector"] for i in ids])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            entry = self._entries[entry_id]
+            if record:
+                self.hits += 1
+                self.saved_tokens += entry["tokens"]
+                self.saved_ms += entry["latency_ms"]
+            return {**entry, "similarity": float(similarities[best])}
+
+    def store(self, index_id, query, vector, answer, documents, tokens, latency_ms):
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "index_id": index_id,
+                "query": query,
+                "vector": _unit(vector),
+                "answer": answer,
+                "documents": documents,
+                "tokens": tokens,
+                "latency_ms": latency_ms,
+                "created": time.time(),
+            }
+            self._by_index.setdefault(index_id, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        ids = self._by_index[entry["index_id"]]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_index[entry["index_id"]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_index.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "saved_tokens": self.saved_tokens,
+                "saved_ms": self.saved_ms,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_answer_cache():
+    """Process-wide answer cache, shared by every session"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SemanticAnswerCache()
+        return _default_cache
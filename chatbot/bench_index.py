@@ -0,0 +1,142 @@
+"""Compare FAISS index backends on recall@k, latency and memory.
+
+Examples:
+    python bench_index.py --synthetic 100000
+    python bench_index.py --kb ~/.cache/rag_chatbot/knowledge_base --json results.json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from index_backends import BACKENDS, build_index, default_nlist, index_bytes
+
+NPROBE_SWEEP = (1, 4, 8, 16, 32, 64)
+EF_SEARCH_SWEEP = (16, 32, 64, 128)
+
+
+def synthetic_vectors(n, dim, clusters=200, seed=0):
+    """Unit-norm clustered vectors, shaped roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.normal(size=(n, dim))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype("float32")
+
+
+def kb_vectors(kb_dir):
+    files = sorted((Path(kb_dir).expanduser() / "vectors").glob("*.npy"))
+    if not files:
+        raise SystemExit(f"No stored vectors under {kb_dir}/vectors")
+    return np.concatenate([np.load(f) for f in files]).astype("float32")
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    hits = sum(len(set(f[:k]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def measure(index, queries, k, truth):
+    latencies = []
+    found = []
+    # One query at a time: that is how the chatbot searches
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    latencies = np.array(latencies)
+    return {
+        "recall": recall_at_k(np.array(found), truth),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+    }
+
+
+def run(base, queries, k, backends):
+    import faiss
+
+    exact = faiss.IndexFlatL2(base.shape[1])
+    exact.add(base)
+    _, truth = exact.search(queries, k)
+    flat_bytes = index_bytes(exact)
+
+    results = []
+    for backend in backends:
+        start = time.perf_counter()
+        index = build_index(base, backend)
+        build_s = time.perf_counter() - start
+        size = index_bytes(index)
+
+        if backend.startswith("ivf_"):
+            sweep = [("nprobe", p) for p in NPROBE_SWEEP if p <= default_nlist(len(base))]
+        elif backend == "hnsw":
+            sweep = [("efSearch", ef) for ef in EF_SEARCH_SWEEP]
+        else:
+            sweep = [(None, None)]
+
+        for param, value in sweep:
+            if param == "nprobe":
+                index.nprobe = value
+            elif param == "efSearch":
+                index.hnsw.efSearch = value
+            row = {
+                "backend": backend,
+                "param": f"{param}={value}" if param else "",
+                "build_s": round(build_s, 3),
+                "bytes": size,
+                "compression": round(flat_bytes / size, 1),
+                **measure(index, queries, k, truth),
+            }
+            results.append(row)
+            print(
+                f"{backend:9} {row['param']:12} recall@{k}={row['recall']:.3f}  "
+                f"p50={row['p50_ms']:.2f}ms  p95={row['p95_ms']:.2f}ms  "
+                f"{size / 1024 ** 2:8.1f} MB ({row['compression']}x)  build={build_s:.1f}s"
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, metavar="N", help="N synthetic vectors")
+    source.add_argument("--kb", help="knowledge base directory (uses its stored vectors)")
+    source.add_argument("--vectors", help=".npy file of float32 vectors")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        vectors = synthetic_vectors(args.synthetic + args.queries, args.dim)
+    elif args.kb:
+        vectors = kb_vectors(args.kb)
+    else:
+        vectors = np.load(args.vectors).astype("float32")
+
+    # Hold out queries so they are not trivially their own nearest neighbour
+    rng = np.random.default_rng(1)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:args.queries]]
+    base = np.ascontiguousarray(vectors[order[args.queries:]])
+    print(f"{len(base)} vectors, dim {base.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    results = run(base, queries, args.k, args.backends)
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "vectors": len(base),
+            "dim": int(base.shape[1]),
+            "queries": len(queries),
+            "k": args.k,
+            "results": results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Ingestion and query benchmark for the RAG chatbot.
+
+Generates synthetic PDFs with known facts, ingests them the way the app
+does, then asks labelled questions through the app's retrievers and a
+deterministic stand-in for ChatGroq. Results are printed and can be
+written as JSON to diff runs across changes.
+
+Examples:
+    python benchmark.py --pages 300 --questions 100
+    python benchmark.py --docs 20 --pages 50 --embeddings hash --json run.json
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain.chains import RetrievalQA
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from fake_llm import FakeChatGroq
+from hybrid import HybridRetriever
+from index_manager import IndexManager
+from ingest import EMBED_BATCH_SIZE, ingest_pdf, iter_pages
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 150
+
+# ------------------------
+# Synthetic corpus
+# ------------------------
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "qua", "dor", "fen", "gil", "hob"]
+ADJECTIVES = ["primary", "auxiliary", "thermal", "hydraulic", "optical", "backup", "main", "remote"]
+NOUNS = ["pump", "valve", "sensor", "relay", "controller", "gateway", "compressor", "actuator"]
+
+
+def _vocabulary(rng, size=2000):
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+def synthetic_document(doc_index, pages, lines_per_page=45, seed=0):
+    """Pages of filler text, each with one labelled fact, plus its questions"""
+    rng = random.Random(f"{seed}:{doc_index}")
+    vocabulary = _vocabulary(rng)
+    page_lines, questions = [], []
+    for page in range(pages):
+        lines = [" ".join(rng.choices(vocabulary, k=12)) for _ in range(lines_per_page)]
+        subject = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} unit {doc_index}-{page}"
+        code = f"SC-{rng.randint(0, 0xFFFFFF):06X}"
+        lines.insert(rng.randrange(len(lines)), f"The service code for the {subject} is {code}.")
+        page_lines.append(lines)
+        questions.append({"question": f"What is the service code for the {subject}?", "answer": code})
+    return page_lines, questions
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path, pages):
+    """Write a minimal text-only PDF (one Helvetica text block per page)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        body = "BT /F1 9 Tf 11 TL 40 800 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        " ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+# ------------------------
+# Embeddings
+# ------------------------
+class HashingEmbeddings(Embeddings):
+    """Offline bag-of-words feature-hashing embeddings (no model download)"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype="float32")
+        for word in text.lower().split():
+            bucket = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=4).digest(), "little")
+            vector[bucket % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def load_embeddings(kind):
+    if kind == "hash":
+        return HashingEmbeddings()
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+
+
+# ------------------------
+# Measurement helpers
+# ------------------------
+def latency_summary(samples_ms):
+    samples = np.array(samples_ms)
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(samples.mean()), 2),
+        "p50_ms": round(float(np.percentile(samples, 50)), 2),
+        "p95_ms": round(float(np.percentile(samples, 95)), 2),
+        "p99_ms": round(float(np.percentile(samples, 99)), 2),
+    }
+
+
+def peak_rss_mb():
+    """Peak RSS of this process and of its (pool) children, in MB"""
+    scale = 1024 if sys.platform != "darwin" else 1024 ** 2
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+# ------------------------
+# Benchmarks
+# ------------------------
+def bench_ingestion(pdf_path, embeddings, splitter, workers):
+    """Each stage on its own, then the pipelined `ingest_pdf` end to end"""
+    pages, load_s = timed(lambda: list(iter_pages(pdf_path, workers)))
+    documents = [Document(page_content=text, metadata={"page": page}) for page, text in pages]
+    chunks, split_s = timed(splitter.split_documents, documents)
+    texts = [chunk.page_content for chunk in chunks]
+
+    def embed_all():
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        return vectors
+
+    vectors, embed_s = timed(embed_all)
+    _, index_s = timed(FAISS.from_embeddings, list(zip(texts, vectors)), embeddings)
+    vectorstore, pipeline_s = timed(ingest_pdf, pdf_path, embeddings, splitter, workers=workers)
+
+    return vectorstore, {
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "stages_s": {
+            "load": round(load_s, 3),
+            "split": round(split_s, 3),
+            "embed": round(embed_s, 3),
+            "index": round(index_s, 3),
+        },
+        "pipelined_s": round(pipeline_s, 3),
+        "pages_per_s": round(len(pages) / pipeline_s, 1),
+        "chunks_per_s": round(len(chunks) / pipeline_s, 1),
+    }
+
+
+def bench_queries(retriever, qa_chain, questions, k, concurrency):
+    retrieval_ms, found = [], 0
+    for item in questions:
+        documents, seconds = timed(retriever.invoke, item["question"])
+        retrieval_ms.append(seconds * 1000)
+        found += any(item["answer"] in doc.page_content for doc in documents[:k])
+
+    def ask(item):
+        _, seconds = timed(qa_chain.invoke, {"query": item["question"]})
+        return seconds * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        end_to_end_ms = list(pool.map(ask, questions))
+    wall_s = time.perf_counter() - start
+
+    return {
+        f"recall@{k}": round(found / len(questions), 4),
+        "retrieval": latency_summary(retrieval_ms),
+        "end_to_end": latency_summary(end_to_end_ms),
+        "queries_per_s": round(len(questions) / wall_s, 2),
+        "concurrency": concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1, help="number of synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=100, help="pages per PDF")
+    parser.add_argument("--questions", type=int, default=50, help="labelled questions to ask")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--retriever", choices=["hybrid", "dense"], default="hybrid")
+    parser.add_argument("--backend", default="auto", help="knowledge base index backend")
+    parser.add_argument("--embeddings", choices=["minilm", "hash"], default="minilm")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--concurrency", type=int, default=1, help="concurrent simulated users")
+    parser.add_argument("--ttft-ms", type=float, default=200.0, help="fake LLM time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=800.0, help="fake LLM token rate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    try:
+        embeddings = load_embeddings(args.embeddings)
+        splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        manager = IndexManager(embeddings, root=os.path.join(workdir, "kb"), backend=args.backend)
+
+        ingestion, questions = [], []
+        for doc_index in range(args.docs):
+            pages, doc_questions = synthetic_document(doc_index, args.pages, seed=args.seed)
+            pdf_path = os.path.join(workdir, f"doc-{doc_index}.pdf")
+            write_pdf(pdf_path, pages)
+            vectorstore, stats = bench_ingestion(pdf_path, embeddings, splitter, args.workers)
+            _, add_s = timed(manager.add_document, f"doc{doc_index}", vectorstore, {"name": pdf_path})
+            ingestion.append({**stats, "kb_add_s": round(add_s, 3)})
+            questions.extend(doc_questions)
+            print(f"doc {doc_index}: {stats['pages']} pages, {stats['chunks']} chunks in {stats['pipelined_s']}s")
+
+        random.Random(args.seed).shuffle(questions)
+        questions = questions[:args.questions]
+
+        if args.retriever == "hybrid":
+            retriever = HybridRetriever(manager=manager, k=args.k)
+        else:
+            retriever = manager.as_retriever(k=args.k)
+        llm = FakeChatGroq(ttft_ms=args.ttft_ms, tokens_per_second=args.tokens_per_s)
+        qa_chain = RetrievalQA.from_chain_type(llm=llm, chain_type="stuff", retriever=retriever)
+        queries = bench_queries(retriever, qa_chain, questions, args.k, args.concurrency)
+
+        total_pages = sum(item["pages"] for item in ingestion)
+        total_s = sum(item["pipelined_s"] for item in ingestion)
+        results = {
+            "config": vars(args),
+            "corpus": {
+                "documents": args.docs,
+                "pages": total_pages,
+                "chunks": manager.total_chunks,
+                "index_backend": manager.active_backend,
+            },
+            "ingestion": {
+                "per_document": ingestion,
+                "pages_per_s": round(total_pages / total_s, 1) if total_s else math.nan,
+            },
+            "queries": queries,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import heapq
+import math
+import pickle
+import re
+from array import array
+from collections import Counter
+
+# Identifiers such as "ERR_CONN-42" or "XK-4821.b" are kept whole *and* split
+# into parts, so both the exact code and its pieces can be matched.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+PART_RE = re.compile(r"[a-z0-9]+")
+
+# Rebuild postings once this fraction of the slots belongs to deleted chunks
+COMPACT_RATIO = 0.25
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    """Compact in-memory BM25 inverted index over text chunks.
+
+    Chunks live in numbered slots; postings are per-term pairs of
+    `array`s (slot, term frequency) rather than Python objects, which keeps
+    tens of thousands of chunks to a few MB. Removing a chunk only marks
+    its slot dead; postings are compacted once enough slots are dead.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunk_ids = []
+        self.doc_ids = []
+        self.lengths = array("I")
+        self.alive = bytearray()
+        self.postings = {}
+        self.slot_of = {}
+        self.total_length = 0
+        self.dead = 0
+
+    def __len__(self):
+        return len(self.chunk_ids) - self.dead
+
+    def add(self, chunk_ids, texts, doc_ids):
+        for chunk_id, text, doc_id in zip(chunk_ids, texts, doc_ids):
+            if chunk_id in self.slot_of:
+                self._kill(self.slot_of[chunk_id])
+            slot = len(self.chunk_ids)
+            tokens = tokenize(text)
+            for term, tf in Counter(tokens).items():
+                slots, tfs = self.postings.setdefault(term, (array("I"), array("H")))
+                slots.append(slot)
+                tfs.append(min(tf, 0xFFFF))
+            self.chunk_ids.append(chunk_id)
+            self.doc_ids.append(doc_id)
+            self.lengths.append(len(tokens))
+            self.alive.append(1)
+            self.slot_of[chunk_id] = slot
+            self.total_length += len(tokens)
+
+    def remove(self, chunk_ids):
+        for chunk_id in chunk_ids:
+            slot = self.slot_of.get(chunk_id)
+            if slot is not None:
+                self._kill(slot)
+        if self.dead and self.dead >= COMPACT_RATIO * len(self.chunk_ids):
+            self.compact()
+
+    def _kill(self, slot):
+        del self.slot_of[self.chunk_ids[slot]]
+        self.alive[slot] = 0
+        self.total_length -= self.lengths[slot]
+        self.dead += 1
+
+    def compact(self):
+        """Drop dead slots and renumber the survivors"""
+        remap = {}
+        chunk_ids, doc_ids, lengths = [], [], array("I")
+        for slot, alive in enumerate(self.alive):
+            if alive:
+                remap[slot] = len(chunk_ids)
+                chunk_ids.append(self.chunk_ids[slot])
+                doc_ids.append(self.doc_ids[slot])
+                lengths.append(self.lengths[slot])
+
+        postings = {}
+        for term, (slots, tfs) in self.postings.items():
+            new_slots, new_tfs = array("I"), array("H")
+            for slot, tf in zip(slots, tfs):
+                if slot in remap:
+                    new_slots.append(remap[slot])
+                    new_tfs.append(tf)
+            if new_slots:
+                postings[term] = (new_slots, new_tfs)
+
+        self.chunk_ids = chunk_ids
+        self.doc_ids = doc_ids
+        self.lengths = lengths
+        self.alive = bytearray(b"\x01" * len(chunk_ids))
+        self.postings = postings
+        self.slot_of = {chunk_id: slot for slot, chunk_id in enumerate(chunk_ids)}
+        self.dead = 0
+
+    def search(self, query, k=10, doc_ids=None):
+        """Top-k (chunk_id, score) pairs, optionally limited to `doc_ids`"""
+        n = len(self)
+        if not n:
+            return []
+        allowed = set(doc_ids) if doc_ids else None
+        avg_length = self.total_length / n or 1.0
+        k1, b = self.k1, self.b
+
+        scores = {}
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            slots, tfs = self.postings[term]
+            idf = math.log(1 + (n - len(slots) + 0.5) / (len(slots) + 0.5))
+            for slot, tf in zip(slots, tfs):
+                if not self.alive[slot]:
+                    continue
+                if allowed is not None and self.doc_ids[slot] not in allowed:
+                    continue
+                norm = k1 * (1 - b + b * self.lengths[slot] / avg_length)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(self.chunk_ids[slot], score) for slot, score in best]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self.__dict__, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        with open(path, "rb") as f:
+            index.__dict__.update(pickle.load(f))
+        return index
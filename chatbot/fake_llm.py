@@ -0,0 +1,11 @@
+import sys
+from pathlib import Path
+
+# The fake model lives with the shared helpers so every app's load test can use it
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.fake_llm import FakeChatGroq, FakeLLMError
+
+__all__ = ["FakeChatGroq", "FakeLLMError"]
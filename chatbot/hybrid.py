@@ -0,0 +1,122 @@
+import threading
+import time
+from typing import Any, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+from index_manager import IndexManager
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(rankings, weights, k=RRF_K):
+    """Fuse ranked id lists; each contributes weight / (k + rank).
+
+    Rank-based fusion sidesteps the fact that L2 distances and BM25 scores
+    live on unrelated scales.
+    """
+    scores = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class CrossEncoderReranker:
+    """CPU cross-encoder that rescores (query, chunk) pairs"""
+
+    def __init__(self, model_name=RERANK_MODEL):
+        self.model_name = model_name
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device="cpu")
+            return self._model
+
+    def rerank(self, query, documents, top_n):
+        if not documents:
+            return []
+        scores = self.model.predict([(query, doc.page_content) for doc in documents])
+        ranked = sorted(zip(documents, scores), key=lambda pair: pair[1], reverse=True)
+        return [doc for doc, _ in ranked[:top_n]]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + dense retrieval over an `IndexManager`, fused with RRF.
+
+    Each stage's wall time (in ms) from the last query is left in
+    `timings` so the UI can show where retrieval time goes.
+    """
+
+    manager: IndexManager
+    k: int = 4
+    candidates: int = 20
+    dense_weight: float = 1.0
+    lexical_weight: float = 1.0
+    doc_ids: list = []
+    reranker: Optional[Any] = None
+    timings: dict = {}
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        timings = {}
+        start = time.perf_counter()
+
+        vector = self.manager.embeddings.embed_query(query)
+        mark = time.perf_counter()
+        timings["embed"] = (mark - start) * 1000
+
+        dense = self.manager.dense_search(vector, k=self.candidates, doc_ids=self.doc_ids)
+        now = time.perf_counter()
+        timings["dense"] = (now - mark) * 1000
+        mark = now
+
+        lexical = self.manager.lexical_search(query, k=self.candidates, doc_ids=self.doc_ids)
+        now = time.perf_counter()
+        timings["bm25"] = (now - mark) * 1000
+        mark = now
+
+        by_id = {doc.metadata["chunk_id"]: doc for doc, _ in dense + lexical}
+        fused = reciprocal_rank_fusion(
+            [
+                [doc.metadata["chunk_id"] for doc, _ in dense],
+                [doc.metadata["chunk_id"] for doc, _ in lexical],
+            ],
+            [self.dense_weight, self.lexical_weight],
+        )
+        documents = [by_id[chunk_id] for chunk_id in fused]
+        now = time.perf_counter()
+        timings["fusion"] = (now - mark) * 1000
+        mark = now
+
+        if self.reranker is not None:
+            documents = self.reranker.rerank(query, documents, self.k)
+            now = time.perf_counter()
+            timings["rerank"] = (now - mark) * 1000
+        else:
+            documents = documents[:self.k]
+
+        timings["total"] = (time.perf_counter() - start) * 1000
+        self.timings.clear()
+        self.timings.update(timings)
+        return documents
+
+
+_default_reranker = None
+_default_lock = threading.Lock()
+
+
+def default_reranker():
+    """Process-wide reranker, so the cross-encoder loads once"""
+    global _default_reranker
+    with _default_lock:
+        if _default_reranker is None:
+            _default_reranker = CrossEncoderReranker()
+        return _default_reranker
@@ -0,0 +1,125 @@
+import math
+import os
+
+import numpy as np
+
+# ------------------------
+# Backend selection
+# ------------------------
+# flat      exact search, float32 (4 bytes/dim)
+# sq8       exact-order scan over int8 scalar-quantized vectors (4x smaller)
+# hnsw      graph index, float32; fastest queries, but no in-place deletes
+# ivf_flat  inverted lists, float32
+# ivf_sq8   inverted lists, int8 (4x smaller)
+# ivf_pq    inverted lists, product-quantized (~16x smaller)
+BACKENDS = ("flat", "sq8", "hnsw", "ivf_flat", "ivf_sq8", "ivf_pq")
+
+FLAT_MAX_CHUNKS = int(os.getenv("RAG_FLAT_MAX_CHUNKS", 20_000))
+SQ8_MAX_CHUNKS = int(os.getenv("RAG_SQ8_MAX_CHUNKS", 200_000))
+
+# faiss wants ~39 training points per IVF centroid (and PQ codebook entry)
+MIN_POINTS_PER_LIST = 39
+MIN_TRAIN_POINTS = {
+    "ivf_flat": 1_000,
+    "ivf_sq8": 1_000,
+    "ivf_pq": 39 * 256,
+}
+HNSW_NEIGHBORS = 32
+PQ_COMPRESSION = 16
+
+
+def choose_backend(n_chunks):
+    """Pick the cheapest backend that keeps recall high for `n_chunks`"""
+    if n_chunks <= FLAT_MAX_CHUNKS:
+        return "flat"
+    if n_chunks <= SQ8_MAX_CHUNKS:
+        return "ivf_sq8"
+    return "ivf_pq"
+
+
+def can_build(backend, n_chunks):
+    """Whether there is enough data to train `backend`"""
+    return n_chunks >= MIN_TRAIN_POINTS.get(backend, 0)
+
+
+def supports_delete(backend):
+    """Whether LangChain's position-based `FAISS.delete` is safe on `backend`.
+
+    Only flat indexes renumber vectors after `remove_ids`; IVF keeps stale
+    ids and HNSW cannot remove at all, so `IndexManager` tombstones removed
+    chunks on those instead.
+    """
+    return backend in ("flat", "sq8")
+
+
+def default_nlist(n_vectors):
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_LIST))
+
+
+def default_nprobe(nlist):
+    return max(1, min(nlist, max(8, nlist // 16)))
+
+
+def pq_subquantizers(dim, compression=PQ_COMPRESSION):
+    """Largest m dividing `dim` with m bytes/vector <= 4 * dim / compression"""
+    target = max(1, 4 * dim // compression)
+    return max(m for m in range(1, target + 1) if dim % m == 0)
+
+
+def build_index(vectors, backend, nlist=None, nprobe=None, ef_search=64):
+    """Create, train and fill a faiss index of type `backend`"""
+    import faiss
+
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n, dim = vectors.shape
+
+    if backend == "flat":
+        index = faiss.IndexFlatL2(dim)
+    elif backend == "sq8":
+        index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+    elif backend == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, HNSW_NEIGHBORS)
+        index.hnsw.efSearch = ef_search
+    elif backend.startswith("ivf_"):
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatL2(dim)
+        if backend == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+        elif backend == "ivf_sq8":
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dim, nlist, faiss.ScalarQuantizer.QT_8bit
+            )
+        elif backend == "ivf_pq":
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_subquantizers(dim), 8)
+        else:
+            raise ValueError(f"Unknown index backend: {backend}")
+        index.nprobe = nprobe or default_nprobe(nlist)
+    else:
+        raise ValueError(f"Unknown index backend: {backend}")
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def index_bytes(index):
+    """Serialized size of a faiss index, a good proxy for its RAM use"""
+    import faiss
+
+    return faiss.serialize_index(index).nbytes
+
+
+def build_vectorstore(texts, vectors, metadatas, ids, embeddings, backend):
+    """LangChain FAISS store over a `backend` index built from precomputed vectors"""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    index = build_index(vectors, backend)
+    docstore = InMemoryDocstore({
+        chunk_id: Document(page_content=text, metadata=metadata)
+        for chunk_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+CACHE_DIR = Path(os.getenv(
+    "RAG_INDEX_CACHE_DIR",
+    Path.home() / ".cache" / "rag_chatbot" / "indexes"
+))
+MAX_CACHE_BYTES = int(os.getenv("RAG_INDEX_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+META_FILE = "meta.json"
+
+
+def cache_key(pdf_bytes, settings):
+    """Content address for a PDF plus the settings used to index it"""
+    digest = hashlib.sha256()
+    digest.update(pdf_bytes)
+    digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache, so hit/miss counters survive Streamlit reruns"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = IndexCache()
+        return _default_cache
+
+
+def _dir_size(path):
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class IndexCache:
+    """On-disk cache of FAISS vector stores keyed by `cache_key`.
+
+    Entries are written atomically (build in a temp dir, then rename) so
+    several Streamlit workers can share one cache directory. Each hit bumps
+    the entry's mtime, and eviction removes least recently used entries
+    until the total size fits in `max_bytes`.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry(self, key):
+        return self.root / key
+
+    def get(self, key, embeddings):
+        """Return the cached vector store for `key`, or None on a miss"""
+        path = self._entry(key)
+        try:
+            vectorstore = self._load(path, embeddings)
+            os.utime(path)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError, RuntimeError):
+            # Missing, half-evicted or unreadable entries all count as misses
+            vectorstore = None
+
+        with self._lock:
+            if vectorstore is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vectorstore
+
+    def put(self, key, vectorstore, settings=None):
+        """Persist `vectorstore` under `key` and evict down to budget"""
+        path = self._entry(key)
+        tmp = Path(tempfile.mkdtemp(prefix=f".{key[:12]}-", dir=self.root))
+        try:
+            vectorstore.save_local(str(tmp))
+            meta = {
+                "created": time.time(),
+                "chunks": vectorstore.index.ntotal,
+                "settings": settings or {},
+            }
+            (tmp / META_FILE).write_text(json.dumps(meta))
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another worker stored the same entry first; keep theirs
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict(keep=key)
+
+    def get_or_build(self, key, embeddings, build, settings=None):
+        """Load `key` from the cache, building and storing it on a miss"""
+        vectorstore = self.get(key, embeddings)
+        if vectorstore is None:
+            vectorstore = build()
+            self.put(key, vectorstore, settings)
+        return vectorstore
+
+    def entries(self):
+        """List (key, size_bytes, last_used) for every stored entry"""
+        result = []
+        for path in self.root.iterdir():
+            if path.name.startswith(".") or not path.is_dir():
+                continue
+            try:
+                result.append((path.name, _dir_size(path), path.stat().st_mtime))
+            except FileNotFoundError:
+                continue
+        return result
+
+    def evict(self, keep=None):
+        """Drop least recently used entries until under `max_bytes`"""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        for key, _, _ in self.entries():
+            shutil.rmtree(self._entry(key), ignore_errors=True)
+
+    def stats(self):
+        entries = self.entries()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(entries),
+                "size_bytes": sum(size for _, size, _ in entries),
+                "max_bytes": self.max_bytes,
+            }
+
+    @staticmethod
+    def _load(path, embeddings):
+        import faiss
+        from langchain_community.vectorstores import FAISS
+
+        index_path = str(path / INDEX_FILE)
+        # Memory-map the vectors instead of reading them into RAM; older
+        # faiss builds only support this for some index types.
+        mmap_flags = (
+            faiss.IO_FLAG_MMAP
+            | faiss.IO_FLAG_READ_ONLY
+            | getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+        )
+        try:
+            index = faiss.read_index(index_path, mmap_flags)
+        except RuntimeError:
+            if not os.path.exists(index_path):
+                raise FileNotFoundError(index_path)
+            index = faiss.read_index(index_path)
+
+        with open(path / DOCSTORE_FILE, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        return FAISS(embeddings, index, docstore, index_to_docstore_id)
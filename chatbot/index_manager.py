@@ -0,0 +1,372 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+
+import numpy as np
+
+from bm25 import BM25Index
+from index_backends import BACKENDS, build_vectorstore, can_build, choose_backend, supports_delete
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+KB_DIR = Path(os.getenv(
+    "RAG_KB_DIR",
+    Path.home() / ".cache" / "rag_chatbot" / "knowledge_base"
+))
+# "auto" picks flat/IVF-SQ8/IVF-PQ by chunk count, see index_backends
+INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "auto")
+# Share of removed-but-still-indexed chunks that triggers a rebuild on
+# backends that cannot delete in place
+TOMBSTONE_FRACTION = float(os.getenv("RAG_TOMBSTONE_FRACTION", "0.2"))
+
+CURRENT = "current"
+MANIFEST_FILE = "documents.json"
+BM25_FILE = "bm25.pkl"
+VECTORS_DIR = "vectors"
+
+
+def _chunk_ids(doc_id, count):
+    return [f"{doc_id}:{i}" for i in range(count)]
+
+
+class IndexManager:
+    """One FAISS index over many documents, with add/remove by document id.
+
+    Every chunk carries a `doc_id` in its metadata and a docstore id of the
+    form "<doc_id>:<n>" (also stored as `chunk_id`), so a document can be
+    deleted without rebuilding the index and searches can be restricted to
+    a subset of documents. A BM25 index over the same chunks is kept in
+    step for lexical search.
+
+    The searchable index may be compressed (IVF/PQ/int8, see
+    `index_backends`), so each document's float32 vectors are also kept on
+    disk. They are the source for rebuilds: when the chunk count calls for
+    a different backend and when an IVF index has grown well past the data
+    it was trained on.
+
+    Backends that cannot delete in place (IVF, HNSW) keep a removed
+    document's vectors as tombstones: they stay in the index, searches
+    filter them out, and the index is rebuilt once they make up more than
+    TOMBSTONE_FRACTION of it.
+
+    Mutations and searches share a lock because FAISS indexes are not safe
+    to modify while they are being searched.
+    """
+
+    def __init__(self, embeddings, root=KB_DIR, backend=INDEX_BACKEND):
+        if backend != "auto" and backend not in BACKENDS:
+            raise ValueError(f"Unknown index backend: {backend}")
+        self.embeddings = embeddings
+        self.root = Path(root)
+        self.vectors_dir = self.root / VECTORS_DIR
+        self.vectors_dir.mkdir(parents=True, exist_ok=True)
+        self.backend = backend
+        self.active_backend = "flat"
+        self.trained_on = 0
+        self._lock = threading.RLock()
+        self.vectorstore = None
+        self.documents = {}
+        # doc_id -> chunk count of removed documents still in the index
+        self.removed = {}
+        self.bm25 = BM25Index()
+        self._load()
+
+    # ------------------------
+    # Persistence
+    # ------------------------
+    def _load(self):
+        from langchain_community.vectorstores import FAISS
+
+        path = self.root / CURRENT
+        if not (path / MANIFEST_FILE).exists():
+            return
+        manifest = json.loads((path / MANIFEST_FILE).read_text())
+        if "documents" not in manifest:
+            # Bases saved before backends were configurable: flat, no vectors
+            manifest = {"documents": manifest, "backend": "flat", "trained_on": 0}
+        self.documents = manifest["documents"]
+        self.active_backend = manifest["backend"]
+        self.trained_on = manifest["trained_on"]
+        self.removed = manifest.get("removed", {})
+
+        if self.documents:
+            self.vectorstore = FAISS.load_local(
+                str(path), self.embeddings, allow_dangerous_deserialization=True
+            )
+            if (path / BM25_FILE).exists():
+                self.bm25 = BM25Index.load(path / BM25_FILE)
+            else:
+                self._rebuild_bm25()
+            self._export_missing_vectors()
+
+    def _export_missing_vectors(self):
+        """Write per-document vectors for bases saved before they were kept"""
+        missing = [d for d in self.documents if not self._vectors_path(d).exists()]
+        if not missing:
+            return
+        position_of = {cid: pos for pos, cid in self.vectorstore.index_to_docstore_id.items()}
+        for doc_id in missing:
+            positions = [position_of[cid] for cid in _chunk_ids(doc_id, self.documents[doc_id]["chunks"])]
+            vectors = np.stack([self.vectorstore.index.reconstruct(p) for p in positions])
+            np.save(self._vectors_path(doc_id), vectors.astype("float32"))
+
+    def _rebuild_bm25(self):
+        """Index every stored chunk lexically (for bases saved without BM25)"""
+        self.bm25 = BM25Index()
+        for chunk_id in self.vectorstore.index_to_docstore_id.values():
+            chunk = self.vectorstore.docstore.search(chunk_id)
+            if chunk.metadata["doc_id"] not in self.documents:
+                continue
+            chunk.metadata.setdefault("chunk_id", chunk_id)
+            self.bm25.add([chunk_id], [chunk.page_content], [chunk.metadata["doc_id"]])
+
+    def _save(self):
+        tmp = self.root / ".saving"
+        old = self.root / ".old"
+        shutil.rmtree(tmp, ignore_errors=True)
+        shutil.rmtree(old, ignore_errors=True)
+        tmp.mkdir()
+        if self.vectorstore is not None:
+            self.vectorstore.save_local(str(tmp))
+            self.bm25.save(tmp / BM25_FILE)
+        manifest = {
+            "backend": self.active_backend,
+            "trained_on": self.trained_on,
+            "removed": self.removed,
+            "documents": self.documents,
+        }
+        (tmp / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+        current = self.root / CURRENT
+        if current.exists():
+            os.rename(current, old)
+        os.rename(tmp, current)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def _vectors_path(self, doc_id):
+        return self.vectors_dir / f"{doc_id}.npy"
+
+    # ------------------------
+    # Backends
+    # ------------------------
+    def target_backend(self, n_chunks=None):
+        n_chunks = self.total_chunks if n_chunks is None else n_chunks
+        if self.backend == "auto":
+            return choose_backend(n_chunks)
+        # Trained backends stay flat until there is enough data to train them
+        return self.backend if can_build(self.backend, n_chunks) else "flat"
+
+    def _needs_rebuild(self):
+        if self.target_backend() != self.active_backend:
+            return True
+        # IVF centroids drift out of date as the index outgrows its training set
+        return self.active_backend.startswith("ivf_") and self.total_chunks > 2 * self.trained_on
+
+    def rebuild(self, backend=None):
+        """Rebuild the searchable index from the stored per-document vectors"""
+        with self._lock:
+            backend = backend or self.target_backend()
+            self.vectorstore = self._build(self.documents, backend)
+            self.active_backend = backend
+            self.trained_on = sum(info["chunks"] for info in self.documents.values())
+            self.removed = {}
+
+    def _build(self, documents, backend):
+        """A new vectorstore over `documents`; the current index is left as is"""
+        if not documents:
+            return None
+        texts, metadatas, ids, vectors = [], [], [], []
+        for doc_id, info in documents.items():
+            chunk_ids = _chunk_ids(doc_id, info["chunks"])
+            for chunk_id in chunk_ids:
+                chunk = self.vectorstore.docstore.search(chunk_id)
+                texts.append(chunk.page_content)
+                metadatas.append(chunk.metadata)
+            ids.extend(chunk_ids)
+            vectors.append(np.load(self._vectors_path(doc_id), mmap_mode="r"))
+
+        return build_vectorstore(
+            texts, np.concatenate(vectors), metadatas, ids, self.embeddings, backend
+        )
+
+    # ------------------------
+    # Mutations
+    # ------------------------
+    def add_document(self, doc_id, vectorstore, metadata=None):
+        """Copy the chunks and vectors of a single-document store into the index.
+
+        `vectorstore` is typically the per-PDF store from `IndexCache`, so
+        adding a document never re-embeds it.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        metadata = dict(metadata or {})
+        count = vectorstore.index.ntotal
+        vectors = vectorstore.index.reconstruct_n(0, count)
+
+        ids = _chunk_ids(doc_id, count)
+        texts, metadatas = [], []
+        for position, chunk_id in enumerate(ids):
+            chunk = vectorstore.docstore.search(vectorstore.index_to_docstore_id[position])
+            texts.append(chunk.page_content)
+            metadatas.append({**chunk.metadata, **metadata, "doc_id": doc_id, "chunk_id": chunk_id})
+
+        pairs = list(zip(texts, vectors.tolist()))
+
+        with self._lock:
+            if doc_id in self.documents:
+                self._remove(doc_id)
+            if doc_id in self.removed:
+                # Its tombstoned chunks still hold the ids the new ones need
+                self.rebuild()
+            np.save(self._vectors_path(doc_id), vectors.astype("float32"))
+            if self.vectorstore is None:
+                self.vectorstore = FAISS.from_embeddings(
+                    pairs, self.embeddings, metadatas=metadatas, ids=ids
+                )
+                self.active_backend = "flat"
+            else:
+                self.vectorstore.add_embeddings(pairs, metadatas=metadatas, ids=ids)
+            self.bm25.add(ids, texts, [doc_id] * count)
+            self.documents[doc_id] = {**metadata, "chunks": count, "added": time.time()}
+            if self._needs_rebuild():
+                self.rebuild()
+            self._save()
+
+    def remove_document(self, doc_id):
+        with self._lock:
+            if doc_id not in self.documents:
+                raise KeyError(doc_id)
+            self._remove(doc_id)
+            if self._needs_rebuild():
+                self.rebuild()
+            self._save()
+
+    def _remove(self, doc_id):
+        """Drop a document from the index, BM25 and disk.
+
+        Nothing is changed until the index without the document exists, so
+        a failed rebuild leaves the base as it was.
+        """
+        count = self.documents[doc_id]["chunks"]
+        ids = _chunk_ids(doc_id, count)
+        remaining = {d: info for d, info in self.documents.items() if d != doc_id}
+        dead = sum(self.removed.values()) + count
+        if not remaining:
+            self.vectorstore = None
+            self.bm25 = BM25Index()
+            self.removed = {}
+        elif supports_delete(self.active_backend):
+            self.vectorstore.delete(ids)
+            self.bm25.remove(ids)
+        elif dead <= TOMBSTONE_FRACTION * self.vectorstore.index.ntotal:
+            self.removed[doc_id] = count
+            self.bm25.remove(ids)
+        else:
+            # The smaller base may no longer have enough points to train
+            # the current backend, so rebuild for what it calls for now
+            backend = self.target_backend(sum(info["chunks"] for info in remaining.values()))
+            self.vectorstore = self._build(remaining, backend)
+            self.active_backend = backend
+            self.trained_on = len(self.vectorstore.index_to_docstore_id)
+            self.removed = {}
+            self.bm25.remove(ids)
+        del self.documents[doc_id]
+        self._vectors_path(doc_id).unlink(missing_ok=True)
+
+    # ------------------------
+    # Search
+    # ------------------------
+    @property
+    def total_chunks(self):
+        return sum(info["chunks"] for info in self.documents.values())
+
+    def fingerprint(self, doc_ids=None):
+        """Stable id for the documents a search over `doc_ids` can see"""
+        with self._lock:
+            visible = sorted(d for d in (doc_ids or self.documents) if d in self.documents)
+        return hashlib.sha256("\n".join(visible).encode("utf-8")).hexdigest()[:16]
+
+    def _subset(self, doc_ids):
+        """Known ids among `doc_ids` and their total chunk count"""
+        doc_ids = [d for d in doc_ids if d in self.documents]
+        return doc_ids, sum(self.documents[d]["chunks"] for d in doc_ids)
+
+    def dense_search(self, vector, k=4, doc_ids=None):
+        """Top-k (Document, L2 distance) for a query embedding"""
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            if not doc_ids and not self.removed:
+                return self.vectorstore.similarity_search_with_score_by_vector(vector, k=k)
+
+            # With tombstones in the index, every search is filtered to the
+            # live documents
+            doc_ids, subset = self._subset(doc_ids or list(self.documents))
+            if not subset:
+                return []
+            # Over-fetch in proportion to how small the subset is, so the
+            # metadata filter usually still leaves k results; if the chosen
+            # documents rank low, double the fetch until it does.
+            total, wanted = self.vectorstore.index.ntotal, min(k, subset)
+            fetch_k = min(total, math.ceil(2 * k * total / subset))
+            while True:
+                results = self.vectorstore.similarity_search_with_score_by_vector(
+                    vector, k=k, filter={"doc_id": doc_ids}, fetch_k=fetch_k
+                )
+                if len(results) >= wanted or fetch_k >= total:
+                    return results
+                fetch_k = min(total, fetch_k * 2)
+
+    def lexical_search(self, query, k=4, doc_ids=None):
+        """Top-k (Document, BM25 score) for a query string"""
+        with self._lock:
+            if self.vectorstore is None:
+                return []
+            if doc_ids:
+                doc_ids, subset = self._subset(doc_ids)
+                if not subset:
+                    return []
+            hits = self.bm25.search(query, k=k, doc_ids=doc_ids)
+            return [(self.vectorstore.docstore.search(chunk_id), score) for chunk_id, score in hits]
+
+    def search(self, query, k=4, doc_ids=None):
+        """Top-k chunks for `query`, optionally restricted to `doc_ids`"""
+        vector = self.embeddings.embed_query(query)
+        return [doc for doc, _ in self.dense_search(vector, k=k, doc_ids=doc_ids)]
+
+    def as_retriever(self, k=4, doc_ids=None):
+        return KnowledgeBaseRetriever(manager=self, k=k, doc_ids=list(doc_ids or []))
+
+
+class KnowledgeBaseRetriever(BaseRetriever):
+    """LangChain retriever over an `IndexManager`"""
+
+    manager: IndexManager
+    k: int = 4
+    doc_ids: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager: CallbackManagerForRetrieverRun):
+        return self.manager.search(query, k=self.k, doc_ids=self.doc_ids)
+
+
+_default_manager = None
+_default_lock = threading.Lock()
+
+
+def default_manager(embeddings):
+    """Process-wide knowledge base shared by all sessions"""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = IndexManager(embeddings)
+        return _default_manager
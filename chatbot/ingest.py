@@ -0,0 +1,108 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Kept free of langchain/torch imports at module level: worker processes
+# import this module only to run `_extract_pages`.
+
+PAGES_PER_TASK = 8
+EMBED_BATCH_SIZE = 64
+
+
+def page_count(pdf_path):
+    from pypdf import PdfReader
+
+    return len(PdfReader(pdf_path).pages)
+
+
+def _extract_pages(pdf_path, start, stop):
+    """Worker: extract text for pages [start, stop) of one PDF"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
+
+
+def iter_pages(pdf_path, workers=None, pages_per_task=PAGES_PER_TASK):
+    """Yield (page_number, text) in page order, extracting in a process pool.
+
+    At most `2 * workers` page ranges are in flight at once, so memory
+    stays bounded no matter how long the document is.
+    """
+    total = page_count(pdf_path)
+    ranges = [
+        (start, min(start + pages_per_task, total))
+        for start in range(0, total, pages_per_task)
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(ranges))
+
+    # Pool start-up costs more than extracting a short document serially
+    if workers <= 1:
+        for start, stop in ranges:
+            yield from _extract_pages(pdf_path, start, stop)
+        return
+
+    pending_ranges = iter(ranges)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for start, stop in pending_ranges:
+            in_flight.append(pool.submit(_extract_pages, pdf_path, start, stop))
+            if len(in_flight) >= 2 * workers:
+                break
+
+        while in_flight:
+            pages = in_flight.popleft().result()
+            next_range = next(pending_ranges, None)
+            if next_range is not None:
+                in_flight.append(pool.submit(_extract_pages, pdf_path, *next_range))
+            yield from pages
+
+
+def ingest_pdf(pdf_path, embeddings, splitter, batch_size=EMBED_BATCH_SIZE,
+               workers=None, progress=None):
+    """Stream a PDF into a FAISS store: extract -> split -> embed in batches.
+
+    `progress(pages_done, total_pages, chunks_done)` is called after every
+    page so callers can report how far ingestion has got.
+    """
+    from langchain_core.documents import Document
+    from langchain_community.vectorstores import FAISS
+
+    total_pages = page_count(pdf_path)
+    vectorstore = None
+    pending = []
+    chunks_done = 0
+
+    def flush(batch):
+        nonlocal vectorstore, chunks_done
+        texts = [chunk.page_content for chunk in batch]
+        metadatas = [chunk.metadata for chunk in batch]
+        vectors = embeddings.embed_documents(texts)
+        if vectorstore is None:
+            vectorstore = FAISS.from_embeddings(
+                list(zip(texts, vectors)), embeddings, metadatas=metadatas
+            )
+        else:
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+        chunks_done += len(batch)
+
+    for pages_done, (page, text) in enumerate(iter_pages(pdf_path, workers), start=1):
+        # Same metadata PyPDFLoader attaches, so downstream code is unchanged
+        document = Document(page_content=text, metadata={"source": pdf_path, "page": page})
+        pending.extend(splitter.split_documents([document]))
+
+        while len(pending) >= batch_size:
+            flush(pending[:batch_size])
+            del pending[:batch_size]
+
+        if progress:
+            progress(pages_done, total_pages, chunks_done)
+
+    if pending:
+        flush(pending)
+        if progress:
+            progress(total_pages, total_pages, chunks_done)
+
+    if vectorstore is None:
+        raise ValueError("No text could be extracted from the PDF")
+    return vectorstore
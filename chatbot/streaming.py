@@ -0,0 +1,56 @@
+import time
+
+import streamlit as st
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+def render_sources(box, documents):
+    with box.expander(f"📚 Sources ({len(documents)})"):
+        for doc in documents:
+            name = doc.metadata.get("name", "document")
+            page = doc.metadata.get("page")
+            label = f"**{name}**" + (f" · page {page + 1}" if page is not None else "")
+            snippet = doc.page_content.replace("\n", " ")
+            st.markdown(label)
+            st.caption(snippet[:300] + ("…" if len(snippet) > 300 else ""))
+
+
+class StreamlitAnswerHandler(BaseCallbackHandler):
+    """Render a RetrievalQA run into Streamlit placeholders as it happens.
+
+    Sources are written as soon as the retriever returns, answer tokens as
+    they arrive from the LLM. Latencies (ms, measured from construction)
+    are collected in `metrics`.
+    """
+
+    def __init__(self, answer_box, sources_box):
+        self.answer_box = answer_box
+        self.sources_box = sources_box
+        self.text = ""
+        self.documents = []
+        self.start = time.perf_counter()
+        self.metrics = {"retrieval_ms": None, "ttft_ms": None, "total_ms": None, "tokens": 0}
+
+    def _elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def on_retriever_end(self, documents, **kwargs):
+        self.metrics["retrieval_ms"] = self._elapsed_ms()
+        self.documents = documents
+        render_sources(self.sources_box, documents)
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self.metrics["ttft_ms"] is None:
+            self.metrics["ttft_ms"] = self._elapsed_ms()
+        self.metrics["tokens"] += 1
+        self.text += token
+        self.answer_box.markdown(self.text + "▌")
+
+    def finish(self, answer):
+        """Render the final answer and stamp the total latency"""
+        self.metrics["total_ms"] = self._elapsed_ms()
+        # Streaming does not report usage; estimate the prompt at ~4 chars/token
+        context_chars = sum(len(doc.page_content) for doc in self.documents)
+        self.metrics["prompt_tokens"] = context_chars // 4
+        self.answer_box.markdown(answer)
+        return self.metrics
@@ -1,9 +1,24 @@
 import streamlit as st
 from dotenv import load_dotenv
 
-from langchain_groq import ChatGroq
 from langchain_core.messages import HumanMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate
+
+import logging
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel, span
+from common.registry import get_chat_model
+from common.streaming import format_metrics, stream_to
+from assistant import create_chat_chain
+from memory import MAX_DISPLAY_MESSAGES, ConversationMemory, create_summary_chain
+
+logger = logging.getLogger(__name__)
 
 # -----------------------------
 # Load Environment
@@ -21,45 +36,67 @@ st.set_page_config(
 
 st.title("🤖 AI Coding Assistant")
 st.caption("Powered by Groq LLaMA 3.1")
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
 
 # -----------------------------
-# Load Groq Model
+# Load Groq Model (shared across reruns and sessions)
 # -----------------------------
-llm = ChatGroq(
+llm = get_chat_model(
     model="llama-3.1-8b-instant",
     temperature=0.3
 )
 
 # -----------------------------
-# Prompt
+# Chain
 # -----------------------------
-prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an expert AI coding assistant.\n"
-     "ALWAYS return code inside triple backticks with language name.\n"
-     "Example:\n"
-     "```python\nprint('Hello')\n```\n"
-     "Explain only if user asks.\n"
-     "Be concise and accurate."
-    ),
-    ("human", "{question}")
-])
-
-chain = prompt | llm
+chain = create_chat_chain(llm)
+
+# Folds older turns into a short summary once the history outgrows its budget
+summary_chain = create_summary_chain(
+    get_chat_model(model="llama-3.1-8b-instant", temperature=0.0, priority="default", max_tokens=512)
+)
 
 # -----------------------------
 # Chat Memory
 # -----------------------------
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+
+memory = st.session_state.memory
+
+with st.sidebar:
+    st.header("🧠 Context")
+    memory_stats = memory.stats()
+    st.caption(
+        f"{memory_stats['recent_turns']} recent turns verbatim, "
+        f"summary ~{memory_stats['summary_tokens']} tokens, "
+        f"~{memory_stats['history_tokens']} history tokens per request"
+    )
+    if memory.summary:
+        with st.expander("Summary of earlier conversation"):
+            st.write(memory.summary)
+    if st.button("🗑️ Clear conversation"):
+        st.session_state.messages = []
+        st.session_state.hidden_messages = 0
+        st.session_state.memory = memory = ConversationMemory()
+        st.rerun()
 
 # -----------------------------
 # Show Chat History
 # -----------------------------
+hidden = st.session_state.get("hidden_messages", 0)
+if hidden:
+    st.caption(f"{hidden} earlier messages hidden (still in the conversation summary)")
+
 for msg in st.session_state.messages:
     role = "user" if isinstance(msg, HumanMessage) else "assistant"
     with st.chat_message(role):
         st.markdown(msg.content)
+        if msg.response_metadata.get("stream"):
+            st.caption(format_metrics(msg.response_metadata["stream"]))
 
 # -----------------------------
 # User Input
@@ -67,21 +104,42 @@ for msg in st.session_state.messages:
 user_input = st.chat_input("Ask your coding question...")
 
 if user_input:
-    st.session_state.messages.append(
-        HumanMessage(content=user_input)
-    )
-
     with st.chat_message("user"):
         st.markdown(user_input)
 
+    # Streams token by token; a new question while this runs stops the
+    # script and closes the stream, and the unfinished turn is not kept
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = chain.invoke(
-                {"question": user_input}
-            )
-            answer = response.content
-            st.markdown(answer)
+        answer, metrics = stream_to(
+            st.empty(),
+            chain,
+            {"question": user_input, "history": memory.messages()},
+            stage="answer"
+        )
+        st.caption(format_metrics(metrics))
 
     st.session_state.messages.append(
-        AIMessage(content=answer)
+        HumanMessage(content=user_input)
+    )
+    st.session_state.messages.append(
+        AIMessage(content=answer, response_metadata={"stream": metrics})
     )
+    memory.add_turn(user_input, answer)
+
+    # Keep the displayed history (and session memory) bounded
+    overflow = len(st.session_state.messages) - MAX_DISPLAY_MESSAGES
+    if overflow > 0:
+        del st.session_state.messages[:overflow]
+        st.session_state.hidden_messages = hidden + overflow
+
+    # After the answer is on screen, so the user never waits for this
+    if memory.needs_compaction():
+        with st.spinner("Condensing earlier conversation..."):
+            try:
+                with span("compact_memory"):
+                    memory.compact(summary_chain)
+            except Exception as e:
+                # Turns are only dropped once a summary exists, so the next turn retries
+                logger.warning("Conversation compaction failed: %s", e)
+
+debug_panel()
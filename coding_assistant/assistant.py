@@ -0,0 +1,22 @@
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+# -----------------------------
+# Prompt
+# -----------------------------
+prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an expert AI coding assistant.\n"
+     "ALWAYS return code inside triple backticks with language name.\n"
+     "Example:\n"
+     "```python\nprint('Hello')\n```\n"
+     "Explain only if user asks.\n"
+     "Be concise and accurate."
+    ),
+    MessagesPlaceholder("history"),
+    ("human", "{question}")
+])
+
+
+def create_chat_chain(llm):
+    """Chain from (question, history messages) to the answer"""
+    return prompt | llm
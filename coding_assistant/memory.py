@@ -0,0 +1,139 @@
+import hashlib
+import os
+import re
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+# -----------------------------
+# Defaults (override via environment)
+# -----------------------------
+# Tokens of verbatim recent turns sent with every question
+HISTORY_TOKENS = int(os.getenv("CODING_ASSISTANT_HISTORY_TOKENS", 2000))
+# Length cap for the running summary of older turns
+SUMMARY_TOKENS = int(os.getenv("CODING_ASSISTANT_SUMMARY_TOKENS", 400))
+# Messages kept for display; older ones are only in the summary
+MAX_DISPLAY_MESSAGES = int(os.getenv("CODING_ASSISTANT_MAX_MESSAGES", 100))
+
+CODE_BLOCK = re.compile(r"```([\w+-]*)\n(.*?)```", re.DOTALL)
+
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You maintain a running summary of a conversation between a developer and a coding assistant.\n"
+     "Update the summary with the new exchanges. Keep: the user's goal, languages and libraries in use,\n"
+     "decisions made, names of functions/classes/files, and open problems. Drop pleasantries.\n"
+     "Do not include full code. Stay under {max_words} words. Return ONLY the updated summary."
+    ),
+    ("human",
+     "Current summary:\n{summary}\n\n"
+     "New exchanges:\n{exchanges}")
+])
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)"""
+    return len(text) // 4
+
+
+def _code_hash(code):
+    return hashlib.sha1(" ".join(code.split()).encode("utf-8")).hexdigest()
+
+
+def dedupe_code_blocks(texts):
+    """Replace code blocks already seen earlier in `texts` with a short reference.
+
+    Assistants often repeat a whole file with one line changed, or the user
+    pastes back the code they were given; the model only needs one copy.
+    Blocks are compared ignoring whitespace.
+    """
+    seen = {}
+    out = []
+    for text in texts:
+        def replace(match):
+            key = _code_hash(match.group(2))
+            if key in seen:
+                return f"```{match.group(1)}\n# (identical to code block #{seen[key]} above)\n```"
+            seen[key] = len(seen) + 1
+            return match.group(0)
+        out.append(CODE_BLOCK.sub(replace, text))
+    return out
+
+
+class ConversationMemory:
+    """Chat context that stays within a token budget however long the session.
+
+    The most recent turns are kept verbatim up to `history_tokens`. When
+    they grow past it, the oldest turns are folded into a running summary
+    by one LLM call (`compact`), leaving half the budget free so this only
+    happens every few turns. Repeated code blocks are sent once.
+    """
+
+    def __init__(self, history_tokens=HISTORY_TOKENS, summary_tokens=SUMMARY_TOKENS):
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns = []
+
+    def add_turn(self, question, answer):
+        self.turns.append((question, answer))
+
+    def _turn_tokens(self, turn):
+        return estimate_tokens(turn[0]) + estimate_tokens(turn[1])
+
+    def recent_tokens(self):
+        return sum(self._turn_tokens(turn) for turn in self.turns)
+
+    def needs_compaction(self):
+        return len(self.turns) > 1 and self.recent_tokens() > self.history_tokens
+
+    def compact(self, summarize_chain):
+        """Fold the oldest turns into the summary until recent turns fit half the budget.
+
+        The newest turn always stays verbatim. Returns the number of turns folded.
+        """
+        if not self.needs_compaction():
+            return 0
+        # Only drop turns once the summary call has succeeded
+        count = 0
+        tokens = self.recent_tokens()
+        while count < len(self.turns) - 1 and tokens > self.history_tokens // 2:
+            tokens -= self._turn_tokens(self.turns[count])
+            count += 1
+        folded = self.turns[:count]
+
+        texts = dedupe_code_blocks([text for turn in folded for text in turn])
+        exchanges = "\n\n".join(
+            f"User: {texts[i]}\nAssistant: {texts[i + 1]}" for i in range(0, len(texts), 2)
+        )
+        response = summarize_chain.invoke({
+            "summary": self.summary or "(empty)",
+            "exchanges": exchanges,
+            "max_words": self.summary_tokens * 3 // 4,
+        })
+        summary = getattr(response, "content", response).strip()
+        # Guard the budget even if the model ignores the word limit
+        self.summary = summary[:self.summary_tokens * 4]
+        del self.turns[:count]
+        return len(folded)
+
+    def messages(self):
+        """History messages for the prompt: summary first, then recent turns"""
+        texts = dedupe_code_blocks([text for turn in self.turns for text in turn])
+        history = []
+        if self.summary:
+            history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for i, text in enumerate(texts):
+            history.append(HumanMessage(content=text) if i % 2 == 0 else AIMessage(content=text))
+        return history
+
+    def stats(self):
+        return {
+            "recent_turns": len(self.turns),
+            "recent_tokens": self.recent_tokens(),
+            "summary_tokens": estimate_tokens(self.summary),
+            "history_tokens": sum(estimate_tokens(m.content) for m in self.messages()),
+        }
+
+
+def create_summary_chain(llm):
+    return summary_prompt | llm
@@ -0,0 +1 @@
+"""Helpers shared by every app in this repository."""
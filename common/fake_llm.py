@@ -0,0 +1,84 @@
+import hashlib
+import itertools
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+
+class FakeLLMError(RuntimeError):
+    """Injected failure, standing in for a Groq 429/5xx that outlived its retries"""
+
+
+class FakeChatGroq(BaseChatModel):
+    """Deterministic, offline stand-in for `ChatGroq`.
+
+    Replies are derived from the prompt (the same prompt always gives the
+    same answer) and are paced like a real model: `ttft_ms` before the
+    first token, then `tokens_per_second`. Streaming is supported, so
+    callback-based token rendering behaves as it does against Groq.
+
+    A fraction `error_rate` of calls raise `FakeLLMError` after the TTFT
+    delay; which calls fail depends only on `seed` and the call order.
+    """
+
+    model_name: str = "fake-llama-3.1-8b-instant"
+    ttft_ms: float = 200.0
+    tokens_per_second: float = 800.0
+    max_tokens: int = 128
+    error_rate: float = 0.0
+    seed: int = 0
+
+    _calls: Any = PrivateAttr(default_factory=itertools.count)
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-groq"
+
+    def _reply_tokens(self, messages):
+        prompt = "\n".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        header = [f"[{digest[:8]}]", " Based", " on", " the", " context:"]
+        # Echo the tail of the prompt (question + context) so answers vary
+        budget = max(self.max_tokens - len(header), 0)
+        words = prompt.split()[-budget:] if budget else []
+        return (header + [" " + word for word in words])[:self.max_tokens]
+
+    def _paced(self, messages):
+        call = next(self._calls)
+        time.sleep(self.ttft_ms / 1000)
+        if self.error_rate and random.Random(f"{self.seed}:{call}").random() < self.error_rate:
+            raise FakeLLMError(f"Injected failure on call {call}")
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for i, token in enumerate(self._reply_tokens(messages)):
+            if i and delay:
+                time.sleep(delay)
+            yield token
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = "".join(chunk.message.content for chunk in self._stream(messages, stop, run_manager))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for token in self._paced(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
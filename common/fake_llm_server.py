@@ -0,0 +1,209 @@
+"""Local OpenAI/Groq-compatible chat completions server for testing.
+
+Examples:
+    python -m common.fake_llm_server --port 8765
+    python -m common.fake_llm_server --port 8765 --error-rate 0.1 --rpm 60
+
+then run an app or benchmark with:
+    GROQ_API_BASE=http://127.0.0.1:8765 GROQ_API_KEY=fake streamlit run chatbot/RAG_chatbot.py
+
+Replies are deterministic (derived from the prompt) and paced like a real
+model; streamed and non-streamed requests are both supported. Failures can
+be injected: random 5xx at `error_rate`, and 429 with Retry-After once
+more than `rpm` requests arrive within a minute, so retry and rate-limit
+handling in `common.gateway` can be exercised without a network.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PATHS = ("/openai/v1/chat/completions", "/v1/chat/completions")
+
+
+def reply_tokens(messages, max_tokens):
+    """Digest of the prompt, then the prompt's last words echoed back"""
+    prompt = "\n".join(str(message.get("content", "")) for message in messages)
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    header = [f"[{digest[:8]}]", " Based", " on", " the", " context:"]
+    budget = max(max_tokens - len(header), 0)
+    words = prompt.split()[-budget:] if budget else []
+    return (header + [" " + word for word in words])[:max_tokens]
+
+
+class FakeLLMServer:
+    """Threaded fake chat completions server; usable as a context manager"""
+
+    def __init__(self, host="127.0.0.1", port=0, ttft_ms=200.0, tokens_per_second=400.0,
+                 max_tokens=128, error_rate=0.0, rpm=0, seed=0):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.random = random.Random(seed)
+        self.statuses = Counter()
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _admit(self):
+        """Status to answer with: 200, an injected 500/503, or 429 over the rate"""
+        with self._lock:
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if self.rpm and len(self._recent) >= self.rpm:
+                status = 429
+            elif self.error_rate and self.random.random() < self.error_rate:
+                status = self.random.choice([500, 503])
+            else:
+                self._recent.append(now)
+                status = 200
+            self.statuses[status] += 1
+            return status
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                if self.path not in PATHS:
+                    return self._json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+                status = server._admit()
+                if status == 429:
+                    retry_after = server.random.uniform(0.2, 1.0)
+                    return self._json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                                      {"Retry-After": f"{retry_after:.2f}"})
+                if status != 200:
+                    return self._json(status, {"error": {"message": "Injected server error"}})
+
+                messages = body.get("messages", [])
+                limit = min(body.get("max_tokens") or server.max_tokens, server.max_tokens)
+                tokens = reply_tokens(messages, limit)
+                prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 4
+                usage = {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": len(tokens),
+                    "total_tokens": prompt_tokens + len(tokens),
+                }
+                meta = {
+                    "id": f"chatcmpl-{hashlib.sha1(json.dumps(messages).encode()).hexdigest()[:12]}",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                }
+                delay = 1 / server.tokens_per_second if server.tokens_per_second else 0
+                time.sleep(server.ttft_ms / 1000)
+
+                if not body.get("stream"):
+                    time.sleep(delay * max(len(tokens) - 1, 0))
+                    return self._json(200, {
+                        **meta,
+                        "object": "chat.completion",
+                        "choices": [{
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(tokens)},
+                            "finish_reason": "stop",
+                        }],
+                        "usage": usage,
+                    })
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                def event(delta, finish_reason=None, **extra):
+                    chunk = {
+                        **meta,
+                        "object": "chat.completion.chunk",
+                        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                        **extra,
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+
+                try:
+                    event({"role": "assistant", "content": ""})
+                    for i, token in enumerate(tokens):
+                        if i and delay:
+                            time.sleep(delay)
+                        event({"content": token})
+                    event({}, "stop", x_groq={"usage": usage})
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client cancelled the stream
+                    pass
+                self.close_connection = True
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--max-tokens", type=int, default=128)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 500/503")
+    parser.add_argument("--rpm", type=int, default=0, help="answer 429 above this many requests per minute")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.ttft_ms, args.tokens_per_second,
+                           args.max_tokens, args.error_rate, args.rpm)
+    print(f"Fake LLM server on {server.url} (Ctrl+C to stop)")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
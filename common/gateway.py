@@ -0,0 +1,456 @@
+"""Process-wide gateway for LLM HTTP traffic.
+
+Every chat model from `common.registry.get_chat_model` sends its requests
+through one pooled `httpx` client whose transport:
+
+- waits for the shared rate limiter (token buckets on requests and tokens
+  per minute, served in priority order: interactive before default before
+  batch),
+- retries 429 and 5xx responses and connection errors with jittered
+  exponential backoff, honouring Retry-After (a 429 also pauses every
+  caller, since the provider limit is shared),
+- stops at a per-call deadline, covering queueing, retries and the
+  request itself.
+
+Priority and deadline come from request headers set per model
+(`get_chat_model(priority=..., deadline=...)`), or for one block of calls
+from the `priority()` and `deadline()` context managers:
+
+    with gateway.priority("batch"), gateway.deadline(30):
+        chain.invoke(...)
+
+Point GROQ_API_BASE at `python -m common.fake_llm_server` to exercise all
+of this locally.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_GATEWAY_RPM", 30))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_GATEWAY_TPM", 20000))
+MAX_RETRIES = int(os.getenv("LLM_GATEWAY_MAX_RETRIES", 4))
+MAX_CONNECTIONS = int(os.getenv("LLM_GATEWAY_MAX_CONNECTIONS", 20))
+# Completion tokens assumed for the rate limiter when a call sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 20.0
+
+PRIORITIES = {"interactive": 0, "default": 1, "batch": 2}
+PRIORITY_HEADER = "x-gateway-priority"
+DEADLINE_HEADER = "x-gateway-deadline"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_priority = contextvars.ContextVar("llm_gateway_priority", default=None)
+_deadline = contextvars.ContextVar("llm_gateway_deadline", default=None)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """The call's deadline passed while queued, backing off or in flight"""
+
+
+@contextmanager
+def priority(name):
+    """Run the LLM calls in this block at priority `name`"""
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority {name!r}; use one of {', '.join(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def deadline(seconds):
+    """Give each LLM call in this block at most `seconds`, retries included"""
+    token = _deadline.set(seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, granted in priority order.
+
+    Waiters queue in a heap by (priority, arrival); only the head may take
+    from the buckets, so batch work never jumps ahead of interactive calls.
+    Bucket capacity is one minute's allowance. A rate of 0 disables that
+    bucket.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE):
+        self.request_rate = requests_per_minute / 60
+        self.token_rate = tokens_per_minute / 60
+        self.request_capacity = requests_per_minute
+        self.token_capacity = tokens_per_minute
+        self.requests = requests_per_minute
+        self.tokens = tokens_per_minute
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.request_rate:
+            self.requests = min(self.request_capacity, self.requests + elapsed * self.request_rate)
+        if self.token_rate:
+            self.tokens = min(self.token_capacity, self.tokens + elapsed * self.token_rate)
+
+    def _enqueue(self, level, cost):
+        waiter = [level, next(self._seq), cost]
+        with self._cond:
+            heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _cancel(self, waiter):
+        with self._cond:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def _try_grant(self, waiter):
+        """0 if `waiter` was granted, else seconds worth waiting before trying again"""
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+            if self._queue[0] is not waiter:
+                return 0.05
+            if now < self.paused_until:
+                return self.paused_until - now
+            # A call larger than the whole bucket waits for a full bucket instead of forever
+            cost = min(waiter[2], self.token_capacity) if self.token_rate else 0
+            waits = []
+            if self.request_rate and self.requests < 1:
+                waits.append((1 - self.requests) / self.request_rate)
+            if cost and self.tokens < cost:
+                waits.append((cost - self.tokens) / self.token_rate)
+            if waits:
+                return max(waits)
+            if self.request_rate:
+                self.requests -= 1
+            self.tokens -= cost
+            heapq.heappop(self._queue)
+            self._cond.notify_all()
+            return 0.0
+
+    def acquire(self, level, cost, deadline_at=None):
+        """Block until granted; raise DeadlineExceeded past `deadline_at` (monotonic)"""
+        waiter = self._enqueue(level, cost)
+        try:
+            while True:
+                wait = self._try_grant(waiter)
+                if not wait:
+                    return
+                if deadline_at is not None and time.monotonic() + min(wait, 0.05) >= deadline_at:
+                    raise DeadlineExceeded("Deadline passed while waiting for the rate limiter")
+                if deadline_at is not None:
+                    wait = min(wait, deadline_at - time.monotonic())
+                with self._cond:
+                    self._cond.wait(wait)
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    async def acquire_async(self, level, cost, deadline_at=None):
+        waiter = self._enqueue(level, cost)
+        try:
+            while True:
+                wait = self._try_grant(waiter)
+                if not wait:
+                    return
+                if deadline_at is not None and time.monotonic() + min(wait, 0.05) >= deadline_at:
+                    raise DeadlineExceeded("Deadline passed while waiting for the rate limiter")
+                await asyncio.sleep(min(wait, 0.05))
+        except BaseException:
+            self._cancel(waiter)
+            raise
+
+    def adjust(self, tokens):
+        """Give back (positive) or charge (negative) tokens once actual usage is known"""
+        with self._cond:
+            self.tokens = min(self.token_capacity, self.tokens + tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every caller for `seconds` (after a 429 from the provider)"""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def queued(self):
+        with self._cond:
+            return len(self._queue)
+
+
+def estimate_cost(request):
+    """Tokens a chat completion request may use: prompt estimate + completion cap"""
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return DEFAULT_COMPLETION_TOKENS, False
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in body.get("messages", []))
+    completion = body.get("max_tokens") or body.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_chars // 4 + completion, bool(body.get("stream"))
+
+
+def _retry_after(response):
+    value = response.headers.get("retry-after")
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _backoff(attempt, retry_after=None):
+    """Full-jitter exponential backoff, never shorter than Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0)
+
+
+class Gateway:
+    """Rate limiter, retry policy, stats and pooled clients shared by all models"""
+
+    def __init__(self, limiter=None, max_retries=MAX_RETRIES, max_connections=MAX_CONNECTIONS):
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+        self._stats = {
+            name: {"requests": 0, "retries": 0, "rate_limited": 0, "server_errors": 0,
+                   "failed": 0, "deadline_exceeded": 0, "queued_s": 0.0}
+            for name in PRIORITIES
+        }
+
+    # ------------------------
+    # Per-request policy
+    # ------------------------
+    def _policy(self, request):
+        """(priority name, level, absolute deadline or None) for a request"""
+        name = _priority.get() or request.headers.get(PRIORITY_HEADER) or "default"
+        name = name if name in PRIORITIES else "default"
+        seconds = _deadline.get()
+        if seconds is None and request.headers.get(DEADLINE_HEADER):
+            seconds = float(request.headers[DEADLINE_HEADER])
+        return name, PRIORITIES[name], (time.monotonic() + seconds if seconds else None)
+
+    def _count(self, name, key, value=1):
+        with self._lock:
+            self._stats[name][key] += value
+
+    def _prepare(self, request, deadline_at):
+        """Strip gateway headers and shorten timeouts to the time left"""
+        for header in (PRIORITY_HEADER, DEADLINE_HEADER):
+            if header in request.headers:
+                del request.headers[header]
+        if deadline_at is not None:
+            left = deadline_at - time.monotonic()
+            if left <= 0:
+                raise DeadlineExceeded("Deadline passed before the request was sent", request=request)
+            timeout = dict(request.extensions.get("timeout") or {})
+            for key in ("connect", "read", "write", "pool"):
+                timeout[key] = min(timeout.get(key) or left, left)
+            request.extensions["timeout"] = timeout
+
+    def _should_retry(self, name, response, attempt, deadline_at):
+        """Seconds to back off before retrying `response`, or None to return it"""
+        if response.status_code not in RETRY_STATUSES:
+            return None
+        retry_after = _retry_after(response)
+        if response.status_code == 429:
+            self._count(name, "rate_limited")
+            # The provider limit is shared: hold everyone, not just this call
+            self.limiter.pause(retry_after or BACKOFF_BASE * 2 ** attempt)
+        else:
+            self._count(name, "server_errors")
+        if attempt >= self.max_retries:
+            return None
+        delay = _backoff(attempt, retry_after)
+        if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+            return None
+        return delay
+
+    def _retry_error(self, error, request, attempt, deadline_at):
+        """Seconds to back off after a connection error or timeout, else re-raise it"""
+        if deadline_at is not None and time.monotonic() >= deadline_at:
+            raise DeadlineExceeded("Deadline passed during the request", request=request) from error
+        if attempt >= self.max_retries:
+            raise error
+        delay = _backoff(attempt)
+        if deadline_at is not None and time.monotonic() + delay >= deadline_at:
+            raise DeadlineExceeded("No time left to retry before the deadline", request=request) from error
+        return delay
+
+    def _settle(self, response, cost, streaming):
+        """Reconcile the token bucket with the usage a non-streamed response reports"""
+        if streaming or response.status_code != 200:
+            return
+        try:
+            response.read()
+            usage = response.json().get("usage") or {}
+        except (ValueError, httpx.HTTPError):
+            return
+        if usage.get("total_tokens"):
+            self.limiter.adjust(min(cost, self.limiter.token_capacity) - usage["total_tokens"])
+
+    def handle(self, request, send):
+        name, level, deadline_at = self._policy(request)
+        cost, streaming = estimate_cost(request)
+        self._count(name, "requests")
+        attempt = 0
+        try:
+            while True:
+                queued = time.monotonic()
+                self.limiter.acquire(level, cost, deadline_at)
+                self._count(name, "queued_s", time.monotonic() - queued)
+                self._prepare(request, deadline_at)
+                try:
+                    response = send(request)
+                except httpx.TransportError as e:
+                    delay = self._retry_error(e, request, attempt, deadline_at)
+                else:
+                    delay = self._should_retry(name, response, attempt, deadline_at)
+                    if delay is None:
+                        self._settle(response, cost, streaming)
+                        return response
+                    response.close()
+                attempt += 1
+                self._count(name, "retries")
+                time.sleep(delay)
+        except DeadlineExceeded:
+            self._count(name, "deadline_exceeded")
+            raise
+        except Exception:
+            self._count(name, "failed")
+            raise
+
+    async def handle_async(self, request, send):
+        name, level, deadline_at = self._policy(request)
+        cost, streaming = estimate_cost(request)
+        self._count(name, "requests")
+        attempt = 0
+        try:
+            while True:
+                queued = time.monotonic()
+                await self.limiter.acquire_async(level, cost, deadline_at)
+                self._count(name, "queued_s", time.monotonic() - queued)
+                self._prepare(request, deadline_at)
+                try:
+                    response = await send(request)
+                except httpx.TransportError as e:
+                    delay = self._retry_error(e, request, attempt, deadline_at)
+                else:
+                    delay = self._should_retry(name, response, attempt, deadline_at)
+                    if delay is None:
+                        if not streaming and response.status_code == 200:
+                            await response.aread()
+                        self._settle(response, cost, streaming)
+                        return response
+                    await response.aclose()
+                attempt += 1
+                self._count(name, "retries")
+                await asyncio.sleep(delay)
+        except DeadlineExceeded:
+            self._count(name, "deadline_exceeded")
+            raise
+        except Exception:
+            self._count(name, "failed")
+            raise
+
+    # ------------------------
+    # Pooled clients
+    # ------------------------
+    def client(self):
+        """Shared `httpx.Client`: one connection pool for every sync LLM call"""
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    transport=GatewayTransport(self, httpx.HTTPTransport(limits=self.limits)),
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                )
+            return self._client
+
+    def async_client(self):
+        """Shared `httpx.AsyncClient`; connections are pooled per event loop"""
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = httpx.AsyncClient(
+                    transport=GatewayAsyncTransport(self),
+                    timeout=httpx.Timeout(60.0, connect=10.0),
+                )
+            return self._async_client
+
+    def stats(self):
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        stats["queued_now"] = self.limiter.queued()
+        return stats
+
+
+class GatewayTransport(httpx.BaseTransport):
+    def __init__(self, gateway, inner):
+        self.gateway = gateway
+        self.inner = inner
+
+    def handle_request(self, request):
+        return self.gateway.handle(request, self.inner.handle_request)
+
+    def close(self):
+        self.inner.close()
+
+
+class GatewayAsyncTransport(httpx.AsyncBaseTransport):
+    """Async side of the gateway.
+
+    Connections belong to the event loop that opened them, so each running
+    loop (e.g. one `asyncio.run` per batch job) gets its own inner pool.
+    """
+
+    def __init__(self, gateway):
+        self.gateway = gateway
+        self._inner = weakref.WeakKeyDictionary()
+
+    def _transport(self):
+        loop = asyncio.get_running_loop()
+        if loop not in self._inner:
+            self._inner[loop] = httpx.AsyncHTTPTransport(limits=self.gateway.limits)
+        return self._inner[loop]
+
+    async def handle_async_request(self, request):
+        return await self.gateway.handle_async(request, self._transport().handle_async_request)
+
+    async def aclose(self):
+        transport = self._inner.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+
+_default_gateway = None
+_default_lock = threading.Lock()
+
+
+def default_gateway():
+    """Process-wide gateway: one rate limit and connection pool for all apps"""
+    global _default_gateway
+    with _default_lock:
+        if _default_gateway is None:
+            _default_gateway = Gateway()
+        return _default_gateway
@@ -0,0 +1,374 @@
+"""Persistent exact-match cache for LLM responses, shared by every app.
+
+`SQLiteLLMCache` is a LangChain `BaseCache`, so it sits beneath any
+`prompt | llm` chain: `common.registry.get_chat_model` attaches it to each
+chat model it builds. A response is reused when the model name,
+temperature, max_tokens (and other generation settings) and the fully
+rendered messages all match exactly. Client options such as headers,
+retries and API keys are not part of the key, so an interactive call and
+a batch job asking the same thing share one entry.
+
+Entries expire after a TTL; the least recently used ones are evicted
+once the cache passes its entry or size limit. The database is SQLite
+in WAL mode, so several Streamlit workers or CLI runs can read and write
+it at once. A cache error never fails an LLM call: it is logged and
+treated as a miss.
+
+Models above MAX_TEMPERATURE are not cached by default, since a warm
+model is usually asked for variety; pass `cache=False` to
+`get_chat_model` to opt out any other path.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps
+from langchain_core.messages import AIMessage, AIMessageChunk, message_chunk_to_message
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+ENABLED = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no")
+CACHE_PATH = Path(os.getenv(
+    "LLM_CACHE_PATH",
+    Path.home() / ".cache" / "langchain_project" / "llm_cache.sqlite3"
+))
+TTL = float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", 200)) * 1024 * 1024)
+# Models warmer than this are left uncached unless asked for explicitly
+MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", 0.5))
+# Run eviction once per this many writes
+EVICT_EVERY = 100
+# Refresh an entry's last-used time at most this often, to spare writes on hot keys
+TOUCH_INTERVAL = 300
+
+# Model settings that change the response; everything else is client configuration
+KEY_FIELDS = ("model_name", "temperature", "max_tokens", "n", "model_kwargs")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,
+    model      TEXT,
+    value      TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    used_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_used ON responses (used_at);
+"""
+
+
+def model_key(llm_string):
+    """The response-relevant part of LangChain's `llm_string`.
+
+    For serializable models `llm_string` is the model's full constructor
+    config plus the call options (stop words, bound kwargs); only the
+    generation settings in KEY_FIELDS are kept from the config.
+    """
+    config, _, options = llm_string.partition("---")
+    try:
+        kwargs = json.loads(config)["kwargs"]
+    except (ValueError, KeyError, TypeError):
+        return llm_string
+    settings = {field: kwargs.get(field) for field in KEY_FIELDS}
+    return json.dumps(settings, sort_keys=True, default=str) + "---" + options
+
+
+def _encode(generations):
+    return json.dumps([
+        {
+            "text": generation.text,
+            "generation_info": generation.generation_info,
+            "message": {
+                "content": generation.message.content,
+                "response_metadata": generation.message.response_metadata,
+            } if isinstance(generation, ChatGeneration) else None,
+        }
+        for generation in generations
+    ], default=str)
+
+
+def _decode(value):
+    generations = []
+    for item in json.loads(value):
+        if item["message"] is None:
+            generations.append(Generation(text=item["text"], generation_info=item["generation_info"]))
+        else:
+            generations.append(ChatGeneration(
+                message=AIMessage(**item["message"]), generation_info=item["generation_info"]
+            ))
+    # Lets callbacks (common.metrics) tell a cache hit from a model call
+    for generation in generations:
+        generation.generation_info = {**(generation.generation_info or {}), "cache_hit": True}
+    return generations
+
+
+class SQLiteLLMCache(BaseCache):
+    """Exact-match LLM response cache in SQLite with TTL and LRU size eviction"""
+
+    def __init__(self, path=CACHE_PATH, ttl=TTL, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.counts = {"hits": 0, "misses": 0, "writes": 0, "evicted": 0, "errors": 0}
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection, committed on success and always closed"""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    @staticmethod
+    def key(prompt, llm_string):
+        digest = hashlib.sha256()
+        digest.update(model_key(llm_string).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(prompt.encode("utf-8"))
+        return digest.hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        """Cached generations for this prompt and model, or None"""
+        key = self.key(prompt, llm_string)
+        now = time.time()
+        try:
+            with self._connect() as db:
+                row = db.execute(
+                    "SELECT value, created_at, used_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl and now - row[2] > TOUCH_INTERVAL:
+                    db.execute(
+                        "UPDATE responses SET used_at = ? WHERE key = ?", (now, key)
+                    )
+            if row is None or now - row[1] > self.ttl:
+                self._count("misses")
+                return None
+            generations = _decode(row[0])
+        except (sqlite3.Error, ValueError, KeyError, TypeError) as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            self._count("errors")
+            return None
+        self._count("hits")
+        return generations
+
+    def update(self, prompt, llm_string, return_val):
+        """Store the generations for this prompt and model"""
+        if not return_val or not any(generation.text for generation in return_val):
+            return
+        value = _encode(return_val)
+        now = time.time()
+        try:
+            model = json.loads(model_key(llm_string).partition("---")[0]).get("model_name")
+        except ValueError:
+            model = None
+        try:
+            with self._connect() as db:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, value, size, created_at, used_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.key(prompt, llm_string), model, value, len(value), now, now)
+                )
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed: %s", e)
+            self._count("errors")
+            return
+        self._count("writes")
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones over the limits.
+
+        Returns the number of entries removed.
+        """
+        try:
+            with self._connect() as db:
+                # One evictor at a time across processes
+                db.execute("BEGIN IMMEDIATE")
+                removed = db.execute(
+                    "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+                ).rowcount
+                entries, size = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+                ).fetchone()
+                if entries > self.max_entries or size > self.max_bytes:
+                    # Walk from the least recently used until both limits hold
+                    excess_entries = entries - self.max_entries
+                    excess_bytes = size - self.max_bytes
+                    doomed = []
+                    for key, entry_size in db.execute("SELECT key, size FROM responses ORDER BY used_at"):
+                        if excess_entries <= 0 and excess_bytes <= 0:
+                            break
+                        doomed.append((key,))
+                        excess_entries -= 1
+                        excess_bytes -= entry_size
+                    db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                    removed += len(doomed)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache eviction failed: %s", e)
+            self._count("errors")
+            return 0
+        self._count("evicted", removed)
+        return removed
+
+    def clear(self, **kwargs):
+        with self._connect() as db:
+            db.execute("DELETE FROM responses")
+
+    def stats(self):
+        """Hit/miss counters for this process plus the size of the shared store"""
+        with self._lock:
+            stats = dict(self.counts)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+        with self._connect() as db:
+            stats["entries"], size = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        stats["size_kb"] = round(size / 1024, 1)
+        return stats
+
+
+# Set while `_generate` runs, i.e. when `_stream` serves an invoke
+_in_generate = contextvars.ContextVar("llm_cache_in_generate", default=False)
+
+
+class StreamCacheMixin:
+    """Make `.stream()` use the model's cache as `.invoke()` does.
+
+    LangChain only consults the cache for non-streamed calls. With this
+    mixin a cached response is replayed as a single chunk, and a completed
+    stream is stored under the same key an `.invoke()` would use. A stream
+    closed before the end is not cached.
+
+    Models built with `streaming=True` answer `.invoke()` by consuming
+    `_stream` from `_generate`; LangChain has already looked the call up
+    by then and stores the result itself, so the mixin stays out of it.
+    """
+
+    def _generate(self, *args, **kwargs):
+        token = _in_generate.set(True)
+        try:
+            return super()._generate(*args, **kwargs)
+        finally:
+            _in_generate.reset(token)
+
+    async def _agenerate(self, *args, **kwargs):
+        token = _in_generate.set(True)
+        try:
+            return await super()._agenerate(*args, **kwargs)
+        finally:
+            _in_generate.reset(token)
+
+    def _cache_for_stream(self, messages, stop, kwargs):
+        if _in_generate.get() or not isinstance(self.cache, BaseCache):
+            return None, None, None
+        return self.cache, dumps(messages), self._get_llm_string(stop=stop, **kwargs)
+
+    @staticmethod
+    def _replay(cached):
+        generation = cached[0]
+        message = getattr(generation, "message", None)
+        return ChatGenerationChunk(
+            message=AIMessageChunk(
+                content=message.content if message else generation.text,
+                response_metadata=message.response_metadata if message else {},
+            ),
+            generation_info=generation.generation_info,
+        )
+
+    @staticmethod
+    def _completed(combined):
+        return [ChatGeneration(
+            message=message_chunk_to_message(combined.message),
+            generation_info=combined.generation_info,
+        )]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        cache, prompt, llm_string = self._cache_for_stream(messages, stop, kwargs)
+        if cache is not None:
+            cached = cache.lookup(prompt, llm_string)
+            if cached:
+                yield self._replay(cached)
+                return
+        combined = None
+        for chunk in super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            combined = chunk if combined is None else combined + chunk
+            yield chunk
+        if cache is not None and combined is not None:
+            cache.update(prompt, llm_string, self._completed(combined))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        cache, prompt, llm_string = self._cache_for_stream(messages, stop, kwargs)
+        if cache is not None:
+            cached = await cache.alookup(prompt, llm_string)
+            if cached:
+                yield self._replay(cached)
+                return
+        combined = None
+        async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            combined = chunk if combined is None else combined + chunk
+            yield chunk
+        if cache is not None and combined is not None:
+            await cache.aupdate(prompt, llm_string, self._completed(combined))
+
+
+_cached_classes = {}
+_classes_lock = threading.Lock()
+
+
+def cached_model_class(base):
+    """Subclass of chat model class `base` whose streamed calls also use the cache"""
+    with _classes_lock:
+        if base not in _cached_classes:
+            _cached_classes[base] = type(base.__name__, (StreamCacheMixin, base), {})
+        return _cached_classes[base]
+
+
+def cache_enabled(temperature, cache=None):
+    """Whether a model at `temperature` should be cached; `cache` True/False overrides"""
+    if cache is not None:
+        return bool(cache) and ENABLED
+    return ENABLED and temperature is not None and temperature <= MAX_TEMPERATURE
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_llm_cache():
+    """Process-wide cache handle; the store itself is shared by every process"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SQLiteLLMCache()
+        return _default_cache
@@ -0,0 +1,523 @@
+"""Offline load test: drive every app's chains with concurrent simulated users.
+
+Examples:
+    python -m common.loadtest --users 20 --duration 30
+    python -m common.loadtest --apps email coding --users 50 --ttft-ms 300 --error-rate 0.02
+    python -m common.loadtest --apps chatbot --users 10 --json chatbot.json
+    python -m common.loadtest --server http://127.0.0.1:8765 --users 10
+
+By default the chains run against FakeChatGroq (common/fake_llm.py), an
+in-process stand-in with the given latency, token rate and error rate, so
+results measure the apps' own overhead and concurrency against a model
+that behaves the same on every run. With --server they use the real
+ChatGroq through the shared gateway (rate limiter, retries, connection
+pool) against an OpenAI-compatible server such as
+`python -m common.fake_llm_server`; the gateway limits (LLM_GATEWAY_RPM,
+LLM_GATEWAY_TPM) then apply as in production.
+
+Each app runs in its own process, as it is deployed (one Streamlit server
+per app), and because the apps' helper modules share names. Users loop
+over sessions modelled on the app's UI flow until --duration is up,
+pausing about --think-ms between actions. Reported per app: sessions and
+LLM calls per second, errors, and p50/p99 latency and time to first
+token of each user-visible step. Transcript downloads and model loading
+are not simulated; PDFs and transcripts are synthetic.
+"""
+import argparse
+import atexit
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL = "llama-3.1-8b-instant"
+
+# App name -> directory holding its modules
+APPS = {
+    "email": "Smart_email_writer",
+    "cover_letter": "cover_letter",
+    "interview": "Mock_interview",
+    "coding": "coding_assistant",
+    "youtube": "yt_summerizer",
+    "chatbot": "chatbot",
+}
+
+WORDS = (
+    "project team customer release service data model pipeline report deadline budget meeting "
+    "design review feature latency database cache deploy client schedule quality support update"
+).split()
+
+
+def latency_summary(samples_s):
+    samples = np.array(samples_s) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(samples, 50)), 1),
+        "p99_ms": round(float(np.percentile(samples, 99)), 1),
+        "mean_ms": round(float(samples.mean()), 1),
+    }
+
+
+def filler(rng, words):
+    return " ".join(rng.choices(WORDS, k=words))
+
+
+class Recorder:
+    """Latency samples and errors of each user-visible step, shared by all users"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.ttft = {}
+        self.errors = {}
+
+    def add(self, step, seconds, ttft=None):
+        with self._lock:
+            self.latency.setdefault(step, []).append(seconds)
+            if ttft is not None:
+                self.ttft.setdefault(step, []).append(ttft)
+
+    def error(self, step, n=1):
+        with self._lock:
+            self.errors[step] = self.errors.get(step, 0) + n
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(name)
+            raise
+        self.add(name, time.perf_counter() - start)
+
+    def stream(self, name, chain, inputs):
+        """Consume `chain.stream(inputs)` as the UI would; returns the text"""
+        start = time.perf_counter()
+        text, ttft = "", None
+        try:
+            for chunk in chain.stream(inputs):
+                piece = getattr(chunk, "content", chunk)
+                if piece and ttft is None:
+                    ttft = time.perf_counter() - start
+                text += piece
+        except Exception:
+            self.error(name)
+            raise
+        self.add(name, time.perf_counter() - start, ttft)
+        return text
+
+    def summary(self):
+        with self._lock:
+            steps = {}
+            for step in {**self.latency, **self.errors}:
+                stats = latency_summary(self.latency[step]) if step in self.latency else {"count": 0}
+                stats["errors"] = self.errors.get(step, 0)
+                if self.ttft.get(step):
+                    ttft = latency_summary(self.ttft[step])
+                    stats["ttft_p50_ms"], stats["ttft_p99_ms"] = ttft["p50_ms"], ttft["p99_ms"]
+                steps[step] = stats
+            return steps
+
+
+# ------------------------
+# Sessions, one per app
+# ------------------------
+# Each builder imports the app's own modules, sets up what the app builds
+# once per process, and returns session(rng, rec, think): one simulated
+# user's visit.
+
+def email_app(make_llm, args):
+    from writer import EMAIL_TYPES, LENGTHS, TONES, create_email_chain
+
+    chain = create_email_chain(make_llm(temperature=0.4))
+    topics = [
+        "Requesting {n} days of leave next week for a family event",
+        "Following up on the {w} proposal sent {n} days ago",
+        "Introducing our {w} {w} service to a potential client",
+        "Apologizing for the delayed {w} {w} delivery",
+        "Asking the team to review the {w} report before Friday",
+    ]
+
+    def session(rng, rec, think):
+        inputs = {
+            "email_type": rng.choice(EMAIL_TYPES),
+            "tone": rng.choice(TONES),
+            "length": rng.choice(LENGTHS),
+            "context": rng.choice(topics).replace("{w}", rng.choice(WORDS), 1).replace(
+                "{w}", rng.choice(WORDS)).replace("{n}", str(rng.randint(2, 9))),
+        }
+        rec.stream("write_email", chain, inputs)
+        # About half the users regenerate in another tone
+        if rng.random() < 0.5:
+            think()
+            rec.stream("write_email", chain, {**inputs, "tone": rng.choice(TONES)})
+
+    return session
+
+
+def synthetic_resume(rng):
+    sections = [("", [f"Alex {rng.choice(WORDS).title()}", "alex@example.com | +1 555 0100"])]
+    for heading, items in [("SUMMARY", 2), ("EXPERIENCE", 30), ("PROJECTS", 12),
+                           ("SKILLS", 4), ("EDUCATION", 3), ("INTERESTS", 3)]:
+        sections.append((heading, [f"• {filler(rng, rng.randint(12, 24))}" for _ in range(items)]))
+    return "\n\n".join("\n".join(([heading] if heading else []) + lines) for heading, lines in sections)
+
+
+def cover_letter_app(make_llm, args):
+    from batch import generate_letters
+    from letter import create_letter_chain
+    from resume import compress_resume
+
+    llm = make_llm(temperature=0.4)
+    batch_llm = make_llm(temperature=0.4, priority="batch")
+    chain = create_letter_chain(llm)
+
+    def session(rng, rec, think):
+        with rec.step("prepare_resume"):
+            resume = compress_resume(synthetic_resume(rng))
+        with rec.step("generate_letter"):
+            chain.invoke({
+                "resume": resume,
+                "role": f"{rng.choice(WORDS).title()} Engineer",
+                "company": f"{rng.choice(WORDS).title()} Corp",
+                "posting": "Not provided",
+            })
+        # Some users go on to a batch of postings
+        if rng.random() < 0.2:
+            think()
+            postings = [
+                {"role": f"{rng.choice(WORDS).title()} Engineer", "company": f"{rng.choice(WORDS).title()} Ltd",
+                 "posting": filler(rng, 60)}
+                for _ in range(5)
+            ]
+            with rec.step("generate_letters"):
+                results = generate_letters(create_letter_chain(batch_llm, resume), postings)
+            failed = sum(1 for result in results if result.get("error"))
+            if failed:
+                rec.error("generate_letters", failed)
+
+    return session
+
+
+def interview_app(make_llm, args):
+    from interview import QuestionPrefetch, create_chains, evaluate
+
+    question_chain, ideal_chain, feedback_chain = create_chains(
+        make_llm(temperature=0.4), make_llm(temperature=0.4, cache=False)
+    )
+    roles = ["Python Developer", "Data Analyst", "DevOps Engineer", "Product Manager"]
+
+    def session(rng, rec, think):
+        settings = {
+            "role": rng.choice(roles),
+            "level": rng.choice(["Fresher", "Junior", "Mid", "Senior"]),
+            "type": rng.choice(["Technical", "HR", "Behavioral", "Mixed"]),
+        }
+        # The question bank needs the embedding model; every question is generated live
+        with rec.step("start_interview"):
+            question = question_chain.invoke(settings).content
+        for _ in range(2):
+            think()
+            # As on "Submit Answer": the next question is prefetched during evaluation
+            prefetch = QuestionPrefetch(question_chain, settings)
+            with rec.step("evaluate"):
+                evaluate(ideal_chain, feedback_chain, question, filler(rng, 80))
+            think()
+            with rec.step("next_question"):
+                question, _ = prefetch.result()
+
+    return session
+
+
+def coding_app(make_llm, args):
+    from assistant import create_chat_chain
+    from memory import ConversationMemory, create_summary_chain
+
+    chain = create_chat_chain(make_llm(temperature=0.3))
+    summary_chain = create_summary_chain(make_llm(temperature=0.0, priority="default", max_tokens=512))
+    questions = [
+        "How do I reverse a list in Python?",
+        "Why does this raise KeyError?\n```python\nconfig = {}\nprint(config['{w}'])\n```",
+        "Write a function that groups {w} records by {w}.",
+        "What is the difference between a thread and a process?",
+        "Refactor this to use a dict comprehension:\n```python\nout = {}\nfor k in keys:\n    out[k] = len(k)\n```",
+    ]
+
+    def session(rng, rec, think):
+        memory = ConversationMemory()
+        for _ in range(4):
+            question = rng.choice(questions).replace("{w}", rng.choice(WORDS))
+            answer = rec.stream("answer", chain, {"question": question, "history": memory.messages()})
+            memory.add_turn(question, answer)
+            if memory.needs_compaction():
+                with rec.step("compact_memory"):
+                    memory.compact(summary_chain)
+            think()
+
+    return session
+
+
+def youtube_app(make_llm, args):
+    from map_reduce import MAX_CONCURRENCY, summarize_map_reduce
+    from summarizer import create_summary_chain, plan_summary
+
+    llm = make_llm(temperature=0.3, max_tokens=1024)
+    chain = create_summary_chain(llm)
+
+    def session(rng, rec, think):
+        # ~150 spoken words a minute; long videos go through map-reduce
+        minutes = rng.choice([5, 10, 20, 60])
+        transcript = filler(rng, 150 * minutes)
+        use_map_reduce, _ = plan_summary(transcript)
+        if use_map_reduce:
+            with rec.step("summarize_map_reduce"):
+                summarize_map_reduce(transcript, max_concurrency=MAX_CONCURRENCY, llm=llm)
+        else:
+            with rec.step("summarize"):
+                chain.invoke({"transcript": transcript})
+
+    return session
+
+
+def chatbot_app(make_llm, args):
+    from langchain.chains import RetrievalQA
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    from benchmark import CHUNK_OVERLAP, CHUNK_SIZE, HashingEmbeddings, synthetic_document, write_pdf
+    from hybrid import HybridRetriever
+    from index_manager import IndexManager
+    from ingest import ingest_pdf
+
+    workdir = tempfile.mkdtemp(prefix="rag-loadtest-")
+    atexit.register(shutil.rmtree, workdir, True)
+    # Hashing embeddings: no model download, and retrieval cost stays in the measurement
+    embeddings = HashingEmbeddings()
+    pages, questions = synthetic_document(0, args.chatbot_pages, seed=args.seed)
+    pdf_path = os.path.join(workdir, "loadtest.pdf")
+    write_pdf(pdf_path, pages)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    manager = IndexManager(embeddings, root=os.path.join(workdir, "kb"))
+    manager.add_document("loadtest", ingest_pdf(pdf_path, embeddings, splitter), {"name": "loadtest.pdf"})
+
+    qa_chain = RetrievalQA.from_chain_type(
+        llm=make_llm(temperature=0, streaming=True),
+        chain_type="stuff",
+        retriever=HybridRetriever(manager=manager)
+    )
+
+    class FirstToken(BaseCallbackHandler):
+        def __init__(self):
+            self.start = time.perf_counter()
+            self.ttft = None
+
+        def on_llm_new_token(self, token, **kwargs):
+            if self.ttft is None and token:
+                self.ttft = time.perf_counter() - self.start
+
+    def session(rng, rec, think):
+        for _ in range(3):
+            handler = FirstToken()
+            try:
+                qa_chain.run(rng.choice(questions)["question"], callbacks=[handler])
+            except Exception:
+                rec.error("ask")
+                raise
+            rec.add("ask", time.perf_counter() - handler.start, handler.ttft)
+            think()
+
+    return session
+
+
+BUILDERS = {
+    "email": email_app,
+    "cover_letter": cover_letter_app,
+    "interview": interview_app,
+    "coding": coding_app,
+    "youtube": youtube_app,
+    "chatbot": chatbot_app,
+}
+
+
+# ------------------------
+# Runner
+# ------------------------
+def llm_factory(args):
+    """make_llm(temperature, max_tokens, **options) for the chosen backend"""
+    if args.server:
+        from common.registry import get_chat_model
+
+        def make_llm(temperature=0.0, max_tokens=None, **options):
+            if max_tokens:
+                options["max_tokens"] = max_tokens
+            return get_chat_model(model=MODEL, temperature=temperature, **options)
+        return make_llm
+
+    from common.fake_llm import FakeChatGroq
+    from common.metrics import llm_handler
+
+    instances = itertools.count()
+
+    def make_llm(temperature=0.0, max_tokens=None, **options):
+        # priority/cache/streaming only matter for the real client
+        return FakeChatGroq(
+            ttft_ms=args.ttft_ms,
+            tokens_per_second=args.tokens_per_second,
+            max_tokens=min(max_tokens or args.max_tokens, args.max_tokens),
+            error_rate=args.error_rate,
+            seed=args.seed * 1000 + next(instances),
+            callbacks=[llm_handler()],
+        )
+    return make_llm
+
+
+def run_users(session, args, rec):
+    """`args.users` threads running sessions until `args.duration` seconds are up"""
+    counts = {"sessions": 0, "failed_sessions": 0}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.duration
+
+    def user(index):
+        rng = random.Random(f"{args.seed}:{index}")
+
+        def think():
+            if args.think_ms:
+                time.sleep(rng.uniform(0.5, 1.5) * args.think_ms / 1000)
+
+        # Staggered arrivals, so users are not in lockstep
+        time.sleep(rng.uniform(0, min(args.ramp_s, args.duration)))
+        while time.perf_counter() < deadline:
+            try:
+                session(rng, rec, think)
+                outcome = "sessions"
+            except Exception:
+                outcome = "failed_sessions"
+            with lock:
+                counts[outcome] += 1
+            think()
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(args.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts, time.perf_counter() - start
+
+
+def run_app(app, args):
+    """Load-test one app in this process and return its results"""
+    if args.server:
+        os.environ["GROQ_API_BASE"] = args.server
+        os.environ.setdefault("GROQ_API_KEY", "fake")
+        # Repeated prompts would be answered from the response cache
+        os.environ.setdefault("LLM_CACHE", "0")
+    for path in (str(ROOT), str(ROOT / APPS[app])):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    from common import metrics
+
+    rec = Recorder()
+    session = BUILDERS[app](llm_factory(args), args)
+    metrics.store.clear()
+    counts, wall = run_users(session, args, rec)
+
+    llm_calls = sum(value for (name, _), value in metrics.store.counters().items()
+                    if name in ("llm_requests_total", "llm_errors_total"))
+    if args.metrics_dir:
+        Path(args.metrics_dir).mkdir(parents=True, exist_ok=True)
+        (Path(args.metrics_dir) / f"{app}.prom").write_text(metrics.render_prometheus())
+    return {
+        "app": app,
+        "users": args.users,
+        "wall_s": round(wall, 2),
+        **counts,
+        "sessions_per_s": round(counts["sessions"] / wall, 2),
+        "llm_calls": llm_calls,
+        "llm_calls_per_s": round(llm_calls / wall, 2),
+        "steps": rec.summary(),
+    }
+
+
+def child_args(args, app):
+    argv = [sys.executable, "-m", "common.loadtest", "--child", app]
+    for name in ("users", "duration", "think_ms", "ramp_s", "ttft_ms", "tokens_per_second",
+                 "max_tokens", "error_rate", "seed", "chatbot_pages", "server", "metrics_dir"):
+        value = getattr(args, name)
+        if value is not None:
+            argv += [f"--{name.replace('_', '-')}", str(value)]
+    return argv
+
+
+def print_report(results):
+    for result in results:
+        if "error" in result:
+            print(f"\n{result['app']}: FAILED\n{result['error']}")
+            continue
+        print(
+            f"\n{result['app']}: {result['users']} users, {result['sessions']} sessions "
+            f"({result['failed_sessions']} failed) in {result['wall_s']}s · "
+            f"{result['sessions_per_s']} sessions/s · {result['llm_calls_per_s']} LLM calls/s"
+        )
+        print(f"  {'step':<22}{'n':>6}{'err':>5}{'p50 ms':>10}{'p99 ms':>10}{'ttft p50':>10}{'ttft p99':>10}")
+        for step, stats in result["steps"].items():
+            print(
+                f"  {step:<22}{stats['count']:>6}{stats['errors']:>5}"
+                f"{stats.get('p50_ms', '-'):>10}{stats.get('p99_ms', '-'):>10}"
+                f"{stats.get('ttft_p50_ms', '-'):>10}{stats.get('ttft_p99_ms', '-'):>10}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users per app")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to keep starting sessions")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between user actions")
+    parser.add_argument("--ramp-s", type=float, default=2.0, help="spread user arrivals over this many seconds")
+    parser.add_argument("--ttft-ms", type=float, default=200.0, help="fake LLM time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=800.0, help="fake LLM token rate")
+    parser.add_argument("--max-tokens", type=int, default=128, help="fake LLM reply length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake LLM calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chatbot-pages", type=int, default=20, help="pages in the chatbot's synthetic PDF")
+    parser.add_argument("--server", help="use ChatGroq via the gateway against this base URL instead")
+    parser.add_argument("--metrics-dir", help="write each app's Prometheus metrics here")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--child", choices=list(APPS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_app(args.child, args)))
+        return
+
+    results = []
+    for app in args.apps:
+        print(f"Load testing {app} with {args.users} users for {args.duration:g}s...", file=sys.stderr)
+        child = subprocess.run(child_args(args, app), cwd=ROOT, stdout=subprocess.PIPE, text=True)
+        if child.returncode:
+            results.append({"app": app, "error": f"exit status {child.returncode} (see stderr above)"})
+        else:
+            results.append(json.loads(child.stdout.strip().splitlines()[-1]))
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
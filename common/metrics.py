@@ -0,0 +1,361 @@
+"""In-process latency, token and throughput metrics for every app.
+
+Two ways in:
+
+- `span(stage)` times a block (a context manager and decorator):
+
+      with metrics.span("get_transcript"):
+          transcript = get_transcript(video_id)
+
+- `MetricsHandler`, a LangChain callback the registry attaches to every
+  chat model, records per-call latency, time to first token (streamed
+  calls), prompt/completion tokens, throughput and response cache hits.
+
+Everything is aggregated into fixed-bucket histograms and counters held
+by this module, exported in Prometheus text format (`render_prometheus()`,
+or an HTTP endpoint when METRICS_PORT is set), and the events of the
+current Streamlit session are listed by `debug_panel()`.
+
+Recording a value is a dict lookup, a bisect and a lock, so a span or an
+LLM call costs on the order of ten microseconds.
+"""
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+# Serve /metrics for Prometheus on this port (unset: no server)
+METRICS_PORT = os.getenv("METRICS_PORT")
+# Set to 0 to hide the Streamlit debug panel
+SHOW_PANEL = os.getenv("METRICS_PANEL", "1").lower() not in ("0", "false", "no")
+# Events kept per session for the debug panel
+SESSION_EVENTS = 200
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384)
+RATE_BUCKETS = (10, 25, 50, 100, 200, 400, 800, 1600)
+
+DESCRIPTIONS = {
+    "stage_seconds": ("Wall time of an instrumented stage", LATENCY_BUCKETS),
+    "llm_request_seconds": ("Wall time of one chat model call", LATENCY_BUCKETS),
+    "llm_ttft_seconds": ("Time to first token of a streamed chat model call", LATENCY_BUCKETS),
+    "llm_prompt_tokens": ("Prompt tokens per chat model call", TOKEN_BUCKETS),
+    "llm_completion_tokens": ("Completion tokens per chat model call", TOKEN_BUCKETS),
+    "llm_tokens_per_second": ("Completion tokens per second after the first token", RATE_BUCKETS),
+    "llm_requests_total": ("Chat model calls, by response cache result", None),
+    "llm_errors_total": ("Chat model calls that raised", None),
+    "stage_errors_total": ("Instrumented stages that raised", None),
+}
+
+_session = contextvars.ContextVar("metrics_session", default=None)
+_parent = contextvars.ContextVar("metrics_parent_span", default=None)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)"""
+    return len(text) // 4
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate of quantile `q`, interpolated within its bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Process-wide store of labelled histograms and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(DESCRIPTIONS[name][1])
+            histogram.observe(value)
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def summary(self):
+        """One row per histogram series: count, mean, p50 and p95"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            rows = []
+            for (name, labels), histogram in items:
+                rows.append({
+                    "metric": name,
+                    **dict(labels),
+                    "count": histogram.count,
+                    "mean": round(histogram.sum / histogram.count, 3),
+                    "p50": round(histogram.quantile(0.5), 3),
+                    "p95": round(histogram.quantile(0.95), 3),
+                })
+        return rows
+
+    def counters(self):
+        with self._lock:
+            return {(name, labels): value for (name, labels), value in self._counters.items()}
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format"""
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+                       for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            by_name = {}
+            for (name, labels), histogram in histograms:
+                cumulative = list(histogram.counts)
+                for i in range(1, len(cumulative)):
+                    cumulative[i] += cumulative[i - 1]
+                by_name.setdefault(name, []).append((labels, histogram.buckets, cumulative,
+                                                     histogram.sum, histogram.count))
+
+        for name, series in by_name.items():
+            lines.append(f"# HELP {name} {DESCRIPTIONS[name][0]}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, buckets, cumulative, total, count in series:
+                for bound, n in zip(buckets, cumulative):
+                    lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {n}")
+                lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{fmt(labels)} {total:g}")
+                lines.append(f"{name}_count{fmt(labels)} {count}")
+
+        described = set()
+        for (name, labels), value in counters:
+            if name not in described:
+                lines.append(f"# HELP {name} {DESCRIPTIONS[name][0]}")
+                lines.append(f"# TYPE {name} counter")
+                described.add(name)
+            lines.append(f"{name}{fmt(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+store = Metrics()
+
+
+def _record(event):
+    """Add an event to the current Streamlit session's log, if one is bound"""
+    events = _session.get()
+    if events is not None:
+        events.append(event)
+
+
+@contextmanager
+def span(stage, **labels):
+    """Time a block as `stage` (also usable as a decorator)"""
+    parent = _parent.get()
+    token = _parent.set(stage)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _parent.reset(token)
+        store.observe("stage_seconds", seconds, stage=stage, **labels)
+        if failed:
+            store.inc("stage_errors_total", stage=stage, **labels)
+        _record({"stage": stage, "parent": parent, "ms": round(seconds * 1000, 1),
+                 "error": failed, **labels})
+
+
+class MetricsHandler(BaseCallbackHandler):
+    """Records latency, TTFT, tokens and cache hits of every chat model call.
+
+    Streaming responses carry no usage, so tokens are then estimated from
+    the text (~4 characters per token).
+    """
+
+    def __init__(self):
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = {**(serialized.get("kwargs") or {}), **(kwargs.get("invocation_params") or {})}
+        model = params.get("model") or params.get("model_name") or serialized.get("name", "unknown")
+        prompt_chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._runs[run_id] = {"model": model, "start": time.perf_counter(), "ttft": None,
+                              "prompt_chars": prompt_chars, "parent": _parent.get()}
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and run["ttft"] is None and token:
+            run["ttft"] = time.perf_counter() - run["start"]
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        seconds = time.perf_counter() - run["start"]
+        generations = [g for batch in response.generations for g in batch]
+        cached = any((g.generation_info or {}).get("cache_hit") for g in generations)
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens") or run["prompt_chars"] // 4
+        completion_tokens = usage.get("completion_tokens") or sum(estimate_tokens(g.text) for g in generations)
+
+        model = run["model"]
+        store.inc("llm_requests_total", model=model, cache="hit" if cached else "miss")
+        store.observe("llm_request_seconds", seconds, model=model)
+        event = {"stage": f"llm:{model}", "parent": run["parent"], "ms": round(seconds * 1000, 1),
+                 "error": False, "cache": "hit" if cached else "miss",
+                 "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        if not cached:
+            # Cache hits would drag the token and speed figures towards zero
+            store.observe("llm_prompt_tokens", prompt_tokens, model=model)
+            store.observe("llm_completion_tokens", completion_tokens, model=model)
+            if run["ttft"] is not None:
+                store.observe("llm_ttft_seconds", run["ttft"], model=model)
+                event["ttft_ms"] = round(run["ttft"] * 1000, 1)
+                generating = seconds - run["ttft"]
+                if completion_tokens > 1 and generating > 0:
+                    store.observe("llm_tokens_per_second", (completion_tokens - 1) / generating, model=model)
+        _record(event)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        store.inc("llm_errors_total", model=run["model"], error=type(error).__name__)
+        _record({"stage": f"llm:{run['model']}", "parent": run["parent"],
+                 "ms": round((time.perf_counter() - run["start"]) * 1000, 1), "error": True})
+
+
+_handler = MetricsHandler()
+
+
+def llm_handler():
+    """The callback handler shared by every chat model"""
+    return _handler
+
+
+def bind_session(state):
+    """Log this script run's spans and LLM calls into Streamlit `state`.
+
+    Returns the session's event log (most recent last).
+    """
+    events = state.get("_metrics_events")
+    if events is None:
+        events = state["_metrics_events"] = deque(maxlen=SESSION_EVENTS)
+    _session.set(events)
+    return events
+
+
+def render_prometheus():
+    return store.render_prometheus()
+
+
+def debug_panel(title="🔍 Debug metrics"):
+    """Sidebar expander with this session's timings and the process-wide histograms"""
+    if not SHOW_PANEL:
+        return
+    import streamlit as st
+
+    events = bind_session(st.session_state)
+    with st.sidebar.expander(title):
+        st.caption("This session (latest first)")
+        if events:
+            st.dataframe(list(reversed(events))[:50], hide_index=True)
+        else:
+            st.caption("Nothing recorded yet")
+        st.caption("All sessions in this process (seconds, tokens)")
+        summary = store.summary()
+        if summary:
+            st.dataframe(summary, hide_index=True)
+        st.download_button("Prometheus metrics", render_prometheus(), "metrics.prom", "text/plain")
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port, host="0.0.0.0"):
+    """Serve /metrics on `port` from a daemon thread (once per process)"""
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+            except OSError as e:
+                # Another app on this machine already owns the port
+                logger.warning("Metrics endpoint not started on port %s: %s", port, e)
+                return None
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
+
+
+if METRICS_PORT:
+    serve(int(METRICS_PORT))
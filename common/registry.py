@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+
+DEFAULT_CHAT_MODEL = "llama-3.1-8b-instant"
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class ResourceRegistry:
+    """Process-wide cache of expensive objects (LLM clients, embedding models).
+
+    Streamlit re-executes an app script on every interaction and for every
+    session, but imported modules live for the whole server process, so a
+    registry held here is built once and then shared by all sessions and
+    threads. Each resource has its own lock: two sessions asking for the
+    same model wait for a single load, while different models load in
+    parallel.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+        self._load_times = {}
+
+    def get(self, name, factory):
+        """Return resource `name`, building it with `factory()` on first use"""
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+
+        with self._guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self._resources:
+                start = time.perf_counter()
+                self._resources[name] = factory()
+                self._load_times[name] = time.perf_counter() - start
+        return self._resources[name]
+
+    def loaded(self):
+        return list(self._resources)
+
+    def load_times(self):
+        """Seconds spent building each resource, by name"""
+        return dict(self._load_times)
+
+    def prewarm(self, loaders, background=True):
+        """Load resources ahead of the first request.
+
+        `loaders` are zero-argument callables such as
+        `lambda: get_embeddings()`. With `background=True` they run in a
+        daemon thread so the first page renders while models load.
+        """
+        def run():
+            for loader in loaders:
+                loader()
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="registry-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+
+registry = ResourceRegistry()
+
+
+def get_chat_model(model=DEFAULT_CHAT_MODEL, temperature=0.0, priority="interactive", deadline=None,
+                   cache=None, **kwargs):
+    """Shared `ChatGroq` client for one (model, temperature, options) combination.
+
+    Requests go through the process-wide LLM gateway (`common.gateway`):
+    pooled connections, the shared rate limiter at `priority`
+    ("interactive", "default" or "batch"), retries, and an optional
+    per-call `deadline` in seconds.
+
+    Responses are served from the persistent cache (`common.llm_cache`)
+    when the same prompt was answered before, for invoked and streamed
+    calls alike. By default only models at or below
+    LLM_CACHE_MAX_TEMPERATURE are cached; `cache=False` opts a model out
+    and `cache=True` opts a warmer one in. Every call is recorded by
+    `common.metrics`.
+    """
+    from common.llm_cache import cache_enabled
+
+    cache = cache_enabled(temperature, cache)
+    name = f"chat:{model}:t={temperature}:{priority}:d={deadline}:c={cache}" + "".join(
+        f":{key}={value}" for key, value in sorted(kwargs.items()) if key != "groq_api_key"
+    )
+
+    def build():
+        from langchain_groq import ChatGroq
+
+        from common.gateway import DEADLINE_HEADER, PRIORITY_HEADER, default_gateway
+        from common.llm_cache import cached_model_class, default_llm_cache
+        from common.metrics import llm_handler
+
+        gateway = default_gateway()
+        headers = {PRIORITY_HEADER: priority}
+        if deadline:
+            headers[DEADLINE_HEADER] = str(deadline)
+        model_class = cached_model_class(ChatGroq) if cache else ChatGroq
+        return model_class(
+            model=model,
+            temperature=temperature,
+            http_client=gateway.client(),
+            http_async_client=gateway.async_client(),
+            # The gateway retries; retrying again in the SDK would multiply attempts
+            max_retries=0,
+            default_headers=headers,
+            # False (not None) so LangChain's global cache is never consulted either
+            cache=default_llm_cache() if cache else False,
+            # Latency, TTFT, token and cache-hit metrics for every call
+            callbacks=[llm_handler()],
+            **kwargs
+        )
+
+    return registry.get(name, build)
+
+
+def get_embeddings(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Shared sentence-transformer embeddings"""
+    def build():
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=model_name)
+
+    return registry.get(f"embeddings:{model_name}", build)
+
+
+# Set PREWARM_MODELS=1 to start loading the embedding model as soon as the
+# first app imports this module, instead of on the first upload.
+if os.getenv("PREWARM_MODELS", "").lower() in ("1", "true", "yes"):
+    registry.prewarm([get_embeddings])
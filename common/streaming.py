@@ -0,0 +1,69 @@
+import time
+from contextlib import closing
+
+from common.metrics import span
+
+FENCE = "```"
+CURSOR = "▌"
+
+
+def close_fences(text, cursor=""):
+    """Partial markdown with any open code fence closed, so code renders as code mid-stream"""
+    if text.count(FENCE) % 2:
+        return f"{text}{cursor}\n{FENCE}"
+    return text + cursor
+
+
+def stream_to(placeholder, chain, inputs, render=None, min_interval=0.05, stage="stream"):
+    """Stream `chain` output into a Streamlit placeholder as tokens arrive.
+
+    `render(text, done)` draws the text so far (default: markdown with open
+    code fences closed and a cursor); redraws are throttled to one per
+    `min_interval` seconds. Returns (text, metrics) with ttft_ms, total_ms,
+    tokens and tokens_per_s. The whole stream is timed as span `stage`.
+
+    When the user submits something new, Streamlit stops this script run by
+    raising from the next placeholder update; the stream is closed on the
+    way out, which drops the HTTP response instead of reading it to the end.
+    """
+    if render is None:
+        def render(text, done):
+            placeholder.markdown(close_fences(text, "" if done else CURSOR))
+
+    start = time.perf_counter()
+    text = ""
+    ttft = None
+    tokens = 0
+    last_render = 0.0
+    with span(stage), closing(iter(chain.stream(inputs))) as chunks:
+        for chunk in chunks:
+            piece = getattr(chunk, "content", chunk)
+            if not piece:
+                continue
+            now = time.perf_counter()
+            if ttft is None:
+                ttft = now - start
+            tokens += 1
+            text += piece
+            if now - last_render >= min_interval:
+                render(text, False)
+                last_render = now
+
+    total = time.perf_counter() - start
+    render(text, True)
+    generating = total - (ttft or 0)
+    return text, {
+        "ttft_ms": round((ttft or total) * 1000),
+        "total_ms": round(total * 1000),
+        "tokens": tokens,
+        "tokens_per_s": round((tokens - 1) / generating, 1) if tokens > 1 and generating > 0 else None,
+    }
+
+
+def format_metrics(metrics):
+    """One-line summary for a caption under the response"""
+    parts = [f"⚡ first token {metrics['ttft_ms']} ms"]
+    if metrics.get("tokens_per_s"):
+        parts.append(f"{metrics['tokens_per_s']:.0f} tokens/s")
+    parts.append(f"{metrics['total_ms'] / 1000:.1f}s total")
+    return " · ".join(parts)
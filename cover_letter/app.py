@@ -1,9 +1,22 @@
+import itertools
+import time
+
 import streamlit as st
 from dotenv import load_dotenv
-from pypdf import PdfReader
 
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel, span
+from common.registry import get_chat_model
+from resume import RESUME_TOKEN_BUDGET, default_resume_cache, estimate_tokens
+from letter import create_letter_chain
+from batch import MAX_CONCURRENCY, generate_letters, letters_zip, parse_postings, read_postings_csv
 
 # -----------------------
 # Load environment
@@ -21,24 +34,30 @@ st.set_page_config(
 
 st.title("📝 AI Cover Letter Generator")
 st.caption("Upload your resume → Get a personalized cover letter")
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
 
 # -----------------------
-# Load LLM (Groq)
+# Load LLM (Groq, shared across reruns and sessions)
 # -----------------------
-llm = ChatGroq(
+llm = get_chat_model(
     model="llama-3.1-8b-instant",
     temperature=0.4
 )
+batch_llm = get_chat_model(
+    model="llama-3.1-8b-instant",
+    temperature=0.4,
+    priority="batch"
+)
 
 # -----------------------
-# Helper: Read PDF
+# Helper: Read PDF (parsed once per file, compressed to the token budget)
 # -----------------------
-def extract_text_from_pdf(file):
-    reader = PdfReader(file)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text()
-    return text
+resume_cache = default_resume_cache()
+
+def extract_text_from_pdf(file, max_tokens=RESUME_TOKEN_BUDGET):
+    with span("extract_text_from_pdf"):
+        return resume_cache.prepare(file.getvalue(), max_tokens)
 
 # -----------------------
 # Upload Resume
@@ -48,57 +67,149 @@ resume_file = st.file_uploader(
     type=["pdf"]
 )
 
-job_role = st.text_input(
-    "🎯 Target Job Role (optional)",
-    placeholder="Example: Junior Python Developer"
-)
+mode = st.radio("Mode", ["Single letter", "Batch (many postings)"], horizontal=True)
 
-company_name = st.text_input(
-    "🏢 Company Name (optional)",
-    placeholder="Example: Google"
-)
+if mode == "Single letter":
+    job_role = st.text_input(
+        "🎯 Target Job Role (optional)",
+        placeholder="Example: Junior Python Developer"
+    )
+
+    company_name = st.text_input(
+        "🏢 Company Name (optional)",
+        placeholder="Example: Google"
+    )
+else:
+    postings_text = st.text_area(
+        "📋 Job postings, one per line: Role | Company | details (optional)",
+        placeholder="Junior Python Developer | Google | Django, REST APIs, remote\nData Analyst | Spotify",
+        height=150
+    )
+    postings_csv = st.file_uploader(
+        "…or a CSV with role, company and description columns",
+        type=["csv"]
+    )
+
+with st.expander("⚙️ Settings"):
+    resume_budget = st.slider(
+        "Resume token budget",
+        min_value=300,
+        max_value=4000,
+        value=RESUME_TOKEN_BUDGET,
+        step=100,
+        help="Longer resumes are condensed to about this many tokens before prompting"
+    )
+    max_concurrency = st.slider(
+        "Letters generated in parallel (batch mode)",
+        min_value=1,
+        max_value=8,
+        value=MAX_CONCURRENCY
+    )
 
 # -----------------------
-# Prompt Template
+# Chain
 # -----------------------
-prompt = ChatPromptTemplate.from_messages([
-    ("system",
-     "You are an expert career assistant.\n"
-     "Generate a professional cover letter based on the resume content.\n"
-     "Customize it for the job role and company if provided.\n"
-     "Return ONLY the cover letter.\n"
-     "Do not include explanations."
-    ),
-    ("human",
-     "Resume:\n{resume}\n\n"
-     "Job Role: {role}\n"
-     "Company: {company}")
-])
+chain = create_letter_chain(llm)
 
-chain = prompt | llm
+def resume_caption(resume_text, original_tokens):
+    st.caption(
+        f"📄 Resume: ~{original_tokens:,} tokens"
+        + (f", condensed to ~{estimate_tokens(resume_text):,}" if estimate_tokens(resume_text) < original_tokens else "")
+    )
 
 # -----------------------
 # Generate Button
 # -----------------------
-if st.button("✨ Generate Cover Letter"):
+if mode == "Single letter" and st.button("✨ Generate Cover Letter"):
     if resume_file is None:
         st.warning("Please upload your resume.")
     else:
         with st.spinner("Reading resume and generating cover letter..."):
-            resume_text = extract_text_from_pdf(resume_file)
+            resume_text, original_tokens = extract_text_from_pdf(resume_file, resume_budget)
 
-            response = chain.invoke({
-                "resume": resume_text,
-                "role": job_role,
-                "company": company_name
-            })
+            with span("generate_letter"):
+                response = chain.invoke({
+                    "resume": resume_text,
+                    "role": job_role,
+                    "company": company_name,
+                    "posting": "Not provided"
+                })
 
             cover_letter = response.content
 
+        resume_caption(resume_text, original_tokens)
         st.subheader("✅ Your Cover Letter")
         st.markdown(
             f"""
 ```text
 {cover_letter}
 """
-)
\ No newline at end of file
+)
+
+# -----------------------
+# Batch Generation
+# -----------------------
+def show_letter(box, result):
+    title = " @ ".join(filter(None, [result["role"], result["company"]])) or "Cover letter"
+    with box.container():
+        if result.get("error"):
+            st.error(f"❌ {title}: {result['error']}")
+        else:
+            with st.expander(f"✅ {title} ({result['seconds']:.1f}s)"):
+                st.text(result["letter"])
+
+if mode != "Single letter":
+    if st.button("✨ Generate All Cover Letters"):
+        postings = parse_postings(postings_text)
+        if postings_csv is not None:
+            try:
+                postings += read_postings_csv(postings_csv.getvalue())
+            except ValueError as e:
+                st.error(str(e))
+
+        if resume_file is None:
+            st.warning("Please upload your resume.")
+        elif not postings:
+            st.warning("Please add at least one job posting.")
+        else:
+            # Parse the resume once and bind it into the prompt for every posting
+            resume_text, original_tokens = extract_text_from_pdf(resume_file, resume_budget)
+            resume_caption(resume_text, original_tokens)
+            # Queued behind interactive requests from other users
+            batch_chain = create_letter_chain(batch_llm, resume_text)
+
+            progress = st.progress(0.0, text=f"Generating {len(postings)} cover letters...")
+            boxes = [st.empty() for _ in postings]
+            finished_count = itertools.count(1)
+
+            def on_result(index, result):
+                finished = next(finished_count)
+                progress.progress(finished / len(postings), text=f"{finished}/{len(postings)} letters done")
+                show_letter(boxes[index], result)
+
+            started = time.perf_counter()
+            with span("generate_letters"):
+                results = generate_letters(batch_chain, postings, max_concurrency, on_result=on_result)
+            st.session_state.batch_results = results
+            st.session_state.batch_seconds = time.perf_counter() - started
+            progress.empty()
+            for box in boxes:
+                box.empty()
+
+    # Results live in session state so they survive the rerun of the download click
+    results = st.session_state.get("batch_results")
+    if results:
+        done = sum(1 for result in results if result.get("letter"))
+        st.subheader(f"✅ {done}/{len(results)} cover letters")
+        st.caption(f"Generated in {st.session_state.batch_seconds:.1f}s")
+        st.download_button(
+            "⬇️ Download all (.zip)",
+            data=letters_zip(results),
+            file_name="cover_letters.zip",
+            mime="application/zip",
+            disabled=not done
+        )
+        for result in results:
+            show_letter(st.empty(), result)
+
+debug_panel()
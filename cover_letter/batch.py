@@ -0,0 +1,110 @@
+import contextvars
+import csv
+import io
+import re
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_CONCURRENCY = 4
+# Request errors (429/5xx) are retried by the LLM gateway; this only
+# covers a completion that comes back empty
+MAX_RETRIES = 1
+
+
+def parse_postings(text):
+    """Postings typed one per line as "Role | Company | optional details"."""
+    postings = []
+    for line in text.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        parts = [part.strip() for part in line.split("|", 2)]
+        parts += [""] * (3 - len(parts))
+        postings.append({"role": parts[0], "company": parts[1], "posting": parts[2]})
+    return postings
+
+
+def read_postings_csv(data):
+    """Postings from CSV bytes with role, company and optional description columns"""
+    reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+    columns = {name.lower().strip(): name for name in reader.fieldnames or []}
+    if "role" not in columns and "company" not in columns:
+        raise ValueError("CSV needs a 'role' and/or 'company' column")
+
+    def field(row, *names):
+        for name in names:
+            if name in columns:
+                return (row.get(columns[name]) or "").strip()
+        return ""
+
+    return [
+        {
+            "role": field(row, "role", "title", "job title"),
+            "company": field(row, "company"),
+            "posting": field(row, "description", "posting", "details"),
+        }
+        for row in reader
+        if any((value or "").strip() for value in row.values())
+    ]
+
+
+def invoke_nonempty(chain, inputs, retries=MAX_RETRIES):
+    """Text of `chain.invoke`, asked again up to `retries` times if it is empty.
+
+    Exceptions propagate at once: the gateway has already retried them.
+    """
+    for _ in range(retries + 1):
+        text = chain.invoke(inputs).content
+        if text.strip():
+            return text
+    raise ValueError("The model returned an empty letter")
+
+
+def generate_letters(chain, postings, max_concurrency=MAX_CONCURRENCY, retries=MAX_RETRIES, on_result=None):
+    """Write a letter for every posting with at most `max_concurrency` calls in flight.
+
+    `chain` already has the resume bound (`prompt.partial(resume=...)`), so
+    each call only adds the posting. Returns one result dict per posting, in
+    input order, with "letter" or "error" set. `on_result(index, result)` runs
+    on the calling thread as each letter finishes, so it may update Streamlit.
+    """
+    def write(posting):
+        started = time.perf_counter()
+        inputs = {**posting, "posting": posting["posting"] or "Not provided"}
+        result = dict(posting)
+        try:
+            result["letter"] = invoke_nonempty(chain, inputs, retries)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        result["seconds"] = time.perf_counter() - started
+        return result
+
+    results = [None] * len(postings)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        # Copy the caller's context so per-session metrics see the workers' LLM calls
+        futures = {
+            pool.submit(contextvars.copy_context().run, write, posting): i
+            for i, posting in enumerate(postings)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            result = future.result()
+            results[index] = result
+            if on_result:
+                on_result(index, result)
+    return results
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:40]
+
+
+def letters_zip(results):
+    """Zip archive (bytes) with one text file per generated letter"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, result in enumerate(results, start=1):
+            if result and result.get("letter"):
+                name = "_".join(filter(None, [_slug(result["company"]), _slug(result["role"])]))
+                archive.writestr(f"{i:02d}_{name or 'letter'}.txt", result["letter"])
+    return buffer.getvalue()
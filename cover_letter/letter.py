@@ -0,0 +1,28 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+# -----------------------
+# Prompt Template
+# -----------------------
+prompt = ChatPromptTemplate.from_messages([
+    ("system",
+     "You are an expert career assistant.\n"
+     "Generate a professional cover letter based on the resume content.\n"
+     "Customize it for the job role and company if provided.\n"
+     "Return ONLY the cover letter.\n"
+     "Do not include explanations."
+    ),
+    ("human",
+     "Resume:\n{resume}\n\n"
+     "Job Role: {role}\n"
+     "Company: {company}\n"
+     "Job Posting: {posting}")
+])
+
+
+def create_letter_chain(llm, resume=None):
+    """Chain from (resume, role, company, posting) to the letter.
+
+    With `resume` given it is bound into the prompt once, so a batch of
+    postings only passes role, company and posting.
+    """
+    return (prompt.partial(resume=resume) if resume is not None else prompt) | llm
@@ -0,0 +1,231 @@
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+# Most resume tokens sent to the LLM; longer resumes are compressed to fit
+RESUME_TOKEN_BUDGET = int(os.getenv("COVER_LETTER_RESUME_TOKENS", 1200))
+CACHE_ENTRIES = int(os.getenv("COVER_LETTER_RESUME_CACHE", 64))
+# Shorter documents are extracted serially: pool start-up costs more
+PARALLEL_MIN_PAGES = 8
+PAGES_PER_TASK = 4
+# Lines at the top and bottom of a page checked for running headers/footers
+EDGE_LINES = 3
+# Every kept section gets at least this many characters when compressing
+MIN_SECTION_CHARS = 200
+
+BULLETS = re.compile(r"^\s*[•●▪■◦‣∙·*\-–—]\s*")
+HYPHENATED = re.compile(r"[A-Za-z]-$")
+PAGE_NUMBER = re.compile(r"^(page\s*)?\d{1,3}(\s*(of|/)\s*\d{1,3})?$", re.IGNORECASE)
+SECTION_WORDS = {
+    "summary", "profile", "objective", "about", "experience", "employment", "work",
+    "professional", "projects", "skills", "technical", "education", "certifications",
+    "certificates", "achievements", "awards", "publications", "languages",
+    "volunteering", "interests", "hobbies", "references", "activities", "courses",
+}
+# Dropped first when the resume is over budget
+LOW_PRIORITY_SECTIONS = {"interests", "hobbies", "references", "activities", "languages", "volunteering"}
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)"""
+    return len(text) // 4
+
+
+def resume_hash(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _extract_pages(pdf_bytes, start, stop):
+    """Worker: extract text for pages [start, stop)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def extract_pages(pdf_bytes, workers=None):
+    """Text of every page, in order; long documents use a process pool"""
+    from pypdf import PdfReader
+
+    total = len(PdfReader(io.BytesIO(pdf_bytes)).pages)
+    workers = min(workers or os.cpu_count() or 1, -(-total // PAGES_PER_TASK))
+    if total < PARALLEL_MIN_PAGES or workers <= 1:
+        return _extract_pages(pdf_bytes, 0, total)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_extract_pages, pdf_bytes, start, min(start + PAGES_PER_TASK, total))
+            for start in range(0, total, PAGES_PER_TASK)
+        ]
+        return [text for future in futures for text in future.result()]
+
+
+def normalize_pages(pages):
+    """Join page texts into clean resume text.
+
+    Removes headers/footers repeated on most pages and bare page numbers,
+    rejoins words hyphenated across lines, turns bullet glyphs into "- "
+    and collapses runs of spaces and blank lines.
+    """
+    page_lines = [[" ".join(line.split()) for line in page.splitlines()] for page in pages]
+
+    # Headers and footers: lines near the top or bottom of most pages
+    repeated = set()
+    if len(pages) >= 3:
+        edges = Counter(
+            line for lines in page_lines
+            for line in set(lines[:EDGE_LINES] + lines[-EDGE_LINES:]) if line
+        )
+        repeated = {line for line, count in edges.items() if count >= len(pages) / 2}
+
+    out = []
+    seen_repeated = set()
+    for lines in page_lines:
+        for line in lines:
+            if PAGE_NUMBER.match(line) or line in seen_repeated:
+                continue
+            if line in repeated:
+                # Keep the first copy: a running header usually carries the name
+                seen_repeated.add(line)
+            if not line:
+                if out and out[-1]:
+                    out.append("")
+                continue
+            if BULLETS.match(line):
+                line = "- " + BULLETS.sub("", line)
+            if out and HYPHENATED.search(out[-1]) and line[:1].islower():
+                out[-1] = out[-1][:-1] + line
+                continue
+            out.append(line)
+    return "\n".join(out).strip()
+
+
+def _is_heading(line):
+    words = re.findall(r"[a-z]+", line.lower())
+    return (
+        0 < len(words) <= 4
+        and len(line) <= 40
+        and not line.startswith("- ")
+        and (line.isupper() or line.endswith(":") or words[0] in SECTION_WORDS)
+        and any(word in SECTION_WORDS for word in words)
+    )
+
+
+def split_sections(text):
+    """[(heading, lines)]; text before the first heading has heading None"""
+    sections = [(None, [])]
+    for line in text.splitlines():
+        if _is_heading(line):
+            sections.append((line, []))
+        else:
+            sections[-1][1].append(line)
+    return [(heading, lines) for heading, lines in sections if heading or any(lines)]
+
+
+def compress_resume(text, max_tokens=RESUME_TOKEN_BUDGET):
+    """Shrink resume text to about `max_tokens` tokens, keeping the essentials.
+
+    The contact/header block is kept, low-value sections (hobbies,
+    references, ...) go first, and every remaining section keeps its
+    opening lines (most resumes list the most recent and relevant items
+    first) within a share of the budget proportional to its size.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sections = split_sections(text)
+
+    def section_name(heading):
+        return set(re.findall(r"[a-z]+", (heading or "").lower()))
+
+    kept = [s for s in sections if not section_name(s[0]) & LOW_PRIORITY_SECTIONS]
+    sizes = [sum(len(line) + 1 for line in lines) + (len(heading) + 1 if heading else 0)
+             for heading, lines in kept]
+
+    # Name and contact details are kept (up to a fifth of the budget), every
+    # section gets a small floor, and the rest is shared by size.
+    budget = max_tokens * 4
+    floors = [
+        min(size, budget // 5) if heading is None else min(size, MIN_SECTION_CHARS)
+        for (heading, _), size in zip(kept, sizes)
+    ]
+    spare = max(budget - sum(floors), 0)
+    extra = sum(size - floor for size, floor in zip(sizes, floors)) or 1
+
+    out = []
+    for (heading, lines), size, floor in zip(kept, sizes, floors):
+        allowance = floor if heading is None else floor + spare * (size - floor) // extra
+        if heading:
+            out.append(heading)
+            allowance -= len(heading) + 1
+        for line in lines:
+            if not line:
+                continue
+            if len(line) + 1 > allowance:
+                if allowance > 60:
+                    out.append(line[:allowance - 2].rsplit(" ", 1)[0] + " …")
+                break
+            out.append(line)
+            allowance -= len(line) + 1
+    return "\n".join(out)
+
+
+class ResumeCache:
+    """Normalized resume text by PDF hash, so reruns skip PDF parsing.
+
+    Streamlit reruns the script on every click; the same upload is only
+    parsed once. Least recently used entries are dropped beyond
+    `max_entries`.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def text(self, pdf_bytes):
+        key = resume_hash(pdf_bytes)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        text = normalize_pages(extract_pages(pdf_bytes))
+        with self._lock:
+            self._entries[key] = text
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return text
+
+    def prepare(self, pdf_bytes, max_tokens=RESUME_TOKEN_BUDGET):
+        """(resume text for the prompt, tokens before compression)"""
+        text = self.text(pdf_bytes)
+        return compress_resume(text, max_tokens), estimate_tokens(text)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_resume_cache():
+    """Process-wide cache shared by every session"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResumeCache()
+        return _default_cache
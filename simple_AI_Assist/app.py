@@ -1,19 +1,27 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import PromptTemplate
 from dotenv import load_dotenv
 import os
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.registry import get_chat_model
 
 load_dotenv()
 
-llm = ChatGroq(
-    api_key=os.getenv("GROQ_API_KEY"),
+llm = get_chat_model(
+    groq_api_key=os.getenv("GROQ_API_KEY"),
     model="llama-3.1-8b-instant",
     temperature=0.7
 )
 
 
 prompt = PromptTemplate(
-    input_variable=["user_input"],
+    input_variables=["user_input"],
     template="""
     Your are a helpfull AI assitant.
     User says = {user_input} 
@@ -1,10 +1,26 @@
 import streamlit as st
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
-import os
-import re
+import sys
+from pathlib import Path
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common.metrics import bind_session, debug_panel, span
+
+from cache import default_cache
+from captions import cues_to_timestamped_text
+from map_reduce import MAX_CONCURRENCY, summarize_map_reduce
+from providers import default_racer
+from summarizer import (
+    SUMMARY_MODEL,
+    create_summary_chain,
+    get_transcript,
+    get_video_id,
+    plan_summary,
+)
 
 # Load environment variables
 load_dotenv()
@@ -21,150 +37,9 @@ st.title("📺 YouTube Video Summarizer")
 st.caption("Powered by Groq + LangChain")
 st.markdown("---")
 
-def get_video_id(url):
-    """Extract video ID from YouTube URL"""
-    patterns = [
-        r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([^&\n?#]+)',
-        r'youtube\.com/watch\?.*v=([^&\n?#]+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
-
-def get_transcript(video_id):
-    """Fetch transcript using multiple fallback methods"""
-    
-    # Method 1: Try youtube-transcript-api
-    try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-        
-        # Get all available transcripts
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
-        # Try manual transcripts first (more accurate)
-        try:
-            transcript = transcript_list.find_manually_created_transcript(['en', 'en-US', 'en-GB'])
-            transcript_data = transcript.fetch()
-        except:
-            # Fall back to auto-generated
-            try:
-                transcript = transcript_list.find_generated_transcript(['en', 'en-US', 'en-GB'])
-                transcript_data = transcript.fetch()
-            except:
-                # Get first available transcript
-                for t in transcript_list:
-                    transcript_data = t.fetch()
-                    break
-        
-        transcript_text = " ".join([item["text"] for item in transcript_data])
-        return transcript_text
-        
-    except Exception as e1:
-        st.warning(f"Method 1 failed: {str(e1)}")
-        
-        # Method 2: Try with requests and BeautifulSoup
-        try:
-            import requests
-            from bs4 import BeautifulSoup
-            import json
-            
-            url = f"https://www.youtube.com/watch?v={video_id}"
-            response = requests.get(url)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract captions from page data
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if 'captionTracks' in str(script):
-                    # Parse and extract caption URL
-                    # This is a simplified approach
-                    pass
-            
-            raise Exception("BeautifulSoup method not fully implemented")
-            
-        except Exception as e2:
-            st.warning(f"Method 2 failed: {str(e2)}")
-            
-            # Method 3: Try yt-dlp (most reliable)
-            try:
-                import yt_dlp
-                
-                ydl_opts = {
-                    'skip_download': True,
-                    'writesubtitles': True,
-                    'writeautomaticsub': True,
-                    'subtitleslangs': ['en'],
-                    'quiet': True,
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
-                    
-                    # Get subtitles
-                    if 'subtitles' in info and 'en' in info['subtitles']:
-                        subtitle_url = info['subtitles']['en'][0]['url']
-                        import requests
-                        response = requests.get(subtitle_url)
-                        
-                        # Parse VTT or SRT format
-                        transcript_text = response.text
-                        # Clean up timestamps and formatting
-                        lines = transcript_text.split('\n')
-                        text_lines = [line for line in lines if not line.startswith('WEBVTT') 
-                                     and not '-->' in line and line.strip() and not line.strip().isdigit()]
-                        transcript_text = ' '.join(text_lines)
-                        return transcript_text
-                    
-                    # Try automatic captions
-                    if 'automatic_captions' in info and 'en' in info['automatic_captions']:
-                        subtitle_url = info['automatic_captions']['en'][0]['url']
-                        import requests
-                        response = requests.get(subtitle_url)
-                        
-                        transcript_text = response.text
-                        lines = transcript_text.split('\n')
-                        text_lines = [line for line in lines if not line.startswith('WEBVTT') 
-                                     and not '-->' in line and line.strip() and not line.strip().isdigit()]
-                        transcript_text = ' '.join(text_lines)
-                        return transcript_text
-                
-                raise Exception("No subtitles found")
-                
-            except Exception as e3:
-                raise Exception(f"All methods failed. Last error: {str(e3)}")
-
-def create_summary_chain():
-    """Create LangChain summarization chain"""
-    
-    groq_api_key = os.getenv("GROQ_API_KEY")
-    
-    if not groq_api_key:
-        raise ValueError("Groq API key not found in .env file")
-    
-    llm = ChatGroq(
-        model="llama-3.1-8b-instant",
-        temperature=0.3,
-        groq_api_key=groq_api_key,
-        max_tokens=1024
-    )
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert at summarizing YouTube video content. 
-        Create a clear, well-structured summary that captures the key points and main ideas.
-        Format your summary with:
-        - A brief overview (2-3 sentences)
-        - Key points (bullet points)
-        - Main takeaways or conclusion
-        """),
-        ("human", "Summarize the following YouTube video transcript:\n\n{transcript}")
-    ])
-    
-    chain = prompt | llm | StrOutputParser()
-    
-    return chain
+cache = default_cache()
+# Spans and LLM calls of this run go to the session's debug panel
+bind_session(st.session_state)
 
 # Main interface
 youtube_url = st.text_input(
@@ -180,6 +55,26 @@ if youtube_url:
     else:
         st.warning("⚠️ Invalid YouTube URL format")
 
+# Summary settings
+with st.expander("⚙️ Summary settings"):
+    summary_mode = st.radio(
+        "Mode",
+        ["Auto", "Single pass", "Map-reduce"],
+        horizontal=True,
+        help="Auto uses map-reduce when the transcript is too long for one prompt"
+    )
+    max_concurrency = st.slider(
+        "Parallel section summaries",
+        min_value=1,
+        max_value=16,
+        value=MAX_CONCURRENCY
+    )
+    use_cache = st.checkbox(
+        "Reuse cached transcripts and summaries",
+        value=True,
+        help="Untick to fetch the transcript again and regenerate the summary"
+    )
+
 # Summary button
 col1, col2, col3 = st.columns([1, 2, 1])
 with col2:
@@ -198,15 +93,56 @@ if summarize_button:
             try:
                 # Step 1: Fetch transcript
                 with st.status("Processing video...", expanded=True) as status:
-                    st.write("📥 Fetching transcript...")
-                    transcript = get_transcript(video_id)
-                    
-                    st.write(f"✅ Transcript retrieved ({len(transcript)} characters)")
+                    transcript = cache.get_transcript(video_id) if use_cache else None
+                    if transcript is not None:
+                        st.write(
+                            f"📦 Transcript loaded from cache ({len(transcript.text)} characters, "
+                            f"language {transcript.language})"
+                        )
+                    else:
+                        st.write("📥 Fetching transcript...")
+                        fetched = get_transcript(video_id, on_warning=st.warning)
+                        transcript = cache.put_transcript(video_id, fetched.text, fetched.language, fetched.cues)
+                        st.write(
+                            f"✅ Transcript retrieved ({len(transcript.text)} characters, "
+                            f"language {transcript.language})"
+                        )
+                    text = transcript.text
                     
                     # Step 2: Create chain and generate summary
-                    st.write("🤖 Generating summary with AI...")
-                    chain = create_summary_chain()
-                    summary = chain.invoke({"transcript": transcript})
+                    use_map_reduce, prompt_version = plan_summary(
+                        text,
+                        {"Auto": "auto", "Single pass": "single", "Map-reduce": "map-reduce"}[summary_mode]
+                    )
+                    summary = (
+                        cache.get_summary(text, SUMMARY_MODEL, prompt_version)
+                        if use_cache else None
+                    )
+
+                    if summary is not None:
+                        st.write("📦 Summary loaded from cache")
+                    elif use_map_reduce:
+                        st.write("🤖 Long transcript: summarizing sections in parallel...")
+
+                        def show_partial(index, total, partial):
+                            st.markdown(f"**✅ Section {index}/{total} summarized**")
+                            st.caption(partial[:400] + ("…" if len(partial) > 400 else ""))
+
+                        with span("summarize", mode="map-reduce"):
+                            summary = summarize_map_reduce(
+                                text,
+                                cues=transcript.cues,
+                                max_concurrency=max_concurrency,
+                                on_partial=show_partial,
+                                on_stage=lambda message: st.write(f"🔄 {message}")
+                            )
+                    else:
+                        st.write("🤖 Generating summary with AI...")
+                        chain = create_summary_chain()
+                        with span("summarize", mode="single"):
+                            summary = chain.invoke({"transcript": text})
+
+                    cache.put_summary(text, SUMMARY_MODEL, prompt_version, summary)
                     
                     status.update(label="✨ Summary generated!", state="complete")
                 
@@ -219,7 +155,7 @@ if summarize_button:
                 with st.expander("📜 View Full Transcript"):
                     st.text_area(
                         "Transcript",
-                        transcript,
+                        cues_to_timestamped_text(transcript.cues) if transcript.cues else text,
                         height=300,
                         disabled=True
                     )
@@ -234,6 +170,21 @@ if summarize_button:
 
 # Footer
 st.markdown("---")
+cache_stats = cache.stats()
+st.caption(
+    f"📦 Cache: {cache_stats['transcripts']} transcripts, {cache_stats['summaries']} summaries, "
+    f"{cache_stats['size_bytes'] / 1024 ** 2:.1f} MB · "
+    f"hits {cache_stats['transcript_hits'] + cache_stats['summary_hits']}, "
+    f"misses {cache_stats['transcript_misses'] + cache_stats['summary_misses']}"
+)
+provider_stats = [
+    f"{name} {stats['wins']}/{stats['attempts']} won"
+    + (f", p50 {stats['p50_s']:.1f}s" if stats['p50_s'] is not None else "")
+    for name, stats in default_racer().stats().items() if stats['attempts']
+]
+if provider_stats:
+    st.caption("🏁 Transcript sources: " + " · ".join(provider_stats))
+debug_panel()
 st.markdown(
     "<div style='text-align: center; color: gray;'>Built with Streamlit, LangChain & Groq</div>",
     unsafe_allow_html=True
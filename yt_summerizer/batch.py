@@ -0,0 +1,265 @@
+"""Summarize many YouTube videos headlessly, resuming after interruptions.
+
+Examples:
+    python batch.py urls.txt -o summaries.jsonl
+    python batch.py --playlist "https://www.youtube.com/playlist?list=..." -o out.jsonl
+    python batch.py urls.txt -o out.jsonl --transcript-concurrency 8 --llm-concurrency 4
+    python batch.py urls.txt -o out.jsonl --metrics batch.prom
+
+Each finished video is appended to the output JSONL immediately. On restart,
+videos already summarized successfully in that file are skipped, so an
+overnight run that crashes can simply be started again.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Shared helpers live in the repository root
+ROOT_DIR = str(Path(__file__).resolve().parents[1])
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from common import gateway, metrics
+from cache import default_cache
+from map_reduce import summarize_map_reduce
+from providers import default_racer
+from summarizer import SUMMARY_MODEL, create_summary_chain, get_transcript, get_video_id, plan_summary
+
+logger = logging.getLogger("yt_batch")
+
+
+def read_urls(path):
+    """URLs from a text file, one per line; blank lines and # comments skipped"""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def playlist_urls(playlist_url):
+    """Video URLs of a playlist, listed without downloading anything"""
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({"extract_flat": True, "quiet": True}) as ydl:
+        info = ydl.extract_info(playlist_url, download=False)
+    return [f"https://www.youtube.com/watch?v={entry['id']}" for entry in info.get("entries") or []]
+
+
+def completed_ids(output_path):
+    """Video ids that already have a successful result in `output_path`"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write leaves a truncated last line
+                continue
+            if record.get("status") == "ok":
+                done.add(record["video_id"])
+    return done
+
+
+class ResultWriter:
+    """Append-only JSONL output, flushed and fsynced after every record"""
+
+    def __init__(self, path):
+        self.file = open(path, "a")
+        # Start on a fresh line if the previous run died mid-record
+        if self.file.tell():
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.file.write("\n")
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+async def fetch_stage(jobs, ready, cache, use_cache):
+    """Transcript worker: pull (url, video_id) jobs, push transcripts on"""
+    while True:
+        url, video_id = await jobs.get()
+        started = time.perf_counter()
+        try:
+            transcript = await asyncio.to_thread(cache.get_transcript, video_id) if use_cache else None
+            if transcript is None:
+                fetched = await asyncio.to_thread(get_transcript, video_id)
+                transcript = await asyncio.to_thread(
+                    cache.put_transcript, video_id, fetched.text, fetched.language, fetched.cues
+                )
+            await ready.put((url, video_id, transcript, started, None))
+        except Exception as e:
+            await ready.put((url, video_id, None, started, e))
+        finally:
+            jobs.task_done()
+
+
+async def summarize_stage(ready, writer, cache, chain, mode, use_cache, progress):
+    """LLM worker: summarize ready transcripts and write results"""
+    while True:
+        url, video_id, transcript, started, error = await ready.get()
+        record = {"url": url, "video_id": video_id}
+        try:
+            if error is not None:
+                raise error
+            text = transcript.text
+            use_map_reduce, prompt_version = plan_summary(text, mode)
+            summary = cache.get_summary(text, SUMMARY_MODEL, prompt_version) if use_cache else None
+            cached = summary is not None
+            if summary is None and use_map_reduce:
+                # Map-reduce fans out internally; keep it to this worker's slot
+                summary = await asyncio.to_thread(
+                    summarize_map_reduce, text, max_concurrency=1, cues=transcript.cues
+                )
+            elif summary is None:
+                summary = await chain.ainvoke({"transcript": text})
+            if not cached:
+                await asyncio.to_thread(cache.put_summary, text, SUMMARY_MODEL, prompt_version, summary)
+            record.update(
+                status="ok",
+                summary=summary,
+                mode="map-reduce" if use_map_reduce else "single",
+                language=transcript.language,
+                transcript_chars=len(text),
+                cached=cached,
+            )
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["seconds"] = round(time.perf_counter() - started, 2)
+        record["finished_at"] = time.time()
+        writer.write(record)
+        progress(record)
+        ready.task_done()
+
+
+async def drain(jobs, ready):
+    """Wait until every job has been fetched and its result written"""
+    await jobs.join()
+    await ready.join()
+
+
+async def run(urls, output, transcript_concurrency, llm_concurrency, mode, use_cache):
+    # Built up front so a missing key or bad config fails before any work starts
+    chain = create_summary_chain()
+    cache = default_cache()
+    done = completed_ids(output)
+
+    jobs = asyncio.Queue()
+    skipped = invalid = 0
+    writer = ResultWriter(output)
+    seen = set()
+    for url in urls:
+        video_id = get_video_id(url)
+        if video_id is None:
+            invalid += 1
+            logger.warning("Skipping invalid YouTube URL: %s", url)
+            continue
+        if video_id in done or video_id in seen:
+            skipped += 1
+            continue
+        seen.add(video_id)
+        jobs.put_nowait((url, video_id))
+
+    total = jobs.qsize()
+    logger.info("%d to summarize, %d already done, %d invalid", total, skipped, invalid)
+    if not total:
+        writer.close()
+        return
+
+    counts = {"ok": 0, "error": 0}
+    batch_start = time.perf_counter()
+
+    def progress(record):
+        counts[record["status"]] += 1
+        finished = counts["ok"] + counts["error"]
+        rate = finished / (time.perf_counter() - batch_start) * 3600
+        logger.info(
+            "[%d/%d] %s %s (%.1fs, %.0f videos/h)",
+            finished, total, record["status"], record["video_id"], record["seconds"], rate
+        )
+
+    # Bounded hand-off: fetchers run ahead of the LLM by at most a few videos,
+    # so thousands of transcripts never pile up in memory.
+    ready = asyncio.Queue(maxsize=2 * llm_concurrency)
+    workers = [
+        asyncio.create_task(fetch_stage(jobs, ready, cache, use_cache))
+        for _ in range(transcript_concurrency)
+    ] + [
+        asyncio.create_task(summarize_stage(ready, writer, cache, chain, mode, use_cache, progress))
+        for _ in range(llm_concurrency)
+    ]
+    finished = asyncio.create_task(drain(jobs, ready))
+    try:
+        # Workers loop forever, so one that returns has crashed; re-raise its
+        # error instead of waiting on queues nobody will empty
+        done, _ = await asyncio.wait([finished, *workers], return_when=asyncio.FIRST_COMPLETED)
+        if finished not in done:
+            crashed = done.pop()
+            raise crashed.exception() or RuntimeError("Batch worker exited unexpectedly")
+    finally:
+        for task in [finished, *workers]:
+            task.cancel()
+        await asyncio.gather(finished, *workers, return_exceptions=True)
+        writer.close()
+
+    logger.info("Done: %d ok, %d failed in %.0fs", counts["ok"], counts["error"], time.perf_counter() - batch_start)
+    for name, stats in default_racer().stats().items():
+        if stats["attempts"]:
+            logger.info(
+                "Transcript source %s: %d attempts, %d won, %d failed, %d timed out, %d cancelled",
+                name, stats["attempts"], stats["wins"], stats["failures"], stats["timeouts"], stats["cancelled"]
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("urls_file", nargs="?", help="text file with one YouTube URL per line")
+    source.add_argument("--playlist", help="summarize every video of this playlist")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--transcript-concurrency", type=int, default=8)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--mode", choices=["auto", "single", "map-reduce"], default="auto")
+    parser.add_argument("--no-cache", action="store_true", help="refetch transcripts and regenerate summaries")
+    parser.add_argument("--metrics", help="write latency/token metrics (Prometheus text format) to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    urls = playlist_urls(args.playlist) if args.playlist else read_urls(args.urls_file)
+    # Yield to interactive app traffic sharing the gateway's rate limit
+    with gateway.priority("batch"):
+        asyncio.run(run(
+            urls,
+            args.output,
+            args.transcript_concurrency,
+            args.llm_concurrency,
+            args.mode,
+            not args.no_cache,
+        ))
+
+    for row in metrics.store.summary():
+        labels = " ".join(f"{key}={value}" for key, value in row.items()
+                          if key not in ("metric", "count", "mean", "p50", "p95"))
+        logger.info("%s %s: n=%d mean=%g p50=%g p95=%g", row["metric"], labels,
+                    row["count"], row["mean"], row["p50"], row["p95"])
+    if args.metrics:
+        Path(args.metrics).write_text(metrics.render_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Benchmark caption parsing: transcript size before and after cleanup.
+
+Examples:
+    python bench_captions.py                      # synthetic YouTube auto-captions + SRT
+    python bench_captions.py talk.en.vtt other.srt
+    python bench_captions.py --minutes 120 --json results.json
+
+For each caption file this compares the old line filter (drop lines with
+'-->' and join the rest) with the streaming parser in captions.py, and
+reports characters, estimated tokens and parse throughput. Synthetic files
+also report how many of the spoken words survive, so deduplication can be
+checked for dropping real content.
+"""
+import argparse
+import json
+import random
+import time
+
+from captions import cues_to_text, parse_captions
+
+WORDS = (
+    "so today we are going to look at how the model handles long documents and why "
+    "retrieval matters when the context window is limited we will build a small index "
+    "measure latency and compare a few strategies for chunking splitting and ranking"
+).split()
+
+
+def _ts(seconds, sep="."):
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{int(hours):02d}:{int(minutes):02d}:{secs:06.3f}".replace(".", sep)
+
+
+def synthetic_speech(minutes, seed=0):
+    """Lines of fake speech, ~150 words per minute"""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(minutes * 150 // 8):
+        lines.append([rng.choice(WORDS) for _ in range(rng.randint(5, 11))])
+    return lines
+
+
+def youtube_auto_vtt(lines):
+    """Rolling auto-captions the way YouTube serves them.
+
+    Every line is shown once with word timing tags under the previous line,
+    then once more in a 10ms snapshot cue, then again as the first line of
+    the next cue.
+    """
+    out = ["WEBVTT", "Kind: captions", "Language: en", ""]
+    t, previous = 0.0, " "
+    for words in lines:
+        duration = len(words) * 0.4
+        timed = words[0] + "".join(
+            f"<{_ts(t + i * 0.4)}><c> {word}</c>" for i, word in enumerate(words[1:], start=1)
+        )
+        out += [f"{_ts(t)} --> {_ts(t + duration)} align:start position:0%", previous, timed, ""]
+        t += duration
+        current = " ".join(words)
+        out += [f"{_ts(t)} --> {_ts(t + 0.01)} align:start position:0%", current, " ", ""]
+        t += 0.01
+        previous = current
+    return "\n".join(out) + "\n"
+
+
+def plain_srt(lines):
+    out = []
+    t = 0.0
+    for i, words in enumerate(lines, start=1):
+        duration = len(words) * 0.4
+        out += [str(i), f"{_ts(t, ',')} --> {_ts(t + duration, ',')}", " ".join(words), ""]
+        t += duration
+    return "\n".join(out) + "\n"
+
+
+def naive_text(raw):
+    """The previous cleanup: drop timing/index lines, keep everything else"""
+    lines = raw.split("\n")
+    return " ".join(line for line in lines if not line.startswith("WEBVTT")
+                    and "-->" not in line and line.strip() and not line.strip().isdigit())
+
+
+def bench(name, raw, reference=None, repeat=3):
+    naive = naive_text(raw)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cues = list(parse_captions(raw.splitlines()))
+        timings.append(time.perf_counter() - start)
+    text = cues_to_text(cues)
+    best = min(timings)
+    result = {
+        "file": name,
+        "raw_chars": len(raw),
+        "naive_chars": len(naive),
+        "parsed_chars": len(text),
+        "naive_tokens": len(naive) // 4,
+        "parsed_tokens": len(text) // 4,
+        "reduction": round(len(naive) / max(len(text), 1), 2),
+        "cues": len(cues),
+        "parse_ms": round(best * 1000, 1),
+        "mb_per_s": round(len(raw) / 1024 ** 2 / best, 1) if best else None,
+    }
+    if reference is not None:
+        result["words_kept"] = round(len(text.split()) / len(reference.split()), 3)
+        result["exact"] = text == reference
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="VTT/SRT files (default: synthetic samples)")
+    parser.add_argument("--minutes", type=int, default=60, help="length of the synthetic samples")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    if args.files:
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                results.append(bench(path, f.read()))
+    else:
+        speech = synthetic_speech(args.minutes)
+        reference = " ".join(" ".join(words) for words in speech)
+        results.append(bench("synthetic auto-captions.vtt", youtube_auto_vtt(speech), reference))
+        results.append(bench("synthetic manual.srt", plain_srt(speech), reference))
+
+    for r in results:
+        print(f"\n{r['file']}")
+        print(f"  raw file        {r['raw_chars']:>10,} chars")
+        print(f"  line filter     {r['naive_chars']:>10,} chars  ~{r['naive_tokens']:,} tokens")
+        print(f"  parser          {r['parsed_chars']:>10,} chars  ~{r['parsed_tokens']:,} tokens"
+              f"  ({r['reduction']}x smaller, {r['cues']} cues)")
+        print(f"  parse time      {r['parse_ms']:>10} ms  ({r['mb_per_s']} MB/s)")
+        if "words_kept" in r:
+            print(f"  words kept      {r['words_kept']:>10.1%}  exact={r['exact']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from captions import Cue, Transcript, cues_to_text
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+CACHE_PATH = Path(os.getenv(
+    "YT_CACHE_PATH",
+    Path.home() / ".cache" / "yt_summerizer" / "cache.sqlite3"
+))
+TRANSCRIPT_TTL = float(os.getenv("YT_TRANSCRIPT_TTL", 7 * 24 * 3600))
+SUMMARY_TTL = float(os.getenv("YT_SUMMARY_TTL", 30 * 24 * 3600))
+MAX_CACHE_BYTES = int(os.getenv("YT_CACHE_MAX_BYTES", 512 * 1024 ** 2))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id   TEXT NOT NULL,
+    language   TEXT NOT NULL,
+    text       TEXT NOT NULL,
+    sha256     TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    cues       TEXT,
+    PRIMARY KEY (video_id, language)
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    key            TEXT PRIMARY KEY,
+    transcript_sha TEXT NOT NULL,
+    model          TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    summary        TEXT NOT NULL,
+    size           INTEGER NOT NULL,
+    created_at     REAL NOT NULL,
+    last_used      REAL NOT NULL
+);
+"""
+
+
+def clean_transcript(text):
+    """Collapse whitespace so equal transcripts hash equally"""
+    return " ".join(text.split())
+
+
+def transcript_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def summary_key(transcript_sha, model, prompt_version):
+    return hashlib.sha256(f"{transcript_sha}\0{model}\0{prompt_version}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """SQLite cache of transcripts (by video id + language) and summaries.
+
+    Summaries are keyed by transcript hash, model and prompt version, so
+    an edited prompt or a changed transcript never returns a stale summary.
+    Rows expire after a TTL, and once the stored text exceeds `max_bytes`
+    the least recently used rows are evicted. WAL mode and a connection
+    per call make it safe to share between threads and Streamlit workers.
+    """
+
+    def __init__(self, path=CACHE_PATH, transcript_ttl=TRANSCRIPT_TTL,
+                 summary_ttl=SUMMARY_TTL, max_bytes=MAX_CACHE_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.transcript_ttl = transcript_ttl
+        self.summary_ttl = summary_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.counts = {"transcript_hits": 0, "transcript_misses": 0, "summary_hits": 0, "summary_misses": 0}
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            # Caches created before cue timings were kept
+            columns = [row[1] for row in db.execute("PRAGMA table_info(transcripts)")]
+            if "cues" not in columns:
+                db.execute("ALTER TABLE transcripts ADD COLUMN cues TEXT")
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection, committed on success and always closed"""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    # ------------------------
+    # Transcripts
+    # ------------------------
+    def get_transcript(self, video_id, language=None):
+        """Cached `Transcript` in `language`; without one, the most recently fetched in any language"""
+        now = time.time()
+        query = "SELECT text, language, cues FROM transcripts WHERE video_id = ? AND created_at > ?"
+        params = [video_id, now - self.transcript_ttl]
+        if language:
+            query += " AND language = ?"
+            params.append(language)
+        with self._connect() as db:
+            row = db.execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+            if row:
+                db.execute(
+                    "UPDATE transcripts SET last_used = ? WHERE video_id = ? AND language = ?",
+                    (now, video_id, row[1])
+                )
+        self._count("transcript_hits" if row else "transcript_misses")
+        if not row:
+            return None
+        cues = [Cue(*cue) for cue in json.loads(row[2])] if row[2] else None
+        return Transcript(row[0], row[1], cues)
+
+    def put_transcript(self, video_id, text, language, cues=None):
+        """Store a transcript under the language of its track; returns the cleaned `Transcript`.
+
+        With `cues`, their timings are kept and the text is rebuilt from
+        them, so the two always agree.
+        """
+        stored_cues = None
+        if cues:
+            cues = [Cue(cue.start, cue.end, clean_transcript(cue.text)) for cue in cues]
+            text = cues_to_text(cues)
+            stored_cues = json.dumps([[round(cue.start, 3), round(cue.end, 3), cue.text] for cue in cues])
+        text = clean_transcript(text)
+        size = len(text.encode("utf-8")) + len((stored_cues or "").encode("utf-8"))
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO transcripts"
+                " (video_id, language, text, sha256, size, created_at, last_used, cues)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, language, text, transcript_hash(text), size, now, now, stored_cues)
+            )
+        self.evict()
+        return Transcript(text, language, cues or None)
+
+    def transcript(self, video_id, fetch, language=None):
+        """Cached `Transcript` for `video_id`, calling `fetch(video_id)` on a miss"""
+        transcript = self.get_transcript(video_id, language)
+        if transcript is None:
+            fetched = fetch(video_id)
+            transcript = self.put_transcript(video_id, fetched.text, fetched.language, fetched.cues)
+        return transcript
+
+    # ------------------------
+    # Summaries
+    # ------------------------
+    def get_summary(self, transcript, model, prompt_version):
+        key = summary_key(transcript_hash(transcript), model, prompt_version)
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT summary FROM summaries WHERE key = ? AND created_at > ?",
+                (key, now - self.summary_ttl)
+            ).fetchone()
+            if row:
+                db.execute("UPDATE summaries SET last_used = ? WHERE key = ?", (now, key))
+        self._count("summary_hits" if row else "summary_misses")
+        return row[0] if row else None
+
+    def put_summary(self, transcript, model, prompt_version, summary):
+        sha = transcript_hash(transcript)
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (summary_key(sha, model, prompt_version), sha, model, prompt_version,
+                 summary, len(summary.encode("utf-8")), now, now)
+            )
+        self.evict()
+
+    # ------------------------
+    # Eviction
+    # ------------------------
+    def evict(self):
+        """Drop expired rows, then LRU rows until under `max_bytes`"""
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM transcripts WHERE created_at <= ?", (now - self.transcript_ttl,))
+            db.execute("DELETE FROM summaries WHERE created_at <= ?", (now - self.summary_ttl,))
+            total = db.execute(
+                "SELECT (SELECT COALESCE(SUM(size), 0) FROM transcripts)"
+                " + (SELECT COALESCE(SUM(size), 0) FROM summaries)"
+            ).fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            rows = db.execute(
+                "SELECT 'transcripts', video_id || char(0) || language, size, last_used FROM transcripts"
+                " UNION ALL SELECT 'summaries', key, size, last_used FROM summaries"
+                " ORDER BY last_used"
+            ).fetchall()
+            for table, key, size, _ in rows:
+                if total <= self.max_bytes:
+                    break
+                if table == "transcripts":
+                    video_id, language = key.split("\0")
+                    db.execute(
+                        "DELETE FROM transcripts WHERE video_id = ? AND language = ?",
+                        (video_id, language)
+                    )
+                else:
+                    db.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                total -= size
+
+    def stats(self):
+        with self._connect() as db:
+            transcripts, transcript_bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcripts"
+            ).fetchone()
+            summaries, summary_bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries"
+            ).fetchone()
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            **counts,
+            "transcripts": transcripts,
+            "summaries": summaries,
+            "size_bytes": transcript_bytes + summary_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache, so hit/miss counters survive Streamlit reruns"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = SummaryCache()
+        return _default_cache
@@ -0,0 +1,143 @@
+import html
+import re
+from collections import namedtuple
+
+# One caption cue; times are in seconds
+Cue = namedtuple("Cue", ["start", "end", "text"])
+# A fetched transcript, the language code of its caption track and, when
+# the source has timings, its cues; `text` is the cues' text joined
+Transcript = namedtuple("Transcript", ["text", "language", "cues"], defaults=[None])
+
+TIMESTAMP = re.compile(r"(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})")
+# Inline timing tags (<00:00:01.200>), voice/class spans (<v Bob>, <c.red>) and their closers
+TAG = re.compile(r"<[^>]*>")
+# Words of the recently emitted text compared against each new caption line
+OVERLAP_WINDOW = 64
+MIN_OVERLAP_WORDS = 3
+
+
+def parse_timestamp(value):
+    """'01:02:03.456', '02:03.456' or SRT '01:02:03,456' to seconds"""
+    match = TIMESTAMP.match(value.strip())
+    if not match:
+        raise ValueError(f"Bad caption timestamp: {value!r}")
+    hours, minutes, seconds, millis = match.groups()
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(millis.ljust(3, "0")) / 1000
+
+
+def clean_text(line):
+    """Caption line without markup, entities or extra whitespace"""
+    return " ".join(html.unescape(TAG.sub("", line)).split())
+
+
+def _cue_from_block(block):
+    for i, line in enumerate(block):
+        if "-->" in line:
+            start, _, rest = line.partition("-->")
+            # Anything after the end time is cue settings (align:start position:0%)
+            end = rest.split()[0] if rest.split() else ""
+            lines = [clean_text(text) for text in block[i + 1:]]
+            return Cue(parse_timestamp(start), parse_timestamp(end), [text for text in lines if text])
+    # WEBVTT header, NOTE, STYLE and REGION blocks have no timing line
+    return None
+
+
+def iter_cues(lines):
+    """Parse WebVTT or SRT incrementally from any iterable of lines.
+
+    Yields a `Cue` per caption block as soon as the block ends, with text as
+    a list of cleaned lines, so a streamed HTTP response never has to be held
+    in memory. Only a truly empty line ends a block: YouTube cues often hold
+    a line with a single space.
+    """
+    block = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip("\r\n").lstrip("\ufeff")
+        if line:
+            block.append(line)
+            continue
+        if block:
+            cue = _cue_from_block(block)
+            if cue is not None:
+                yield cue
+            block = []
+    if block:
+        cue = _cue_from_block(block)
+        if cue is not None:
+            yield cue
+
+
+def _overlap(tail, words):
+    """Length of the longest prefix of `words` that ends `tail`"""
+    for size in range(min(len(tail), len(words)), 0, -1):
+        if tail[-size:] == words[:size]:
+            return size
+    return 0
+
+
+def dedupe_rolling(cues):
+    """Drop caption text that repeats what was just said.
+
+    YouTube auto-captions roll: each cue repeats the previous line before
+    adding a new one, and short "snapshot" cues repeat it again, so every
+    line shows up two or three times. Each new line is compared with the
+    tail of the text already emitted; a fully repeated line is dropped and
+    a line that continues the tail only contributes its new words. Yields
+    cues with `text` as a single string, keeping the start and end time of
+    the cue the new words first appeared in.
+    """
+    tail = []
+    for cue in cues:
+        new_words = []
+        for line in cue.text:
+            words = line.split()
+            size = _overlap(tail, words)
+            if size < len(words) and size < MIN_OVERLAP_WORDS:
+                # A short accidental match ("the", "and so") is not a repeat
+                size = 0
+            added = words[size:]
+            new_words.extend(added)
+            tail = (tail + added)[-OVERLAP_WINDOW:]
+        if new_words:
+            yield Cue(cue.start, cue.end, " ".join(new_words))
+
+
+def parse_captions(lines):
+    """Deduplicated cues with timestamps, from WebVTT or SRT lines"""
+    return dedupe_rolling(iter_cues(lines))
+
+
+def cues_to_text(cues):
+    return " ".join(cue.text for cue in cues)
+
+
+def format_time(seconds):
+    """Seconds as 'm:ss', or 'h:mm:ss' from an hour on"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def cues_to_timestamped_text(cues):
+    """One '[m:ss] text' line per cue, for display"""
+    return "\n".join(f"[{format_time(cue.start)}] {cue.text}" for cue in cues)
+
+
+def fetch_captions(url, timeout=30.0):
+    """Stream a caption file over HTTP and parse it as it arrives"""
+    import requests
+
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        return list(parse_captions(response.iter_lines()))
+
+
+def pick_subtitle_format(formats, preferred=("vtt", "srt")):
+    """The yt-dlp subtitle format entry this parser understands best"""
+    for ext in preferred:
+        for entry in formats:
+            if entry.get("ext") == ext:
+                return entry
+    return formats[0]
@@ -0,0 +1,213 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from captions import cues_to_text, format_time
+from common import metrics
+from common.registry import get_chat_model
+
+# Bump when any prompt below changes, so cached summaries are not reused
+PROMPT_VERSION = "2"
+
+# Transcript chunk size for the map step, and the most partial-summary text
+# a single reduce call is given before summaries are merged in groups.
+CHUNK_TOKENS = 3000
+REDUCE_TOKENS = 6000
+CHUNK_OVERLAP_WORDS = 40
+MAX_CONCURRENCY = 4
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English)"""
+    return len(text) // 4
+
+
+def split_transcript(transcript, max_tokens=CHUNK_TOKENS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Split on word boundaries into chunks of about `max_tokens` tokens"""
+    words = transcript.split()
+    chunks, current, size = [], [], 0
+    for word in words:
+        current.append(word)
+        size += len(word) + 1
+        if size // 4 >= max_tokens:
+            chunks.append(" ".join(current))
+            # Carry a little context over so sentences cut at the boundary survive
+            current = current[-overlap_words:] if overlap_words else []
+            size = sum(len(w) + 1 for w in current)
+    if current and (not chunks or len(current) > overlap_words):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def split_cues(cues, max_tokens=CHUNK_TOKENS, overlap_words=CHUNK_OVERLAP_WORDS):
+    """Split timed cues, between cues, into (text, start, end) chunks of about `max_tokens`"""
+    chunks, current, size, carried = [], [], 0, 0
+    for cue in cues:
+        current.append(cue)
+        size += len(cue.text) + 1
+        if size // 4 >= max_tokens:
+            chunks.append(current)
+            # Carry the last cues (up to `overlap_words` words) into the next chunk
+            carry, words = [], 0
+            for previous in reversed(current):
+                words += len(previous.text.split())
+                if words > overlap_words:
+                    break
+                carry.insert(0, previous)
+            current, carried = carry, len(carry)
+            size = sum(len(c.text) + 1 for c in current)
+    if current and (not chunks or len(current) > carried):
+        chunks.append(current)
+    return [(cues_to_text(chunk), chunk[0].start, chunk[-1].end) for chunk in chunks]
+
+
+def _llm(max_tokens):
+    return get_chat_model(
+        model="llama-3.1-8b-instant",
+        temperature=0.3,
+        groq_api_key=os.getenv("GROQ_API_KEY"),
+        max_tokens=max_tokens
+    )
+
+
+def create_map_chain(llm=None):
+    """Summarize one section of a long transcript"""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are summarizing one section of a long YouTube video transcript.
+        Write a dense summary of this section only: key points, facts, names and numbers.
+        Use short bullet points. Do not add an introduction or conclusion.
+        """),
+        ("human", "Section {index} of {total}{span}:\n\n{transcript}")
+    ])
+    return prompt | (llm or _llm(512)) | StrOutputParser()
+
+
+def create_merge_chain(llm=None):
+    """Merge a group of section summaries into one (intermediate levels)"""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are merging consecutive section summaries of a long YouTube video.
+        Combine them into one dense bullet-point summary, keeping the order of topics
+        and removing repetition.
+        """),
+        ("human", "{summaries}")
+    ])
+    return prompt | (llm or _llm(768)) | StrOutputParser()
+
+
+def create_reduce_chain(llm=None):
+    """Turn the section summaries into the final summary"""
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are an expert at summarizing YouTube video content.
+        You are given summaries of consecutive sections of one video, in order.
+        Create a clear, well-structured summary of the whole video that captures the key points and main ideas.
+        When sections are labelled with time ranges, give the time range next to each key point.
+        Format your summary with:
+        - A brief overview (2-3 sentences)
+        - Key points (bullet points)
+        - Main takeaways or conclusion
+        """),
+        ("human", "Section summaries:\n\n{summaries}")
+    ])
+    return prompt | (llm or _llm(1024)) | StrOutputParser()
+
+
+def _span(start, end):
+    """' (m:ss–m:ss)' label for a time range, or '' when untimed"""
+    return "" if start is None else f" ({format_time(start)}–{format_time(end)})"
+
+
+def _join(parts):
+    """Prompt text for (summary, start, end) parts"""
+    return "\n\n".join(
+        f"Part {i}{_span(start, end)}:\n{summary}" for i, (summary, start, end) in enumerate(parts, start=1)
+    )
+
+
+def _group(parts, max_tokens):
+    """Consecutive groups whose joined size stays under `max_tokens`"""
+    groups, current = [], []
+    for part in parts:
+        if current and estimate_tokens(_join(current + [part])) > max_tokens:
+            groups.append(current)
+            current = []
+        current.append(part)
+    groups.append(current)
+    return groups
+
+
+def _run_concurrently(chain, inputs, max_concurrency, on_result=None):
+    """Invoke `chain` on every input with at most `max_concurrency` in flight.
+
+    Results come back in input order; `on_result(index, output)` is called
+    from this thread as each one finishes, so it may safely touch Streamlit.
+    """
+    outputs = [None] * len(inputs)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        # Copy the caller's context so gateway priority/deadline settings apply in workers
+        futures = {
+            pool.submit(contextvars.copy_context().run, chain.invoke, item): i
+            for i, item in enumerate(inputs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            outputs[index] = future.result()
+            if on_result:
+                on_result(index, outputs[index])
+    return outputs
+
+
+def summarize_map_reduce(transcript, max_concurrency=MAX_CONCURRENCY, chunk_tokens=CHUNK_TOKENS,
+                         on_partial=None, on_stage=None, llm=None, cues=None):
+    """Summarize a long transcript: summarize chunks concurrently, then merge.
+
+    With the transcript's timed `cues`, sections are cut between cues and
+    labelled with their time range in the prompts. `on_partial(index,
+    total, summary)` receives each section summary as it completes;
+    `on_stage(message)` reports progress between steps. Partial summaries
+    too long for one reduce call are first merged in groups
+    (hierarchically) so any video length fits. `llm` replaces the default
+    Groq models (e.g. with a fake for load tests).
+    """
+    if cues:
+        sections = split_cues(cues, chunk_tokens)
+    else:
+        sections = [(chunk, None, None) for chunk in split_transcript(transcript, chunk_tokens)]
+    total = len(sections)
+    if on_stage:
+        on_stage(f"Split transcript into {total} sections")
+
+    with metrics.span("summarize_map"):
+        summaries = _run_concurrently(
+            create_map_chain(llm),
+            [
+                {"index": i, "total": total, "span": _span(start, end), "transcript": text}
+                for i, (text, start, end) in enumerate(sections, start=1)
+            ],
+            max_concurrency,
+            (lambda i, summary: on_partial(i + 1, total, summary)) if on_partial else None,
+        )
+    parts = [(summary, start, end) for summary, (_, start, end) in zip(summaries, sections)]
+
+    merge_chain = create_merge_chain(llm)
+    while estimate_tokens(_join(parts)) > REDUCE_TOKENS and len(parts) > 1:
+        groups = _group(parts, REDUCE_TOKENS)
+        if len(groups) == len(parts):
+            # Every summary is already too long to pair up; merge them two at a time
+            groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+        if on_stage:
+            on_stage(f"Merging {len(parts)} section summaries into {len(groups)}")
+        with metrics.span("summarize_merge"):
+            merged = _run_concurrently(
+                merge_chain,
+                [{"summaries": _join(group)} for group in groups],
+                max_concurrency,
+            )
+        parts = [(summary, group[0][1], group[-1][2]) for summary, group in zip(merged, groups)]
+
+    if on_stage:
+        on_stage("Writing final summary")
+    with metrics.span("summarize_reduce"):
+        return create_reduce_chain(llm).invoke({"summaries": _join(parts)})
@@ -0,0 +1,305 @@
+import html
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from captions import Cue, Transcript, cues_to_text, fetch_captions, pick_subtitle_format
+
+# ------------------------
+# Defaults (override via environment)
+# ------------------------
+LANGUAGES = ["en", "en-US", "en-GB"]
+# Language code for transcripts whose track language is unknown
+UNKNOWN_LANGUAGE = "und"
+# Start the next provider if the current one has not answered by then;
+# 0 races all providers at once, "none" only falls back on failure
+HEDGE_DELAY = os.getenv("YT_HEDGE_DELAY", "3")
+HEDGE_DELAY = None if HEDGE_DELAY.lower() == "none" else float(HEDGE_DELAY)
+
+
+class TranscriptUnavailable(Exception):
+    """Every provider failed or timed out"""
+
+
+class TranscriptProvider:
+    """One way of getting a transcript.
+
+    Subclasses implement `fetch(video_id, cancelled)` and should return a
+    `Transcript` (the text, the language code of the track it came from
+    and, if the source has timings, the cues) or raise. `cancelled` is a `threading.Event` set
+    once another provider has won; long-running providers should check it
+    between steps and give up early. `timeout` is how long the racer waits
+    for this provider before moving on.
+    """
+
+    name = "provider"
+    timeout = 15.0
+
+    def fetch(self, video_id, cancelled):
+        raise NotImplementedError
+
+
+class FunctionProvider(TranscriptProvider):
+    """Wrap a plain `fn(video_id)` as a provider (handy for local fakes).
+
+    `fn` returns a `Transcript`, or plain text in an unknown language.
+    """
+
+    def __init__(self, name, fn, timeout=15.0):
+        self.name = name
+        self.fn = fn
+        self.timeout = timeout
+
+    def fetch(self, video_id, cancelled):
+        result = self.fn(video_id)
+        return Transcript(result, UNKNOWN_LANGUAGE) if isinstance(result, str) else result
+
+
+class TranscriptApiProvider(TranscriptProvider):
+    """youtube-transcript-api: manual captions first, then auto-generated"""
+
+    name = "youtube-transcript-api"
+    timeout = 10.0
+
+    def fetch(self, video_id, cancelled):
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        # Get all available transcripts
+        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+
+        # Try manual transcripts first (more accurate)
+        try:
+            transcript = transcript_list.find_manually_created_transcript(LANGUAGES)
+        except Exception:
+            # Fall back to auto-generated, then to the first available one
+            try:
+                transcript = transcript_list.find_generated_transcript(LANGUAGES)
+            except Exception:
+                transcript = next(iter(transcript_list))
+
+        if cancelled.is_set():
+            return None
+        cues = [
+            Cue(item["start"], item["start"] + item.get("duration", 0), " ".join(item["text"].split()))
+            for item in transcript.fetch()
+        ]
+        cues = [cue for cue in cues if cue.text]
+        return Transcript(cues_to_text(cues), transcript.language_code, cues)
+
+
+def _attribute(attributes, name, default):
+    match = re.search(rf'\b{name}="([^"]*)"', attributes)
+    return match.group(1) if match else default
+
+
+class PageScrapeProvider(TranscriptProvider):
+    """Read caption tracks from the watch page's player response"""
+
+    name = "watch-page"
+    timeout = 10.0
+
+    def fetch(self, video_id, cancelled):
+        import requests
+
+        page = requests.get(
+            f"https://www.youtube.com/watch?v={video_id}",
+            headers={"Accept-Language": "en-US,en;q=0.8"},
+            timeout=self.timeout
+        )
+        page.raise_for_status()
+        marker = page.text.find('"captionTracks":')
+        if marker < 0:
+            raise Exception("No caption tracks on the watch page")
+        tracks, _ = json.JSONDecoder().raw_decode(page.text, marker + len('"captionTracks":'))
+
+        preferred = [t for t in tracks if t.get("languageCode") in LANGUAGES]
+        track = (preferred or tracks)[0]
+        if cancelled.is_set():
+            return None
+
+        captions = requests.get(track["baseUrl"], timeout=self.timeout)
+        captions.raise_for_status()
+        cues = []
+        for attributes, text in re.findall(r"<text([^>]*)>(.*?)</text>", captions.text, re.DOTALL):
+            start = float(_attribute(attributes, "start", 0))
+            text = " ".join(html.unescape(html.unescape(text)).split())
+            if text:
+                cues.append(Cue(start, start + float(_attribute(attributes, "dur", 0)), text))
+        if not cues:
+            raise Exception("Caption track was empty")
+        return Transcript(cues_to_text(cues), track.get("languageCode") or UNKNOWN_LANGUAGE, cues)
+
+
+class YtDlpProvider(TranscriptProvider):
+    """yt-dlp metadata extraction, then download the subtitle file"""
+
+    name = "yt-dlp"
+    timeout = 30.0
+
+    def fetch(self, video_id, cancelled):
+        import yt_dlp
+
+        ydl_opts = {
+            'skip_download': True,
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': ['en'],
+            'quiet': True,
+            'socket_timeout': self.timeout,
+        }
+
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=False)
+
+        # Uploaded subtitles first, then automatic captions
+        for key in ('subtitles', 'automatic_captions'):
+            if key in info and 'en' in info[key]:
+                if cancelled.is_set():
+                    return None
+                subtitle = pick_subtitle_format(info[key]['en'])
+                cues = fetch_captions(subtitle['url'], timeout=self.timeout)
+                return Transcript(cues_to_text(cues), 'en', cues)
+
+        raise Exception("No subtitles found")
+
+
+class ProviderStats:
+    def __init__(self):
+        self.attempts = 0
+        self.wins = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.latencies = []
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        return {
+            "attempts": self.attempts,
+            "wins": self.wins,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+            "success_rate": self.wins / self.attempts if self.attempts else 0.0,
+            "p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "max_s": latencies[-1] if latencies else None,
+        }
+
+
+class TranscriptRacer:
+    """Run transcript providers hedged, raced or in sequence.
+
+    Providers start in order: the first immediately, each further one
+    `hedge_delay` seconds after the previous start, or at once when a
+    running provider fails or exceeds its own timeout. The first transcript
+    wins and the remaining providers are told to stop. `hedge_delay=0`
+    races everything at once; `hedge_delay=None` only falls back on
+    failure, like a plain sequential chain but with timeouts.
+
+    Worst-case latency is bounded by the providers' timeouts instead of
+    whatever a hung connection decides.
+    """
+
+    def __init__(self, providers, hedge_delay=HEDGE_DELAY, max_workers=32):
+        self.providers = list(providers)
+        self.hedge_delay = hedge_delay
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcript")
+        self._lock = threading.Lock()
+        self._stats = {provider.name: ProviderStats() for provider in self.providers}
+
+    def _record(self, provider, outcome, latency=None):
+        with self._lock:
+            stats = self._stats[provider.name]
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+            if latency is not None:
+                stats.latencies.append(latency)
+                del stats.latencies[:-1000]
+
+    def fetch(self, video_id, on_failure=None):
+        """First `Transcript` any provider returns for `video_id`.
+
+        `on_failure(provider_name, error)` is called for each provider that
+        fails or times out before a winner is found.
+        """
+        cancelled = threading.Event()
+        waiting = list(self.providers)
+        running = {}
+        errors = []
+        next_start = time.monotonic()
+
+        def fail(provider, error):
+            errors.append(f"{provider.name}: {error}")
+            if on_failure:
+                on_failure(provider.name, error)
+
+        try:
+            while waiting or running:
+                now = time.monotonic()
+                if waiting and (not running or (next_start is not None and now >= next_start)):
+                    provider = waiting.pop(0)
+                    with self._lock:
+                        self._stats[provider.name].attempts += 1
+                    future = self._pool.submit(provider.fetch, video_id, cancelled)
+                    running[future] = (provider, now)
+                    next_start = None if self.hedge_delay is None else now + self.hedge_delay
+
+                deadlines = [started + provider.timeout for provider, started in running.values()]
+                if waiting and next_start is not None:
+                    deadlines.append(next_start)
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+
+                now = time.monotonic()
+                for future in done:
+                    provider, started = running.pop(future)
+                    try:
+                        transcript = future.result()
+                        if not transcript or not transcript.text.strip():
+                            raise Exception("Empty transcript")
+                    except Exception as e:
+                        self._record(provider, "failures", now - started)
+                        fail(provider, e)
+                        next_start = now
+                        continue
+                    self._record(provider, "wins", now - started)
+                    return transcript
+
+                for future, (provider, started) in list(running.items()):
+                    if now - started >= provider.timeout:
+                        # The thread cannot be killed, but its result is ignored
+                        del running[future]
+                        future.cancel()
+                        self._record(provider, "timeouts")
+                        fail(provider, TimeoutError(f"no answer after {provider.timeout:g}s"))
+                        next_start = now
+        finally:
+            cancelled.set()
+            for future, (provider, _) in running.items():
+                future.cancel()
+                self._record(provider, "cancelled")
+
+        raise TranscriptUnavailable("All methods failed. " + "; ".join(errors))
+
+    def stats(self):
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._stats.items()}
+
+
+_default_racer = None
+_default_lock = threading.Lock()
+
+
+def default_racer():
+    """Process-wide racer over the built-in providers, so stats accumulate"""
+    global _default_racer
+    with _default_lock:
+        if _default_racer is None:
+            _default_racer = TranscriptRacer([
+                TranscriptApiProvider(),
+                PageScrapeProvider(),
+                YtDlpProvider(),
+            ])
+        return _default_racer
@@ -0,0 +1,84 @@
+import logging
+import os
+import re
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from common import metrics
+from common.registry import get_chat_model
+from map_reduce import CHUNK_TOKENS, estimate_tokens
+from map_reduce import PROMPT_VERSION as MAP_REDUCE_PROMPT_VERSION
+from providers import default_racer
+
+logger = logging.getLogger(__name__)
+
+def get_video_id(url):
+    """Extract video ID from YouTube URL"""
+    patterns = [
+        r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/)([^&\n?#]+)',
+        r'youtube\.com/watch\?.*v=([^&\n?#]+)',
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    return None
+
+def get_transcript(video_id, on_warning=logger.warning, racer=None):
+    """Fetch transcript by hedging across several sources, each with a timeout"""
+    racer = racer or default_racer()
+    with metrics.span("get_transcript"):
+        return racer.fetch(
+            video_id,
+            on_failure=lambda name, error: on_warning(f"{name} failed: {error}")
+        )
+
+SUMMARY_MODEL = "llama-3.1-8b-instant"
+# Bump when the summary prompt changes, so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "1"
+
+def create_summary_chain(llm=None):
+    """Create LangChain summarization chain (on Groq unless `llm` is given)"""
+    
+    if llm is None:
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        
+        if not groq_api_key:
+            raise ValueError("Groq API key not found in .env file")
+        
+        llm = get_chat_model(
+            model=SUMMARY_MODEL,
+            temperature=0.3,
+            groq_api_key=groq_api_key,
+            max_tokens=1024
+        )
+    
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", """You are an expert at summarizing YouTube video content. 
+        Create a clear, well-structured summary that captures the key points and main ideas.
+        Format your summary with:
+        - A brief overview (2-3 sentences)
+        - Key points (bullet points)
+        - Main takeaways or conclusion
+        """),
+        ("human", "Summarize the following YouTube video transcript:\n\n{transcript}")
+    ])
+    
+    chain = prompt | llm | StrOutputParser()
+    
+    return chain
+
+def plan_summary(transcript, mode="auto"):
+    """Decide how to summarize under `mode` ("auto", "single" or "map-reduce").
+
+    Returns (use_map_reduce, prompt_version); the prompt version identifies
+    the resulting summary in the cache.
+    """
+    use_map_reduce = mode == "map-reduce" or (
+        mode == "auto" and estimate_tokens(transcript) > CHUNK_TOKENS
+    )
+    if use_map_reduce:
+        return True, f"map-reduce:{MAP_REDUCE_PROMPT_VERSION}"
+    return False, f"single:{SUMMARY_PROMPT_VERSION}"